@@ -0,0 +1,137 @@
+""" On-disk store of extraction results keyed by content hash, so a PDF is opened and OCR'd once.
+
+Each artifact is a gzip-compressed JSON file artifacts/<ab>/<hash>.json.gz holding
+the per-page texts (text layer and OCR output), the assembled text together
+with a signature of the settings it was assembled with, and file metadata.
+The folder is kept below max_bytes by evicting the least recently used files;
+a read bumps the file's mtime, which is what the LRU order is based on.
+"""
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+
+ARTIFACT_DEFAULTS = {
+    "enabled": True,
+    "folder": "artifacts",
+    "max_bytes": 512 * 1024 * 1024
+}
+
+SUFFIX = ".json.gz"
+
+def settings_signature(*settings):
+    """ Stable fingerprint of the settings an assembled text depends on. """
+    return json.dumps(settings, sort_keys=True)
+
+class ArtifactStore:
+    """ Size-bounded LRU cache of extraction results on disk. """
+    def __init__(self, settings=None):
+        self.settings = dict(ARTIFACT_DEFAULTS)
+        self.settings.update(settings or {})
+        self.folder = self.settings["folder"]
+        self.lock = threading.Lock()
+        self.sizes = None  # path -> bytes, scanned on first use
+        self.total = 0
+
+    def path(self, content_hash):
+        return os.path.join(self.folder, content_hash[:2], content_hash + SUFFIX)
+
+    def get(self, content_hash, signature=None):
+        """ The stored artifact dict, or None; with a signature, only one made with the same settings. """
+        if not self.settings["enabled"] or not content_hash:
+            return None
+        path = self.path(content_hash)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                artifact = json.load(file)
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable artifact {path}: {e}")
+            return None
+        if signature is not None and artifact.get("signature") != signature:
+            return None
+        # JSON object keys are strings; page numbers are ints everywhere else
+        artifact["pages"] = {int(index): text for index, text in artifact.get("pages", {}).items()}
+        return artifact
+
+    def put(self, content_hash, pages, page_count, text, signature, metadata=None):
+        """ Store or extend an artifact.
+
+        Pages stored earlier under the same signature are kept, so OCR results
+        accumulate; an artifact made with other settings is replaced.
+        """
+        if not self.settings["enabled"] or not content_hash:
+            return
+        existing = self.get(content_hash, signature) or {}
+        merged = dict(existing.get("pages", {}))
+        merged.update(pages)
+        artifact = {
+            "page_count": page_count,
+            "pages": {str(index): page_text for index, page_text in sorted(merged.items())},
+            "text": text if text is not None else existing.get("text"),
+            "signature": signature,
+            "metadata": dict(existing.get("metadata", {}), **(metadata or {}))
+        }
+        artifact["metadata"]["updated_at"] = time.time()
+        path = self.path(content_hash)
+        folder = os.path.dirname(path)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as file:
+                json.dump(artifact, file, ensure_ascii=False)
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"Failed to store artifact {path}: {e}")
+            return
+        self._account(path, size)
+
+    def stats(self):
+        with self.lock:
+            self._scan()
+            return {"artifacts": len(self.sizes), "bytes": self.total, "max_bytes": self.settings["max_bytes"]}
+
+    def _scan(self):
+        if self.sizes is not None:
+            return
+        self.sizes = {}
+        for root, dirs, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith(SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        self.sizes[path] = os.path.getsize(path)
+                    except OSError:
+                        pass
+        self.total = sum(self.sizes.values())
+
+    def _account(self, path, size):
+        with self.lock:
+            self._scan()
+            self.total += size - self.sizes.get(path, 0)
+            self.sizes[path] = size
+            if self.total > self.settings["max_bytes"]:
+                self._evict()
+
+    def _evict(self):
+        """ Delete least recently used artifacts until the store is back under 90% of max_bytes. """
+        target = self.settings["max_bytes"] * 0.9
+        by_age = []
+        for path in self.sizes:
+            try:
+                by_age.append((os.path.getmtime(path), path))
+            except OSError:
+                by_age.append((0, path))
+        for _, path in sorted(by_age):
+            if self.total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.total -= self.sizes.pop(path)
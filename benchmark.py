@@ -0,0 +1,333 @@
+""" End-to-end benchmark of the processing pipeline against a fake Ollama server.
+
+    python benchmark.py
+    python benchmark.py --scenarios bulk --documents 200 --latency 0.5
+    python benchmark.py --compare benchmark_results/<earlier run>.json
+
+Everything runs in a scratch folder with its own config.json, documents.db and
+a generated corpus of text-layer and image-only PDFs, so the real archive is
+never touched. Scenarios:
+
+    single   documents one at a time on an idle pipeline (latency)
+    bulk     a whole batch dropped at once (throughput)
+    history  a small batch on top of 10 .. 50k stored documents
+
+Per stage p50/p95/p99 and docs/min are printed and saved as JSON so runs on
+different commits can be compared.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from fake_ollama import FakeOllamaServer
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmark_results")
+
+WORDS = ("Rechnung Vertrag Zahlung Betrag Frist Kunde Konto Termin Schreiben Anlage Mitteilung "
+         "Bescheid Antrag Nachweis Erklärung Zeitraum Monat Jahr Summe Gebühr Adresse Straße "
+         "Unterlagen Kündigung Bestätigung Änderung Beitrag Leistung Auftrag Angebot").split()
+
+PERCENTILES = (50, 95, 99)
+
+def make_text(rng, category, index, words=300):
+    """ Filler text that mentions its category, unique per document. """
+    body = " ".join(rng.choice(WORDS) for _ in range(words))
+    return f"Dokument {index} ({rng.getrandbits(64):016x})\nBetreff: {category}\n{body}\nMit freundlichen Grüßen"
+
+def write_text_pdf(path, text):
+    import fitz  # PyMuPDF
+
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=10)
+        doc.save(path)
+
+def write_image_pdf(path, text, dpi=150):
+    """ A scanned-looking PDF: the text page rendered to a picture, without a text layer. """
+    import fitz  # PyMuPDF
+
+    with fitz.open() as source:
+        page = source.new_page()
+        page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=10)
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_image(page.rect, pixmap=pix)
+        doc.save(path)
+
+def generate_corpus(folder, count, categories, image_ratio, seed, prefix):
+    """ Write count PDFs into folder; returns [(path, expected category)]. """
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    corpus = []
+    for index in range(count):
+        category = rng.choice(categories)
+        path = os.path.join(folder, f"{prefix}_{index:05d}.pdf")
+        text = make_text(rng, category, index)
+        if rng.random() < image_ratio:
+            write_image_pdf(path, text)
+        else:
+            write_text_pdf(path, text)
+        corpus.append((path, category))
+    return corpus
+
+def make_responder(categories):
+    """ Answer like a perfect model: the category named in the document, a fixed German summary. """
+    def respond(request):
+        prompt = request.get("prompt", "")
+        for marker in ("### Document Content ###", "### Content ###"):
+            if marker in prompt:
+                content = prompt.split(marker, 1)[1].split("###", 1)[0]
+                break
+        else:
+            content = prompt
+        category = next((name for name in categories if name in content), "Uncategorized")
+        summary = f"Das Dokument betrifft {category}. Es enthält Beträge und Fristen. Es ist ein Benchmark-Dokument."
+        if request.get("format") == "json":
+            return json.dumps({"category": category, "summary": summary, "confidence": 0.9})
+        if "### Content ###" in prompt or "Summarize the document" in prompt:
+            return summary
+        return category
+    return respond
+
+def write_config(workdir, base_url, fast_classifier):
+    """ config.json for the scratch folder: the repo's settings with local output folders and the fake server. """
+    with open(os.path.join(REPO_DIR, "config.json"), "r", encoding="utf-8") as file:
+        config = json.load(file)
+    config["categories"] = {name: os.path.join(workdir, "Output", name) for name in config["categories"]}
+    config.setdefault("llm", {})["base_url"] = base_url
+    config.setdefault("fast_classifier", {})["enabled"] = fast_classifier
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as file:
+        json.dump(config, file, indent=4)
+    return list(config["categories"])
+
+def summarize(values):
+    if not values:
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    summary = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary["mean"] = float(values.mean())
+    summary["count"] = int(len(values))
+    return summary
+
+class Runner:
+    """ Drives the real pipeline inside the scratch folder and collects finished jobs. """
+    def __init__(self, categories):
+        # Imported only now: the modules read config.json and documents.db from the working directory
+        import classifier
+        import database
+        import processing
+        from metrics import metrics
+
+        self.classifier = classifier
+        self.database = database
+        self.processing = processing
+        self.metrics = metrics
+        self.categories = categories
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        # Create the Ollama clients up front so the first measured document does not pay for importing langchain
+        classifier.get_llm()
+        classifier.get_json_llm()
+
+    def on_done(self, job):
+        with self.done:
+            self.jobs.append(job)
+            self.done.notify_all()
+
+    def wait_for(self, count):
+        with self.done:
+            while len(self.jobs) < count:
+                self.done.wait()
+
+    def reset(self, history_rows, seed):
+        """ Empty the database, store history_rows synthetic documents and drop in-memory state built from it. """
+        from fast_classifier import FastClassifier
+
+        database = self.database
+        database.flush()
+        conn = database.get_connection()
+        signature = self.classifier.categories_signature(self.classifier.categories)
+        rng = random.Random(seed)
+        with conn:
+            conn.execute("DELETE FROM documents")
+            conn.execute("DELETE FROM jobs")
+            rows = []
+            for index in range(history_rows):
+                category = rng.choice(self.categories)
+                text = make_text(rng, category, index, words=80)
+                # Three sentences, about as long as the summaries the model writes
+                summary = (f"Historisches Dokument zu {category}. "
+                           + " ".join(rng.choice(WORDS) for _ in range(12)) + ". "
+                           + " ".join(rng.choice(WORDS) for _ in range(12)) + ".")
+                rows.append((f"history_{index:06d}.pdf", category, category, summary,
+                             hashlib.sha256(text.encode("utf-8")).hexdigest(), text, signature, time.time()))
+            conn.executemany(self.classifier.UPSERT_DOCUMENT_SQL, rows)
+        self.classifier.forget_history()
+        self.classifier.fast_classifier = FastClassifier(self.classifier.fast_classifier_settings,
+                                                         self.classifier.fetch_training_documents)
+
+    def run(self, corpus, one_at_a_time=False):
+        """ Push the corpus through the job queue and pipeline; returns the scenario result. """
+        self.jobs = []
+        self.metrics.reset()
+        pipeline, dispatcher = self.processing.create_job_queue(self.on_done)
+        pipeline.start()
+        dispatcher.start()
+        started = time.monotonic()
+        for index, (path, category) in enumerate(corpus):
+            dispatcher.add(path)
+            if one_at_a_time:
+                self.wait_for(index + 1)
+        self.wait_for(len(corpus))
+        seconds = time.monotonic() - started
+        dispatcher.stop()
+        pipeline.stop()
+        self.database.flush()
+        return self.report(corpus, seconds)
+
+    def report(self, corpus, seconds):
+        expected = {os.path.abspath(path): category for path, category in corpus}
+        failed = [job for job in self.jobs if job.error is not None]
+        correct = sum(1 for job in self.jobs if job.error is None and job.category == expected.get(job.file_path))
+        stage_names = sorted({name for job in self.jobs for name in job.stage_seconds})
+        # Per LLM call, aggregated over the call kinds, from the histograms the gateway fills
+        llm = {}
+        for (name, labels), stats in self.metrics.snapshot().items():
+            if name in ("pdf_llm_ttft_seconds", "pdf_llm_prompt_tokens", "pdf_llm_prompt_chars"):
+                key = f"{name.replace('pdf_llm_', '')}_{dict(labels).get('call', 'llm')}"
+                llm[key] = {"count": stats["count"], "mean": stats["mean"], "p50": stats["p50"], "p95": stats["p95"]}
+        return {
+            "documents": len(self.jobs),
+            "failed": len(failed),
+            "errors": sorted({str(job.error) for job in failed})[:5],
+            "accuracy": correct / len(self.jobs) if self.jobs else 0.0,
+            "seconds": seconds,
+            "docs_per_minute": len(self.jobs) / seconds * 60 if seconds > 0 else 0.0,
+            "total": summarize([job.elapsed() for job in self.jobs]),
+            "stages": {name: summarize([job.stage_seconds[name] for job in self.jobs if name in job.stage_seconds])
+                       for name in stage_names},
+            "waits": {name: summarize([job.wait_seconds[name] for job in self.jobs if name in job.wait_seconds])
+                      for name in stage_names},
+            "llm": llm,
+        }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def format_ms(summary):
+    if summary is None:
+        return "-"
+    return " / ".join(f"{summary[f'p{p}'] * 1000:.0f}" for p in PERCENTILES)
+
+def print_scenario(name, result, baseline=None):
+    line = (f"{name:<14} {result['documents']:>5} docs  {result['docs_per_minute']:8.1f} docs/min  "
+            f"{result['failed']} failed  accuracy {result['accuracy']:.0%}")
+    if baseline is not None and baseline.get("docs_per_minute"):
+        change = result["docs_per_minute"] / baseline["docs_per_minute"] - 1
+        line += f"  ({change:+.0%} docs/min vs. baseline)"
+    print(line)
+    print(f"    {'total':<10} p50/p95/p99 ms {format_ms(result['total'])}")
+    for stage, summary in result["stages"].items():
+        print(f"    {stage:<10} p50/p95/p99 ms {format_ms(summary)}   queued {format_ms(result['waits'].get(stage))}")
+    for key, stats in sorted(result.get("llm", {}).items()):
+        value = f"{stats['mean'] * 1000:.0f} ms" if key.startswith("ttft") else f"{stats['mean']:.0f}"
+        print(f"    {key:<24} mean {value} over {stats['count']} calls")
+    for error in result["errors"]:
+        print(f"    error: {error}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with a fake Ollama server")
+    parser.add_argument("--scenarios", nargs="+", default=["single", "bulk", "history"],
+                        choices=["single", "bulk", "history"])
+    parser.add_argument("--documents", type=int, default=100, help="documents in the bulk scenario")
+    parser.add_argument("--single-documents", type=int, default=10)
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[10, 1000, 10000, 50000])
+    parser.add_argument("--history-documents", type=int, default=20, help="documents per history size")
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="share of image-only PDFs (need tesseract)")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake LLM time to first token in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0,
+                        help="fake prompt evaluation speed; text shared with the previous prompt is free")
+    parser.add_argument("--fast-classifier", action="store_true", help="keep the local fast path enabled")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", help="scratch folder (default: a new temporary folder, removed afterwards)")
+    parser.add_argument("--output", help="JSON results file (default: benchmark_results/<commit>-<time>.json)")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args(argv)
+
+    if args.image_ratio > 0 and shutil.which("tesseract") is None:
+        print("tesseract not found, generating text-layer PDFs only.")
+        args.image_ratio = 0.0
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)["scenarios"]
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="pdf-benchmark-"))
+    os.makedirs(workdir, exist_ok=True)
+    server = FakeOllamaServer(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+                              prefill_tokens_per_second=args.prefill_tokens_per_second)
+    categories = write_config(workdir, server.base_url, args.fast_classifier)
+    server.responder = make_responder(categories)
+    server.start()
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "options": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "workdir")},
+        "scenarios": {}
+    }
+    try:
+        runner = Runner(categories)
+        plan = []
+        if "single" in args.scenarios:
+            plan.append(("single", args.single_documents, 100, True))
+        if "bulk" in args.scenarios:
+            plan.append(("bulk", args.documents, 100, False))
+        if "history" in args.scenarios:
+            plan.extend((f"history_{size}", args.history_documents, size, False) for size in args.history_sizes)
+        for number, (name, count, history, one_at_a_time) in enumerate(plan):
+            corpus = generate_corpus(os.path.join(workdir, "Input"), count, categories, args.image_ratio,
+                                     args.seed * 1000 + number, name)
+            runner.reset(history, args.seed)
+            requests_before = server.requests
+            result = runner.run(corpus, one_at_a_time)
+            result["history_rows"] = history
+            result["llm_requests"] = server.requests - requests_before
+            results["scenarios"][name] = result
+            print_scenario(name, result, baseline.get(name))
+    finally:
+        os.chdir(previous_dir)
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+    print(f"Results saved to {output}")
+
+if __name__ == "__main__":
+    main()
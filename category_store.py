@@ -0,0 +1,109 @@
+""" The categories table: stable ids, folders and aliases for the categories of config.json.
+
+Documents reference their category by id. Renaming a category therefore
+updates one row, and the old name stays behind as an alias that still
+resolves, e.g. in queued writes, searches and reclassify --category. Deleting
+only marks the row, so the documents keep their category until they are
+reclassified.
+
+config.json stays the place where categories are edited; sync() mirrors it
+into the table after every change.
+"""
+import os
+import time
+
+import database
+
+UNCATEGORIZED = "Uncategorized"
+UNCATEGORIZED_FOLDER = os.path.join('Output', 'Uncategorized')
+
+# Category id for a name or alias; bind the name twice
+CATEGORY_ID_SQL = '''(
+    SELECT id FROM categories WHERE name = ?
+    UNION ALL SELECT category_id FROM category_aliases WHERE alias = ?
+    LIMIT 1
+)'''
+
+ENSURE_CATEGORY_SQL = '''
+    INSERT INTO categories (name, created_at, updated_at)
+    SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM category_aliases WHERE alias = ?)
+    ON CONFLICT(name) DO NOTHING
+'''
+
+UPSERT_CATEGORY_SQL = '''
+    INSERT INTO categories (name, folder, created_at, updated_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(name) DO UPDATE SET folder = excluded.folder, deleted_at = NULL, updated_at = excluded.updated_at
+    WHERE folder IS NOT excluded.folder OR deleted_at IS NOT NULL
+'''
+
+def ensure_category(name):
+    """ Queue the creation of a category row for a name that is neither a category nor an alias yet. """
+    now = time.time()
+    database.submit_write(ENSURE_CATEGORY_SQL, (name, now, now, name))
+
+def sync(folders):
+    """ Mirror {name: folder} from config.json into the table through the background writer.
+
+    Categories missing from config.json are marked deleted; Uncategorized
+    always exists. A rename must go through rename() first, or it shows up
+    here as a deletion plus a new category.
+    """
+    now = time.time()
+    folders = dict(folders)
+    folders.setdefault(UNCATEGORIZED, UNCATEGORIZED_FOLDER)
+    for name, folder in folders.items():
+        database.submit_write(UPSERT_CATEGORY_SQL, (name, str(folder), now, now))
+    placeholders = ", ".join("?" for _ in folders)
+    database.submit_write(f'UPDATE categories SET deleted_at = ?, updated_at = ? '
+                          f'WHERE deleted_at IS NULL AND name NOT IN ({placeholders})',
+                          (now, now, *folders))
+
+def rename(old_name, new_name, folder):
+    """ Rename a category in place; its documents follow without being touched.
+
+    If new_name belongs to a deleted category, that category's documents are
+    merged into the renamed one first.
+    """
+    now = time.time()
+    database.flush()  # writes queued under the old name go in before it becomes an alias
+    conn = database.get_connection()
+    with conn:
+        row = conn.execute('SELECT id FROM categories WHERE name = ?', (old_name,)).fetchone()
+        if row is None:
+            cursor = conn.execute('INSERT INTO categories (name, created_at, updated_at) VALUES (?, ?, ?)',
+                                  (old_name, now, now))
+            category_id = cursor.lastrowid
+        else:
+            category_id = row[0]
+        existing = conn.execute('SELECT id FROM categories WHERE name = ? AND id != ?',
+                                (new_name, category_id)).fetchone()
+        if existing is not None:
+            conn.execute('UPDATE documents SET category_id = ? WHERE category_id = ?', (category_id, existing[0]))
+            conn.execute('UPDATE category_aliases SET category_id = ? WHERE category_id = ?',
+                         (category_id, existing[0]))
+            conn.execute('DELETE FROM categories WHERE id = ?', (existing[0],))
+        conn.execute('DELETE FROM category_aliases WHERE alias = ?', (new_name,))
+        if old_name.lower() != new_name.lower():
+            conn.execute('INSERT OR REPLACE INTO category_aliases (alias, category_id) VALUES (?, ?)',
+                         (old_name, category_id))
+        conn.execute('UPDATE categories SET name = ?, folder = ?, deleted_at = NULL, updated_at = ? WHERE id = ?',
+                     (new_name, str(folder), now, category_id))
+
+def delete(name):
+    """ Mark a category deleted; its documents keep pointing at it. """
+    now = time.time()
+    database.submit_write('UPDATE categories SET deleted_at = ?, updated_at = ? WHERE name = ?', (now, now, name))
+
+def names_and_aliases():
+    """ (id, name) for every category name and alias, deleted categories included. """
+    return database.query('SELECT id, name FROM categories UNION ALL SELECT category_id, alias FROM category_aliases')
+
+def category_ids(names):
+    """ Ids of the categories with these names or aliases. """
+    if not names:
+        return []
+    placeholders = ", ".join("?" for _ in names)
+    rows = database.query(f'SELECT id FROM categories WHERE name IN ({placeholders}) '
+                          f'UNION SELECT category_id FROM category_aliases WHERE alias IN ({placeholders})',
+                          (*names, *names))
+    return [category_id for category_id, in rows]
@@ -1,129 +1,402 @@
-import sqlite3
-from langchain_ollama import OllamaLLM
+import database
+import category_store
 import json
 import os
-from utils_json import read_json_file, write_json_file, initialize_data, get_categories, get_category_folder, add_new_category, update_category_folder, update_category_name_and_folder, delete_category
+import hashlib
+import threading
+import time
+from utils_json import write_json_file, get_categories, get_category_folder, add_new_category, update_category_folder, update_category_name_and_folder, delete_category, get_settings, get_registry
+from retrieval import SummaryIndex, RETRIEVAL_DEFAULTS
+from fast_classifier import FastClassifier, FAST_CLASSIFIER_DEFAULTS
+from llm_gateway import LLMGateway, GATEWAY_DEFAULTS
+from metrics import span
 
-# Ensure necessary NLTK resources are downloaded
-""" Use the LLaMA model to categorize the document. """
-llm = OllamaLLM(model="llama3.1")
+LLM_DEFAULTS = {
+    "model": "llama3.1",
+    "base_url": None,  # None = the Ollama default (http://localhost:11434)
+    "mode": "combined",  # "combined" = one JSON call, "separate" = categorize and summarize separately
+    "summary_sentences": 3,
+    "keep_alive": "30m",  # how long Ollama keeps the model loaded after the last request
+    "warm_up": True,
+    "num_ctx": 8192,  # fixed context size; a changing num_ctx reloads the model, a too small one cuts the prefix
+    "history_per_category": 3,  # examples per category in the shared prompt prefix
+    "history_refresh": 3600,  # seconds before the history snapshot in the prefix is rebuilt
+    "similar_documents": False  # also add the most similar stored documents after the prefix (never cached)
+}
 
 def setup_database():
     """ Set up SQLite database """
-    conn = sqlite3.connect('documents.db')
-    c = conn.cursor()
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS documents (
-        filename TEXT UNIQUE,
-        category TEXT,
-        summary TEXT
-    )
-    ''')
-    conn.commit()
-    conn.close()
+    database.get_connection()
 
 def load_config(CONFIG_PATH):
     """ Load the configuration from a JSON file. """
-    config = None
-    if not os.path.exists(CONFIG_PATH):
-        config = initialize_data(CONFIG_PATH)
-    else:
-        config = read_json_file(CONFIG_PATH)
-    return config
+    return get_registry(CONFIG_PATH).get_data()
 
-setup_database()
 config = load_config("config.json")
 # Access the categories array
 categories = get_categories(config)
-    
+
+def refresh_categories(data):
+    """ Registry listener: keep the shared categories list and the categories table in step with config.json. """
+    categories[:] = get_categories(data)
+    category_store.sync(data.get("categories", {}))
+
+config_registry = get_registry("config.json")
+config_registry.add_listener(refresh_categories)
+retrieval_settings = get_settings(config, "retrieval", RETRIEVAL_DEFAULTS)
+llm_settings = get_settings(config, "llm", LLM_DEFAULTS)
+fast_classifier_settings = get_settings(config, "fast_classifier", FAST_CLASSIFIER_DEFAULTS)
+gateway_settings = get_settings(config, "llm_gateway", GATEWAY_DEFAULTS)
+
+def create_llm(**kwargs):
+    """ Build an Ollama client for the configured model and server. """
+    # langchain takes most of a second to import, so it is only loaded once a client is needed
+    from langchain_ollama import OllamaLLM
+
+    if llm_settings["base_url"]:
+        kwargs["base_url"] = llm_settings["base_url"]
+    if llm_settings["num_ctx"]:
+        kwargs["num_ctx"] = llm_settings["num_ctx"]
+    return OllamaLLM(model=llm_settings["model"], keep_alive=llm_settings["keep_alive"], **kwargs)
+
+llm = None
+json_llm = None
+llm_lock = threading.Lock()
+
+def get_llm():
+    """ Use the LLaMA model to categorize the document (client created on first use). """
+    global llm
+    with llm_lock:
+        if llm is None:
+            llm = create_llm()
+    return llm
+
+def get_json_llm():
+    """ Same model constrained to JSON output, used for the single-call categorize+summarize mode. """
+    global json_llm
+    with llm_lock:
+        if json_llm is None:
+            json_llm = create_llm(format="json")
+    return json_llm
+
+# Every request goes through the gateway, which bounds concurrency and enforces deadlines
+gateway = LLMGateway(gateway_settings)
+
+def warm_up():
+    """ Load the model into Ollama in the background so the first document does not wait for it.
+
+    An empty prompt makes Ollama load the model and return without generating;
+    keep_alive then holds it in memory between documents.
+    """
+    def run():
+        started = time.monotonic()
+        try:
+            gateway.invoke(get_llm(), "")
+            print(f"Model {llm_settings['model']} warmed up in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+    if llm_settings["warm_up"]:
+        threading.Thread(target=run, name="llm-warm-up", daemon=True).start()
+
+summary_index = None
+summary_index_lock = threading.Lock()
+
+history_snapshot = {"text": None, "built_at": 0.0, "signature": None}
+history_lock = threading.Lock()
+
+# Kept as module constants so every call reuses the connection's cached prepared statement
+FIND_CACHED_RESULT_SQL = '''
+    SELECT c.name, d.summary, d.extracted_text FROM documents d
+    JOIN categories c ON c.id = d.category_id
+    WHERE d.content_hash = ? AND d.categories_signature = ? AND d.summary IS NOT NULL
+    ORDER BY d.id DESC LIMIT 1
+'''
+
+# Use UPSERT functionality to update existing records or insert new ones; the category is given by name
+UPSERT_DOCUMENT_SQL = f'''
+    INSERT INTO documents (filename, category_id, summary, content_hash, extracted_text, categories_signature,
+                           classified_at)
+    VALUES (?, {category_store.CATEGORY_ID_SQL}, ?, ?, ?, ?, ?)
+    ON CONFLICT(filename) DO UPDATE SET
+    category_id=excluded.category_id, summary=excluded.summary,
+    content_hash=COALESCE(excluded.content_hash, content_hash),
+    extracted_text=COALESCE(excluded.extracted_text, extracted_text),
+    categories_signature=excluded.categories_signature,
+    classified_at=excluded.classified_at
+'''
+
+UPDATE_DOCUMENT_PATH_SQL = 'UPDATE documents SET path = ? WHERE filename = ?'
+
+# The newest summaries of every category, in a stable order
+HISTORY_SNAPSHOT_SQL = '''
+    SELECT c.name, d.summary FROM (
+        SELECT category_id, summary, id,
+               ROW_NUMBER() OVER (PARTITION BY category_id ORDER BY id DESC) AS position
+        FROM documents WHERE summary IS NOT NULL
+    ) d
+    JOIN categories c ON c.id = d.category_id
+    WHERE d.position <= ?
+    ORDER BY c.name, d.id
+'''
+
+def forget_history():
+    """ Drop the history snapshot and the similarity index; both are rebuilt from the table on next use. """
+    global summary_index
+    with history_lock:
+        history_snapshot["text"] = None
+    with summary_index_lock:
+        summary_index = None
+
+def categories_signature(categories):
+    """ Fingerprint of the category set; cached results are only valid for the set they were made with. """
+    return hashlib.sha256('\n'.join(sorted(categories)).encode('utf-8')).hexdigest()
+
+def find_cached_result(content_hash):
+    """ Return (category, summary, extracted_text) of an earlier identical document, or None.
+
+    A cached result is ignored once the categories in config.json have changed,
+    since the document might belong to a category that did not exist back then.
+    """
+    if not content_hash:
+        return None
+    with span("cache_lookup"):
+        return database.query_one(FIND_CACHED_RESULT_SQL, (content_hash, categories_signature(categories)))
+
 def fetch_all_categories_and_summaries():
     """ Fetch all categories and summaries from the database. """
-    conn = sqlite3.connect('documents.db')
-    c = conn.cursor()
-    c.execute('SELECT category, summary FROM documents')
-    all_data = c.fetchall()
-    conn.close()
-    return all_data
-    
-def create_prompt(content, categories):
-    """ Generate a detailed prompt for the model including references to historical data. """
-    all_data = fetch_all_categories_and_summaries()
-    historical_context = ""
-    for category, summary in all_data:
-        historical_context += f"Summary: {summary}, Category: {category}\n"
-        
-    categories_str = ', '.join(categories)
-    prompt = f"""
-    ### Historical Data ###
-    Below is historical context to aid in categorization:
-    {historical_context}
-    
-    ### Task ###
-    You are a categorization expert. Analyze the provided document content and determine the most appropriate german category. 
-    Categorize the provided document content based on the following predefined german categories:
-    {categories_str}
+    return database.query('SELECT c.name, d.summary FROM documents d LEFT JOIN categories c ON c.id = d.category_id')
+
+def fetch_all_documents():
+    """ Fetch filename, category and summary of every stored document. """
+    return database.query('SELECT d.filename, c.name, d.summary FROM documents d '
+                          'LEFT JOIN categories c ON c.id = d.category_id')
 
-    Provide your answer as the german category name only. If no suitable category is found, respond with 'Uncategorized'.
+def fetch_training_documents():
+    """ Fetch (text, category) pairs for the fast classifier, preferring the full extracted text. """
+    return database.query('SELECT COALESCE(d.extracted_text, d.summary), c.name FROM documents d '
+                          'JOIN categories c ON c.id = d.category_id')
 
-    ### Document Content ###
-    {content}
+fast_classifier = FastClassifier(fast_classifier_settings, fetch_training_documents)
 
-    ### Categories ###
-    {categories_str}
+def get_summary_index():
+    """ Build the similarity index over the stored summaries on first use. """
+    global summary_index
+    with summary_index_lock:
+        if summary_index is None:
+            index = SummaryIndex(retrieval_settings["dimensions"])
+            index.build(fetch_all_documents())
+            summary_index = index
+    return summary_index
 
-    ### Instruction ###
-    Provide your answer as the german category name only without any additional text.
+def get_history_snapshot():
+    """ Example summaries per category for the shared prompt prefix.
+
+    The text stays byte-identical until history_refresh seconds have passed or
+    the categories change, so consecutive prompts keep a common prefix.
     """
-    return prompt
+    signature = categories_signature(categories)
+    with history_lock:
+        age = time.monotonic() - history_snapshot["built_at"]
+        if history_snapshot["text"] is None or age > llm_settings["history_refresh"] \
+                or history_snapshot["signature"] != signature:
+            rows = database.query(HISTORY_SNAPSHOT_SQL, (llm_settings["history_per_category"],))
+            known = set(categories)
+            history_snapshot["text"] = "".join(f"Summary: {summary}, Category: {category}\n"
+                                               for category, summary in rows if category in known)
+            history_snapshot["built_at"] = time.monotonic()
+            history_snapshot["signature"] = signature
+        return history_snapshot["text"]
+
+def create_prompt_prefix(categories):
+    """ Instructions, categories and history snapshot: the part shared by every prompt.
+
+    Ollama keeps the KV cache of the previous prompt, so when consecutive
+    prompts start with the same text only the rest has to be evaluated.
+    Everything that depends on the document therefore comes after this prefix.
+    """
+    categories_str = ', '.join(categories)
+    return (
+        f"### Role ###\n"
+        f"You are a categorization expert and an expert summarizer for german documents.\n"
+        f"### Categories ###\n"
+        f"The predefined german categories are: {categories_str}\n"
+        f"If no suitable category is found, the category is 'Uncategorized'.\n"
+        f"### Historical Data ###\n"
+        f"Below is historical context to aid in categorization:\n"
+        f"{get_history_snapshot()}"
+    )
+
+def create_similar_documents_block(content):
+    """ Per-document examples; placed after the shared prefix since they differ for every document. """
+    if not llm_settings["similar_documents"]:
+        return ""
+    return f"### Similar Documents ###\n{build_historical_context(content)}"
+
+def build_historical_context(content):
+    """ Format the stored documents most similar to the content as prompt examples. """
+    # Only the most similar past documents go into the prompt, so its size no longer grows with the archive
+    examples = get_summary_index().select(content[:retrieval_settings["query_chars"]],
+                                          retrieval_settings["top_k"], retrieval_settings["per_category"])
+    historical_context = ""
+    for category, summary in examples:
+        historical_context += f"Summary: {summary}, Category: {category}\n"
+    return historical_context
+
+def create_prompt(content, categories):
+    """ Generate a detailed prompt for the model including references to historical data. """
+    return (
+        f"{create_prompt_prefix(categories)}"
+        f"{create_similar_documents_block(content)}"
+        f"### Task ###\n"
+        f"Analyze the document content below and determine the most appropriate german category.\n"
+        f"### Document Content ###\n"
+        f"{content.strip()}\n"
+        f"### Instruction ###\n"
+        f"Provide your answer as the german category name only without any additional text.\n"
+    )
 
 def categorize_document(content):
-    
-    prompt = create_prompt(content, categories)
-    response = llm.invoke(prompt)
-    return response.strip()
+    """ The configured category the LLM picks for the content; Uncategorized if its answer names none. """
+    with span("prompt"):
+        prompt = create_prompt(content, categories)
+    with span("llm_categorize"):
+        response = gateway.invoke(get_llm(), prompt, call="categorize")
+    return match_category(response, categories)
 
 def create_summary_prompt(content, num_sentences):
     """
     Create a prompt for generating a concise summary of the given text.
     """
+    # Starts with the shared prefix too, so a summary request does not evict the cached prefix
     return (
-        f"### Instruction ###\n"
-        f"You are an expert summarizer. Your task is to summarize the given content into exactly {num_sentences} sentences in german. "
+        f"{create_prompt_prefix(categories)}"
+        f"### Task ###\n"
+        f"Summarize the document content below into exactly {num_sentences} sentences in german. "
         f"If the content contains dates, ensure they are preserved and incorporated effectively in the summary. "
         f"Your german summary should be concise, accurate, and encapsulate the main points clearly in german.\n"
-        f"### Content ###\n"
+        f"### Document Content ###\n"
         f"{content.strip()}\n"
+        f"### Instruction ###\n"
+        f"Provide the german summary only without any additional text.\n"
     )
 
 
 def get_summary(content, num_sentences=3):
     """ Generate a summary"""
     prompt = create_summary_prompt(content, num_sentences)
-    response = llm.invoke(prompt)
+    with span("llm_summary"):
+        response = gateway.invoke(get_llm(), prompt, call="summary")
     return response.strip()
     return summary
 
-def save_document_info(filename, category, summary):
-    """ Save or update document information in the database based on filename """
-    conn = sqlite3.connect('documents.db')
-    c = conn.cursor()
-    # Use UPSERT functionality to update existing records or insert new ones
-    c.execute('''
-    INSERT INTO documents (filename, category, summary) VALUES (?, ?, ?)
-    ON CONFLICT(filename) DO UPDATE SET
-    category=excluded.category, summary=excluded.summary
-    ''', (filename, category, summary))
-    conn.commit()
-    conn.close()
+def create_combined_prompt(content, categories, num_sentences):
+    """ Generate one prompt that asks for category, summary and confidence as JSON. """
+    return (
+        f"{create_prompt_prefix(categories)}"
+        f"{create_similar_documents_block(content)}"
+        f"### Task ###\n"
+        f"Analyze the document content below and\n"
+        f"1. determine the most appropriate german category from the predefined german categories.\n"
+        f"2. summarize the content into exactly {num_sentences} sentences in german. If the content contains dates, preserve them in the summary.\n"
+        f"3. rate how confident you are in the category with a number between 0 and 1.\n"
+        f"### Document Content ###\n"
+        f"{content.strip()}\n"
+        f"### Instruction ###\n"
+        f"Respond with a JSON object only, in exactly this form:\n"
+        f'{{"category": "<category name>", "summary": "<german summary>", "confidence": <number between 0 and 1>}}\n'
+    )
+
+def match_category(answer, categories):
+    """ The configured category an LLM answer names (case-insensitive), otherwise Uncategorized. """
+    known = {name.lower(): name for name in categories}
+    return known.get(answer.strip().lower(), "Uncategorized")
+
+def parse_combined_response(response, categories):
+    """ Validate the JSON answer of the combined prompt; raises ValueError if it is unusable. """
+    data = json.loads(response)
+    if not isinstance(data, dict):
+        raise ValueError("Response is not a JSON object")
+    category = data.get("category")
+    summary = data.get("summary")
+    if not isinstance(category, str) or not isinstance(summary, str) or not summary.strip():
+        raise ValueError("Response is missing category or summary")
+    category = match_category(category, categories)
+    try:
+        confidence = min(1.0, max(0.0, float(data.get("confidence", 0.0))))
+    except (TypeError, ValueError):
+        confidence = 0.0
+    return category, summary.strip(), confidence
 
-def process_document(filename, content):
+def categorize_and_summarize(content):
+    """ Categorize and summarize in a single LLM call, falling back to two calls on a malformed answer. """
+    with span("prompt"):
+        prompt = create_combined_prompt(content, categories, llm_settings["summary_sentences"])
+    with span("llm_combined"):
+        response = gateway.invoke(get_json_llm(), prompt, call="combined")
+    try:
+        return parse_combined_response(response, categories)
+    except ValueError as e:  # json.JSONDecodeError is a ValueError too
+        print(f"Combined response could not be used ({e}), falling back to separate calls.")
+        return categorize_document(content), get_summary(content, llm_settings["summary_sentences"]), None
+
+def save_document_info(filename, category, summary, content_hash=None, extracted_text=None, train=True):
+    """ Save or update document information in the database based on filename
+
+    With train=True the classification also teaches the fast classifier; pass
+    False for results that did not come from the LLM or a user.
+    """
+    with span("db_save"):
+        # Queued on the background writer, which commits upserts from all workers in grouped transactions
+        category_store.ensure_category(category)
+        database.submit_write(UPSERT_DOCUMENT_SQL, (filename, category, category, summary, content_hash,
+                                                    extracted_text, categories_signature(categories), time.time()))
+        if summary_index is not None:
+            summary_index.add(filename, category, summary)
+        if train:
+            fast_classifier.learn(extracted_text or summary, category)
+
+def save_document_path(filename, path):
+    """ Remember where a document was filed, so later runs find it without searching the category folders. """
+    # Queued after the document's upsert, so the row exists by the time this runs
+    database.submit_write(UPDATE_DOCUMENT_PATH_SQL, (os.path.abspath(path), filename))
+
+def process_document(filename, content, content_hash=None, category_hint=None):
     """ Process the document to categorize and summarize """
-    category = categorize_document(content)
-    summary = get_summary(content)
-    save_document_info(filename, category, summary)
-    print(f"Processed {filename} categorized as {category} with summary: {summary}")
+    category, summary, train = classify_document(filename, content, category_hint)
+    save_document_info(filename, category, summary, content_hash, content, train)
     return category
 
+def classify_document(filename, content, category_hint=None):
+    """ Categorize and summarize without saving; returns (category, summary, train).
+
+    train tells save_document_info whether the fast classifier may learn from
+    the result. category_hint (e.g. from the watched folder the file came from)
+    is used when the document would otherwise end up Uncategorized.
+    """
+    config_registry.refresh()  # Cheap stat(); picks up category edits made by the GUI or by hand
+    with span("fast_classifier"):
+        fast_result = fast_classifier.predict(content, categories)
+    if fast_result is not None:
+        # Confident local prediction: only the summary still needs the LLM
+        category, confidence = fast_result
+        summary = get_summary(content, llm_settings["summary_sentences"])
+        print(f"Processed {filename} categorized locally as {category} (confidence: {confidence:.2f}) with summary: {summary}")
+        return category, summary, False
+    if llm_settings["mode"] == "combined":
+        category, summary, confidence = categorize_and_summarize(content)
+    else:
+        category = categorize_document(content)
+        summary = get_summary(content, llm_settings["summary_sentences"])
+        confidence = None
+    # The hint is checked again here, since categories can change while the folders are watched
+    hinted = category_hint is not None and match_category(category, categories) == "Uncategorized" \
+        and match_category(category_hint, categories) != "Uncategorized"
+    if hinted:
+        category = match_category(category_hint, categories)
+    print(f"Processed {filename} categorized as {category} (confidence: {confidence}) with summary: {summary}")
+    # A hinted category is the folder's guess, not the model's, so the fast classifier does not learn from it
+    return category, summary, not hinted
+
 # if __name__ == "__main__":
     
 #     filename = "Independant_Contract_NDA.pdf"
@@ -0,0 +1,284 @@
+""" Headless entry point for servers and containers (no tkinter, customtkinter or pygame).
+
+    python cli.py watch [--input FOLDER [--input FOLDER...]] [--recursive]
+    python cli.py process <paths...>
+    python cli.py reindex
+    python cli.py reclassify (--all | --stale | --category NAME... | --files NAME... | --resume)
+    python cli.py status
+
+Exit codes: 0 success, 1 some documents failed, 2 usage error, 130 interrupted.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+def log(message, msg_type="INFO"):
+    timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
+    print(f"{timestamp} {msg_type:<7} {message}", flush=True)
+
+class Progress:
+    """ Counts finished jobs and prints one line per document with the running throughput. """
+    def __init__(self, total=None):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def on_done(self, job):
+        with self.lock:
+            self.done += 1
+            if job.error is not None:
+                self.failed += 1
+            count = f"{self.done}/{self.total}" if self.total else str(self.done)
+            rate = self.rate()
+        msg_type = "ERROR" if job.error is not None else "INFO"
+        log(f"[{count}] {job.result} ({job.elapsed():.1f}s, {rate:.1f} docs/min)", msg_type)
+        if self.total and self.done >= self.total:
+            self.finished.set()
+
+    def rate(self):
+        minutes = (time.monotonic() - self.started) / 60
+        return self.done / minutes if minutes > 0 else 0.0
+
+    def summary(self):
+        seconds = time.monotonic() - self.started
+        return (f"Processed {self.done} documents in {seconds:.1f}s "
+                f"({self.rate():.1f} docs/min), {self.failed} failed")
+
+def collect_pdfs(paths):
+    """ Expand folders to the PDFs directly inside them. """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith('.pdf'))
+        elif os.path.isfile(path):
+            files.append(path)
+        else:
+            log(f"No such file or folder: {path}", "ERROR")
+    return files
+
+def install_stop_handler(stop):
+    """ Let SIGTERM (systemd stop) end the run like Ctrl+C does. """
+    def handle(signum, frame):
+        stop.set()
+    signal.signal(signal.SIGTERM, handle)
+
+def command_process(args):
+    from processing import create_pipeline, ocr_engine
+    from classifier import warm_up
+    from metrics import MetricsExporter
+
+    files = collect_pdfs(args.paths)
+    if not files:
+        log("Nothing to process.", "WARNING")
+        return EXIT_USAGE
+    progress = Progress(len(files))
+    warm_up()
+    exporter = MetricsExporter()
+    exporter.start()
+    pipeline = create_pipeline(progress.on_done)
+    stop = threading.Event()
+    install_stop_handler(stop)
+    pipeline.start()
+    try:
+        for file_path in files:
+            if stop.is_set():
+                break
+            pipeline.submit(file_path)
+        while not progress.finished.is_set() and not stop.is_set():
+            progress.finished.wait(0.5)
+    except KeyboardInterrupt:
+        log("Interrupted.", "WARNING")
+        return EXIT_INTERRUPTED
+    if stop.is_set():
+        log("Stopped before all documents were processed.", "WARNING")
+        return EXIT_INTERRUPTED
+    pipeline.stop()
+    exporter.stop()
+    log(progress.summary())
+    log(ocr_engine.report())
+    return EXIT_FAILURES if progress.failed else EXIT_OK
+
+def command_watch(args):
+    from watchdog.observers import Observer
+    from processing import create_job_queue, schedule_watch_folders, config_registry, ocr_engine
+    from readiness import FileReadinessDetector, READINESS_DEFAULTS
+    from utils_json import get_settings
+    from classifier import warm_up
+    from metrics import MetricsExporter
+    from watch_folders import load_watch_folders, watch_folder
+
+    if args.input:
+        for folder in args.input:
+            if not os.path.isdir(folder):
+                log(f"Input folder does not exist: {folder}", "ERROR")
+                return EXIT_USAGE
+        folders = [watch_folder({"path": folder, "recursive": args.recursive}) for folder in args.input]
+    else:
+        folders = load_watch_folders(config_registry.get_data())
+    progress = Progress()
+    warm_up()
+    exporter = MetricsExporter()
+    pipeline, dispatcher = create_job_queue(progress.on_done)
+    readiness_settings = get_settings(config_registry.get_data(), "readiness", READINESS_DEFAULTS)
+    readiness = FileReadinessDetector(dispatcher.add, readiness_settings,
+                                      on_timeout=lambda path: log(f"{path} was never completely written, skipped.", "WARNING"))
+    observer = Observer()
+    schedule_watch_folders(observer, folders, readiness, log)
+    stop = threading.Event()
+    install_stop_handler(stop)
+    pipeline.start()
+    exporter.start()
+    dispatcher.start(folders, readiness.watch)
+    readiness.start()
+    observer.start()
+    for folder in folders:
+        log(f"Monitoring {folder['path']}{' and its subfolders' if folder['recursive'] else ''}...")
+    interrupted = False
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        interrupted = True
+    log("Stopping, finishing queued documents...")
+    observer.stop()
+    observer.join()
+    readiness.stop()
+    dispatcher.stop()
+    pipeline.stop()
+    exporter.stop()
+    log(progress.summary())
+    log(ocr_engine.report())
+    return EXIT_INTERRUPTED if interrupted else EXIT_OK
+
+def command_reindex(args):
+    import database
+    from search import rebuild_index
+    from artifact_store import ArtifactStore, ARTIFACT_DEFAULTS
+    from utils_json import get_settings, get_registry
+
+    started = time.monotonic()
+    count = database.query_one('SELECT COUNT(*) FROM documents')[0]
+    artifacts = ArtifactStore(get_settings(get_registry('config.json').get_data(), "artifacts", ARTIFACT_DEFAULTS))
+    rebuild_index(artifacts)
+    database.execute('ANALYZE')
+    log(f"Reindexed {count} documents in {time.monotonic() - started:.1f}s")
+    return EXIT_OK
+
+def command_reclassify(args):
+    from reclassify import Reclassifier, RECLASSIFY_DEFAULTS, select_documents, progress, PENDING, DONE, FAILED
+    from processing import config_registry
+    from utils_json import get_settings
+    from classifier import warm_up
+
+    settings = get_settings(config_registry.get_data(), "reclassify", RECLASSIFY_DEFAULTS)
+    if args.workers:
+        settings["workers"] = args.workers
+    if args.resummarize:
+        settings["resummarize"] = True
+    reclassifier = Reclassifier(settings, log)
+    if args.resume:
+        if args.retry_failed:
+            log(f"Retrying {reclassifier.retry_failed()} failed documents.")
+        pending = progress().get(PENDING, 0)
+        if not pending:
+            log("Nothing to resume.", "WARNING")
+            return EXIT_OK
+        log(f"Resuming: {pending} documents pending.")
+    else:
+        filenames = select_documents(args.all, args.stale, args.category, args.files)
+        pending = reclassifier.start(filenames)
+        log(f"Selected {pending} documents.")
+        if not pending:
+            return EXIT_OK
+
+    def report(counts, rate):
+        finished = counts.get(DONE, 0) + counts.get(FAILED, 0)
+        log(f"[{finished}/{finished + counts.get(PENDING, 0)}] {counts.get(FAILED, 0)} failed, {rate:.1f} docs/min")
+
+    # Ctrl+C and SIGTERM let the documents in flight finish and be written, then exit
+    signal.signal(signal.SIGINT, lambda signum, frame: reclassifier.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: reclassifier.stop())
+    warm_up()
+    counts = reclassifier.run(report)
+    if counts.get(PENDING):
+        log(f"Stopped with {counts[PENDING]} documents pending; continue with: python cli.py reclassify --resume",
+            "WARNING")
+        return EXIT_INTERRUPTED
+    log(f"Reclassified {counts.get(DONE, 0)} documents, {counts.get(FAILED, 0)} failed.")
+    return EXIT_FAILURES if counts.get(FAILED) else EXIT_OK
+
+def command_status(args):
+    import database
+    from job_queue import queue_depth, format_depth
+    from metrics import summarize_persisted
+
+    log(f"Queue: {format_depth(queue_depth())}")
+    reclassify = dict(database.query('SELECT state, COUNT(*) FROM reclassify GROUP BY state'))
+    if reclassify:
+        log("Reclassification: " + ", ".join(f"{count} {state}" for state, count in sorted(reclassify.items())))
+    rows = summarize_persisted(time.time() - args.hours * 3600)
+    if rows:
+        log(f"Metrics of the last {args.hours:g} hours (count, mean, max):")
+    for name, label, count, average, maximum in rows:
+        log(f"  {name} {label}: {count}, {average:.3f}, {maximum:.3f}")
+    for path, attempts, error in database.query(
+            "SELECT path, attempts, last_error FROM jobs WHERE state = 'failed' ORDER BY updated_at DESC LIMIT 20"):
+        log(f"{path} failed {attempts}x: {error}", "WARNING")
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="PDF Organization Software (headless)")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    watch = subcommands.add_parser("watch", help="monitor the input folders continuously")
+    watch.add_argument("--input", action="append",
+                       help="folder to watch, repeatable (default: watch_folders from config.json, else Input)")
+    watch.add_argument("--recursive", action="store_true", help="with --input, watch subfolders too")
+    watch.set_defaults(handler=command_watch)
+
+    process = subcommands.add_parser("process", help="process the given PDFs or folders once")
+    process.add_argument("paths", nargs="+")
+    process.set_defaults(handler=command_process)
+
+    reindex = subcommands.add_parser("reindex", help="rebuild the full-text search index")
+    reindex.set_defaults(handler=command_reindex)
+
+    reclassify = subcommands.add_parser("reclassify", help="run categorization again over filed documents")
+    selection = reclassify.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--all", action="store_true", help="the whole archive")
+    selection.add_argument("--stale", action="store_true",
+                           help="documents classified before the categories last changed")
+    selection.add_argument("--category", nargs="+", help="documents currently filed under these categories")
+    selection.add_argument("--files", nargs="+", help="documents with these file names")
+    selection.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    reclassify.add_argument("--retry-failed", action="store_true", help="with --resume, retry failed documents too")
+    reclassify.add_argument("--workers", type=int, help="parallel LLM workers (default: from config.json)")
+    reclassify.add_argument("--resummarize", action="store_true", help="write new summaries as well")
+    reclassify.set_defaults(handler=command_reclassify)
+
+    status = subcommands.add_parser("status", help="show the job queue depth, recent failures and metrics")
+    status.add_argument("--hours", type=float, default=24, help="metrics time window (default: 24)")
+    status.set_defaults(handler=command_status)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+
+if __name__ == "__main__":
+    sys.exit(main())
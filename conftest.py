@@ -0,0 +1,20 @@
+""" Fixtures shared by the tests. """
+import json
+
+import pytest
+
+import database
+
+CATEGORIES = {"Auto": "Output/Auto", "Versicherung": "Output/Versicherung"}
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """ An empty working directory with its own config.json and documents.db. """
+    database.flush()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config.json").write_text(json.dumps({"categories": CATEGORIES}))
+    monkeypatch.setattr(database, "CONFIG_PATH", str(tmp_path / "config.json"))
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "documents.db"))
+    yield tmp_path
+    database.flush()
+    database.close_connection()
@@ -0,0 +1,388 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+DATABASE_PATH = 'documents.db'
+CONFIG_PATH = 'config.json'
+
+# Applied once per connection; journal_mode=WAL is persistent in the file itself
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA foreign_keys=ON",
+)
+
+def column_names(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+def migration_1(conn):
+    """ Original documents table. """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS documents (
+        filename TEXT UNIQUE,
+        category TEXT,
+        summary TEXT
+    )
+    ''')
+
+def migration_2(conn):
+    """ Result cache columns keyed by content hash. """
+    columns = column_names(conn, 'documents')
+    for column in ('content_hash', 'extracted_text', 'categories_signature'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE documents ADD COLUMN {column} TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)')
+
+def migration_3(conn):
+    """ FTS5 full-text index over documents, kept in sync by triggers. """
+    try:
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+            filename, category, summary, extracted_text,
+            content='documents', content_rowid='rowid',
+            tokenize="unicode61 remove_diacritics 2",
+            prefix='2 3'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search falls back to LIKE queries
+        print(f"Full-text index not available: {e}")
+        return
+    # Separate statements rather than executescript(), which would commit the migration half-way
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts (rowid, filename, category, summary, extracted_text)
+        VALUES (new.rowid, new.filename, new.category, new.summary, new.extracted_text);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, filename, category, summary, extracted_text)
+        VALUES ('delete', old.rowid, old.filename, old.category, old.summary, old.extracted_text);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_update AFTER UPDATE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, filename, category, summary, extracted_text)
+        VALUES ('delete', old.rowid, old.filename, old.category, old.summary, old.extracted_text);
+        INSERT INTO documents_fts (rowid, filename, category, summary, extracted_text)
+        VALUES (new.rowid, new.filename, new.category, new.summary, new.extracted_text);
+    END
+    ''')
+    conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+
+def migration_4(conn):
+    """ Durable processing job queue. """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL UNIQUE,
+        state TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT,
+        next_attempt_at REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, next_attempt_at)')
+
+def migration_5(conn):
+    """ Persisted timing and size metrics. """
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS metrics (
+        id INTEGER PRIMARY KEY,
+        recorded_at REAL NOT NULL,
+        name TEXT NOT NULL,
+        label TEXT NOT NULL DEFAULT '',
+        value REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_metrics_name ON metrics (name, recorded_at)')
+
+def migration_6(conn):
+    """ File location of documents and the checkpoint table of reclassification runs. """
+    if 'path' not in column_names(conn, 'documents'):
+        conn.execute('ALTER TABLE documents ADD COLUMN path TEXT')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS reclassify (
+        filename TEXT PRIMARY KEY,
+        state TEXT NOT NULL DEFAULT 'pending',
+        old_category TEXT,
+        new_category TEXT,
+        error TEXT,
+        updated_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_reclassify_state ON reclassify (state)')
+
+def config_categories():
+    """ {name: folder} from config.json, read directly since migrations run below the config layer. """
+    try:
+        with open(CONFIG_PATH, 'r') as file:
+            categories = json.load(file).get('categories', {})
+    except (OSError, ValueError):
+        return {}
+    return categories if isinstance(categories, dict) else {}
+
+def create_fts(conn):
+    """ FTS5 index over the documents and the id token of their category. """
+    # The category column holds "category<id>" rather than the name, so a rename leaves the index untouched
+    conn.execute('''
+    CREATE VIEW IF NOT EXISTS documents_fts_source AS
+    SELECT id, filename, 'category' || category_id AS category, summary, extracted_text FROM documents
+    ''')
+    try:
+        conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+            filename, category, summary, extracted_text,
+            content='documents_fts_source', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2",
+            prefix='2 3'
+        )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Full-text index not available: {e}")
+        return
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_insert AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts (rowid, filename, category, summary, extracted_text)
+        VALUES (new.id, new.filename, 'category' || new.category_id, new.summary, new.extracted_text);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_delete AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, filename, category, summary, extracted_text)
+        VALUES ('delete', old.id, old.filename, 'category' || old.category_id, old.summary, old.extracted_text);
+    END
+    ''')
+    # Only for the indexed columns; recording a path or timestamp must not re-index the whole text
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS documents_fts_update
+    AFTER UPDATE OF filename, category_id, summary, extracted_text ON documents BEGIN
+        INSERT INTO documents_fts (documents_fts, rowid, filename, category, summary, extracted_text)
+        VALUES ('delete', old.id, old.filename, 'category' || old.category_id, old.summary, old.extracted_text);
+        INSERT INTO documents_fts (rowid, filename, category, summary, extracted_text)
+        VALUES (new.id, new.filename, 'category' || new.category_id, new.summary, new.extracted_text);
+    END
+    ''')
+    conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
+
+def migration_7(conn):
+    """ Categories table with stable ids and aliases, referenced from documents by id. """
+    now = time.time()
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+        folder TEXT,
+        deleted_at REAL,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS category_aliases (
+        alias TEXT PRIMARY KEY COLLATE NOCASE,
+        category_id INTEGER NOT NULL REFERENCES categories (id) ON DELETE CASCADE
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_category_aliases_category ON category_aliases (category_id)')
+    conn.executemany('INSERT OR IGNORE INTO categories (name, folder, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                     [(name, str(folder), now, now) for name, folder in config_categories().items()])
+    # Names found only in the documents belong to categories that were deleted from config.json
+    conn.execute('''
+    INSERT OR IGNORE INTO categories (name, deleted_at, created_at, updated_at)
+    SELECT DISTINCT category, CASE WHEN category = 'Uncategorized' THEN NULL ELSE ? END, ?, ?
+    FROM documents WHERE category IS NOT NULL
+    ''', (now, now, now))
+
+    # Rebuilt rather than altered, to drop the free-text column; ids keep the old rowids
+    for trigger in ('documents_fts_insert', 'documents_fts_delete', 'documents_fts_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS documents_fts')
+    conn.execute('''
+    CREATE TABLE documents_new (
+        id INTEGER PRIMARY KEY,
+        filename TEXT UNIQUE,
+        category_id INTEGER REFERENCES categories (id),
+        summary TEXT,
+        content_hash TEXT,
+        extracted_text TEXT,
+        categories_signature TEXT,
+        path TEXT,
+        classified_at REAL
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO documents_new (id, filename, category_id, summary, content_hash, extracted_text,
+                               categories_signature, path)
+    SELECT d.rowid, d.filename, c.id, d.summary, d.content_hash, d.extracted_text, d.categories_signature, d.path
+    FROM documents d LEFT JOIN categories c ON c.name = d.category
+    ''')
+    conn.execute('DROP TABLE documents')
+    conn.execute('ALTER TABLE documents_new RENAME TO documents')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_category ON documents (category_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_classified_at ON documents (classified_at)')
+    create_fts(conn)
+
+def migration_8(conn):
+    """ Watched folder each job came from, for fair dispatching across folders. """
+    if 'folder' not in column_names(conn, 'jobs'):
+        conn.execute('ALTER TABLE jobs ADD COLUMN folder TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_folder ON jobs (state, folder, created_at)')
+
+# Schema version N is reached by applying MIGRATIONS[N - 1]; never edit a released migration, append a new one
+MIGRATIONS = [
+    migration_1,
+    migration_2,
+    migration_3,
+    migration_4,
+    migration_5,
+    migration_6,
+    migration_7,
+    migration_8,
+]
+
+local = threading.local()
+migrate_lock = threading.Lock()
+migrated_paths = set()
+
+def migrate(conn):
+    """ Bring the schema up to the latest version recorded in PRAGMA user_version. """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+        print(f"Database migrated to schema version {number}: {migration.__doc__.strip()}")
+
+def connect(path=None):
+    """ Open a new tuned connection (the schema is migrated on the first open). """
+    path = path or DATABASE_PATH
+    conn = sqlite3.connect(path, timeout=30, cached_statements=256, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    with migrate_lock:
+        if path not in migrated_paths:
+            migrate(conn)
+            migrated_paths.add(path)
+    return conn
+
+def get_connection():
+    """ Return this thread's persistent connection, opening it on first use. """
+    conn = getattr(local, 'conn', None)
+    if conn is None or getattr(local, 'path', None) != DATABASE_PATH:
+        conn = connect()
+        local.conn = conn
+        local.path = DATABASE_PATH
+    return conn
+
+def close_connection():
+    """ Close the calling thread's connection, if it has one. """
+    conn = getattr(local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        local.conn = None
+
+def has_table(name):
+    """ True if a table (or virtual table) with this name exists. """
+    return query_one("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)) is not None
+
+def query(sql, params=()):
+    """ Run a read query on the thread's connection and return all rows. """
+    return get_connection().execute(sql, params).fetchall()
+
+def query_one(sql, params=()):
+    return get_connection().execute(sql, params).fetchone()
+
+def execute(sql, params=()):
+    """ Run a single write synchronously in its own transaction. """
+    conn = get_connection()
+    with conn:
+        return conn.execute(sql, params)
+
+class BackgroundWriter:
+    """ Single writer thread that groups queued writes into shared transactions.
+
+    SQLite allows one writer at a time, so funnelling all upserts through one
+    thread avoids lock contention between workers, and committing a batch at
+    once saves an fsync per row.
+    """
+    def __init__(self, batch_size=200, max_delay=0.05):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.writes = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, sql, params=()):
+        """ Queue a write; it is committed within max_delay seconds. """
+        self._ensure_started()
+        self.writes.put((sql, params))
+
+    def flush(self):
+        """ Block until everything queued so far is committed. """
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self.writes.put(done)
+        done.wait()
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.writes.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.writes.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            writes = [item for item in batch if not isinstance(item, threading.Event)]
+            if writes:
+                self._commit(writes)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _commit(self, writes):
+        conn = get_connection()
+        try:
+            with conn:
+                for sql, params in writes:
+                    conn.execute(sql, params)
+        except sqlite3.Error as e:
+            # One bad statement must not lose the rest of the batch; retry them one by one
+            print(f"Batched write failed ({e}), retrying individually.")
+            for sql, params in writes:
+                try:
+                    with conn:
+                        conn.execute(sql, params)
+                except sqlite3.Error as e:
+                    print(f"Failed to write to database: {e}")
+
+writer = BackgroundWriter()
+
+def submit_write(sql, params=()):
+    writer.submit(sql, params)
+
+def flush():
+    writer.flush()
+
+atexit.register(flush)
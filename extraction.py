@@ -0,0 +1,68 @@
+EXTRACTION_DEFAULTS = {
+    "char_budget": 8000,
+    "tail_ratio": 0.25,
+    "min_page_chars": 20,
+    "ocr_page_chars": 1500  # assumed size of a page that still has to be OCR'd
+}
+
+GAP_MARKER = "\n[...]\n"
+
+def iter_budget_pages(page_count, head_budget, tail_budget, page_size):
+    """ Lazily yield page numbers: from the front while the head budget lasts, then from the back.
+
+    page_size(index) is called for every yielded page and returns the number of
+    characters it used up, so no page beyond the budget is ever read. Unused
+    head budget is handed on to the tail.
+    """
+    first, last = 0, page_count - 1
+    remaining = head_budget
+    while first <= last and remaining > 0:
+        yield first
+        remaining -= page_size(first)
+        first += 1
+    remaining = tail_budget + max(0, remaining)
+    while last >= first and remaining > 0:
+        yield last
+        remaining -= page_size(last)
+        last -= 1
+
+def select_pages(file_path, settings):
+    """ Read the text layer of the head and tail pages within the character budget.
+
+    Returns (texts, missing, page_count): texts maps page numbers to their text,
+    missing lists the selected pages without a text layer that need OCR.
+    """
+    import fitz  # PyMuPDF, imported on first use to keep it off the startup path
+
+    budget = settings["char_budget"]
+    tail_budget = int(budget * settings["tail_ratio"])
+    texts = {}
+    missing = []
+    with fitz.open(file_path) as doc:
+        def page_size(index):
+            text = doc[index].get_text()
+            if len(text.strip()) < settings["min_page_chars"]:
+                missing.append(index)
+                return settings["ocr_page_chars"]
+            texts[index] = text
+            return len(text)
+        for _ in iter_budget_pages(doc.page_count, budget - tail_budget, tail_budget, page_size):
+            pass
+        page_count = doc.page_count
+    return texts, missing, page_count
+
+def assemble_text(texts, settings):
+    """ Join page texts in page order and trim the result to head + tail of the budget. """
+    parts = []
+    previous = None
+    for index in sorted(texts):
+        if previous is not None and index != previous + 1:
+            parts.append(GAP_MARKER)
+        parts.append(texts[index])
+        previous = index
+    text = "".join(parts)
+    budget = settings["char_budget"]
+    if len(text) <= budget:
+        return text
+    tail_budget = int(budget * settings["tail_ratio"])
+    return text[:budget - tail_budget] + GAP_MARKER + text[len(text) - tail_budget:]
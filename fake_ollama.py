@@ -0,0 +1,158 @@
+""" Local stand-in for the Ollama HTTP API, for exercising the LLM code without a model.
+
+Run it and point the "llm.base_url" setting in config.json at it:
+
+    python fake_ollama.py --port 11435 --latency 0.5 --jitter 0.2 --tokens-per-second 40
+
+With --prefill-tokens-per-second the prompt is "evaluated" at that speed, and
+like Ollama's KV cache the part shared with the previous prompt is skipped.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_TEXT_RESPONSE = "Uncategorized"
+DEFAULT_JSON_RESPONSE = {"category": "Uncategorized", "summary": "Testdokument ohne Inhalt.", "confidence": 0.5}
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """ Answers /api/generate (streaming and non-streaming), /api/tags and /api/version. """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.model, "model": self.server.model}]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json({"error": "invalid JSON"}, 400)
+            return
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, 404)
+            return
+        with self.server.lock:
+            self.server.requests += 1
+        base = {"model": request.get("model", self.server.model),
+                "created_at": datetime.now(timezone.utc).isoformat()}
+        if not request.get("prompt"):
+            # Ollama answers an empty prompt by just loading the model (used for warm-up)
+            self._send_json(dict(base, response="", done=True, done_reason="load"))
+            return
+        prompt = request["prompt"]
+        with self.server.lock:
+            cached = len(os.path.commonprefix([prompt, self.server.last_prompt]))
+            self.server.last_prompt = prompt
+        evaluated = max(1, (len(prompt) - cached) // 4)
+        prefill = evaluated / self.server.prefill_tokens_per_second if self.server.prefill_tokens_per_second else 0.0
+        started = time.monotonic()
+        time.sleep(self.server.latency + random.uniform(0, self.server.jitter) + prefill)
+        first_token = time.monotonic() - started
+        text = self.server.respond(request)
+        token_delay = 1 / self.server.tokens_per_second if self.server.tokens_per_second else 0.0
+        final = dict(base, response="", done=True, done_reason="stop",
+                     prompt_eval_count=evaluated, eval_count=len(text) // 4,
+                     load_duration=0, prompt_eval_duration=int(first_token * 1e9))
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in [text[i:i + 16] for i in range(0, len(text), 16)] + [None]:
+                    line = dict(base, response=chunk, done=False) if chunk is not None else final
+                    if chunk is not None and token_delay:
+                        time.sleep(token_delay * len(chunk) / 4)
+                    data = (json.dumps(line) + "\n").encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client gave up, e.g. after its deadline
+        else:
+            time.sleep(token_delay * len(text) / 4)
+            final["response"] = text
+            self._send_json(final)
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, model="llama3.1", text_response=DEFAULT_TEXT_RESPONSE,
+                 json_response=None, jitter=0.0, tokens_per_second=0.0, responder=None,
+                 prefill_tokens_per_second=0.0):
+        """ latency (+ up to jitter) seconds plus the prefill time pass before the first token;
+        tokens_per_second (4 characters per token, 0 = instant) paces the rest.
+        responder(request) -> text replaces the fixed responses.
+        """
+        super().__init__(("127.0.0.1", port), FakeOllamaHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.last_prompt = ""
+        self.model = model
+        self.text_response = text_response
+        self.json_response = json_response or DEFAULT_JSON_RESPONSE
+        self.responder = responder
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def respond(self, request):
+        """ Text to return for a generate request. """
+        if self.responder is not None:
+            return self.responder(request)
+        if request.get("format") == "json":
+            return json.dumps(self.json_response)
+        return self.text_response
+
+    def start(self):
+        """ Serve on a background thread; returns self for chaining. """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for testing")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency of up to this many seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="generation speed (0 = instant)")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0,
+                        help="prompt evaluation speed for the part not in the prefix cache (0 = instant)")
+    parser.add_argument("--response", default=DEFAULT_TEXT_RESPONSE, help="answer for plain text prompts")
+    parser.add_argument("--json-response", type=json.loads, default=None, help="answer for JSON-mode prompts")
+    args = parser.parse_args()
+    server = FakeOllamaServer(args.port, args.latency, text_response=args.response, json_response=args.json_response,
+                              jitter=args.jitter, tokens_per_second=args.tokens_per_second,
+                              prefill_tokens_per_second=args.prefill_tokens_per_second)
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
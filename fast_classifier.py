@@ -0,0 +1,117 @@
+import math
+import queue
+import threading
+from collections import Counter
+
+from retrieval import tokenize
+
+FAST_CLASSIFIER_DEFAULTS = {
+    "enabled": True,
+    "threshold": 0.9,
+    "min_documents": 20,
+    "max_chars": 4000,
+    "evidence_tokens": 60
+}
+
+class NaiveBayesClassifier:
+    """ Multinomial naive Bayes over binarized word tokens, trainable one document at a time. """
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.document_counts = Counter()
+        self.token_totals = Counter()
+        self.token_counts = {}
+        self.vocabulary = set()
+
+    def __len__(self):
+        return sum(self.document_counts.values())
+
+    def learn(self, text, category):
+        tokens = set(tokenize(text))
+        counts = self.token_counts.setdefault(category, Counter())
+        counts.update(tokens)
+        self.token_totals[category] += len(tokens)
+        self.document_counts[category] += 1
+        self.vocabulary.update(tokens)
+
+    def predict(self, text, categories, evidence_tokens):
+        """ Return (category, posterior) for the most likely of the given categories.
+
+        The summed token evidence is scaled down to at most evidence_tokens tokens,
+        since the independence assumption otherwise makes long documents look
+        near-certain regardless of how ambiguous they are.
+        """
+        candidates = [category for category in categories if self.document_counts[category] > 0]
+        tokens = [token for token in set(tokenize(text)) if token in self.vocabulary]
+        if not candidates or not tokens:
+            return None, 0.0
+        scale = min(1.0, evidence_tokens / len(tokens))
+        total_documents = sum(self.document_counts[category] for category in candidates)
+        vocabulary_size = len(self.vocabulary)
+        scores = {}
+        for category in candidates:
+            counts = self.token_counts[category]
+            denominator = math.log(self.token_totals[category] + self.alpha * vocabulary_size)
+            evidence = sum(math.log(counts[token] + self.alpha) - denominator for token in tokens)
+            scores[category] = math.log(self.document_counts[category] / total_documents) + scale * evidence
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+class FastClassifier:
+    """ Local classifier that answers confident cases before the LLM is asked.
+
+    It is trained from the documents table on a background thread and then kept
+    up to date with every LLM or manual classification. Until enough documents
+    have been learned it never answers, so the LLM stays in charge.
+    """
+    def __init__(self, settings, load_training_rows):
+        self.settings = settings
+        self.load_training_rows = load_training_rows
+        self.model = NaiveBayesClassifier()
+        self.lock = threading.Lock()
+        self.updates = queue.Queue()
+        self.thread = None
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._train_loop, name="fast-classifier", daemon=True)
+                self.thread.start()
+
+    def _train_loop(self):
+        try:
+            rows = self.load_training_rows()
+        except Exception as e:
+            print(f"Fast classifier could not load training data: {e}")
+            rows = []
+        for text, category in rows:
+            self._learn(text, category)
+        while True:
+            text, category = self.updates.get()
+            self._learn(text, category)
+
+    def _learn(self, text, category):
+        if not text or not category or category == "Uncategorized":
+            return
+        with self.lock:
+            self.model.learn(text[:self.settings["max_chars"]], category)
+
+    def learn(self, text, category):
+        """ Queue a confirmed classification; returns immediately. """
+        self._ensure_started()
+        self.updates.put((text, category))
+
+    def predict(self, text, categories):
+        """ Return (category, confidence) if confident enough, otherwise None. """
+        if not self.settings["enabled"]:
+            return None
+        self._ensure_started()
+        with self.lock:
+            if len(self.model) < self.settings["min_documents"]:
+                return None
+            category, confidence = self.model.predict(text[:self.settings["max_chars"]],
+                                                      [c for c in categories if c != "Uncategorized"],
+                                                      self.settings["evidence_tokens"])
+        if category is None or confidence < self.settings["threshold"]:
+            return None
+        return category, confidence
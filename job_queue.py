@@ -0,0 +1,247 @@
+""" Durable job queue in the jobs table, so accepted files survive a crash or restart.
+
+A job moves queued -> extracting -> classifying -> moved. A failed job is
+retried with exponential backoff until max_attempts is reached.
+
+Each job remembers the watched folder it came from. The dispatcher hands out
+free pipeline slots across folders in proportion to their priority, oldest
+job first within a folder.
+"""
+import os
+import threading
+import time
+
+import database
+from watch_folders import folder_for
+
+JOB_DEFAULTS = {
+    "max_attempts": 5,
+    "retry_delay": 30.0,
+    "max_retry_delay": 3600.0,
+    "poll_interval": 2.0,
+    "max_dispatched": 50
+}
+
+QUEUED = "queued"
+EXTRACTING = "extracting"
+CLASSIFYING = "classifying"
+MOVED = "moved"
+FAILED = "failed"
+
+IN_FLIGHT_STATES = (EXTRACTING, CLASSIFYING)
+STATES = (QUEUED, EXTRACTING, CLASSIFYING, MOVED, FAILED)
+
+# A finished job for the same path belongs to an earlier file of that name, so it is started over
+ENQUEUE_SQL = '''
+    INSERT INTO jobs (path, folder, state, attempts, next_attempt_at, created_at, updated_at)
+    VALUES (?, ?, 'queued', 0, NULL, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        folder = excluded.folder, state = 'queued', attempts = 0, last_error = NULL, next_attempt_at = NULL,
+        created_at = excluded.created_at, updated_at = excluded.updated_at
+    WHERE jobs.state IN ('moved', 'failed')
+'''
+
+# The oldest due jobs of every folder, at most ? per folder
+DUE_JOBS_SQL = '''
+    SELECT id, path, folder, created_at FROM (
+        SELECT id, path, folder, created_at,
+            ROW_NUMBER() OVER (PARTITION BY folder ORDER BY created_at) AS position
+        FROM jobs
+        WHERE state = 'queued' OR (state = 'failed' AND next_attempt_at <= ?)
+    )
+    WHERE position <= ?
+    ORDER BY created_at
+'''
+
+def enqueue(path, folder=None):
+    """ Record a file as accepted; a file that is already queued or in flight is left alone. """
+    now = time.time()
+    database.execute(ENQUEUE_SQL, (os.path.abspath(path), folder and os.path.abspath(folder), now, now))
+
+def set_state(path, state):
+    database.execute('UPDATE jobs SET state = ?, updated_at = ? WHERE path = ?',
+                     (state, time.time(), os.path.abspath(path)))
+
+def retry_delay(attempts, settings):
+    """ Exponential backoff: retry_delay, 2 * retry_delay, 4 * ... capped at max_retry_delay. """
+    return min(settings["retry_delay"] * 2 ** (attempts - 1), settings["max_retry_delay"])
+
+def fail(path, error, settings):
+    """ Mark a job failed and schedule its retry, or give up after max_attempts. """
+    path = os.path.abspath(path)
+    row = database.query_one('SELECT attempts FROM jobs WHERE path = ?', (path,))
+    if row is None:
+        return
+    attempts = row[0] + 1
+    now = time.time()
+    next_attempt_at = now + retry_delay(attempts, settings) if attempts < settings["max_attempts"] else None
+    database.execute('''
+        UPDATE jobs SET state = 'failed', attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ?
+        WHERE path = ?
+    ''', (attempts, str(error), next_attempt_at, now, path))
+
+def recover():
+    """ Requeue jobs that were in flight when the process died; returns how many. """
+    placeholders = ", ".join("?" for _ in IN_FLIGHT_STATES)
+    cursor = database.execute(
+        f"UPDATE jobs SET state = 'queued', updated_at = ? WHERE state IN ({placeholders})",
+        (time.time(), *IN_FLIGHT_STATES))
+    return cursor.rowcount
+
+def scan_backlog(folder, recursive=False, accept=None):
+    """ Hand every PDF already lying in the folder (dropped while nothing was running) to accept(path).
+
+    Without accept the files are enqueued directly; pass a readiness
+    detector's watch() when some of them may still be being written.
+    """
+    count = 0
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if name.lower().endswith('.pdf') and os.path.isfile(path):
+                if accept is None:
+                    enqueue(path, folder)
+                else:
+                    accept(path)
+                count += 1
+        if not recursive:
+            break
+    return count
+
+def fair_share(rows, limit, priorities, in_flight):
+    """ Pick up to limit of the due rows, spreading them over the folders.
+
+    Each pick goes to the folder with the fewest jobs in flight relative to its
+    priority, so a folder with a large backlog only gets the slots the others
+    leave unused. rows are (id, path, folder, created_at) in created_at order.
+    """
+    waiting = {}
+    for row in rows:
+        waiting.setdefault(row[2], []).append(row)
+    load = {folder: in_flight.get(folder, 0) for folder in waiting}
+    picked = []
+    while waiting and len(picked) < limit:
+        folder = min(waiting, key=lambda f: (load[f] / priorities.get(f, 1), waiting[f][0][3]))
+        picked.append(waiting[folder].pop(0))
+        load[folder] += 1
+        if not waiting[folder]:
+            del waiting[folder]
+    return picked
+
+def claim_due_jobs(limit, priorities=None, in_flight=None):
+    """ Mark up to limit due jobs as extracting and return their (path, folder) pairs.
+
+    priorities and in_flight map folders to their priority and number of
+    dispatched jobs; see fair_share(). Jobs whose file has disappeared are
+    failed for good instead of dispatched.
+    """
+    claimed = []
+    now = time.time()
+    rows = database.query(DUE_JOBS_SQL, (now, limit))
+    for job_id, path, folder, _ in fair_share(rows, limit, priorities or {}, in_flight or {}):
+        if not os.path.exists(path):
+            database.execute('''
+                UPDATE jobs SET state = 'failed', last_error = 'File no longer exists',
+                    next_attempt_at = NULL, updated_at = ? WHERE id = ?
+            ''', (now, job_id))
+            continue
+        database.execute("UPDATE jobs SET state = 'extracting', updated_at = ? WHERE id = ?", (now, job_id))
+        claimed.append((path, folder))
+    return claimed
+
+def queue_depth():
+    """ Number of jobs per state, every state included. """
+    depth = dict.fromkeys(STATES, 0)
+    for state, count in database.query('SELECT state, COUNT(*) FROM jobs GROUP BY state'):
+        depth[state] = count
+    return depth
+
+def format_depth(depth):
+    return ", ".join(f"{depth[state]} {state}" for state in STATES if state != MOVED)
+
+class JobDispatcher:
+    """ Feed due jobs from the jobs table into the processing pipeline.
+
+    Files are written to the table before anything else happens, and the
+    dispatcher only keeps max_dispatched of them in the pipeline at a time, so
+    nothing accepted is lost when the process stops.
+    """
+    def __init__(self, submit, settings=None):
+        self.submit = submit  # submit(path, folder rule or None)
+        self.settings = dict(JOB_DEFAULTS)
+        self.settings.update(settings or {})
+        self.dispatched = {}  # path -> folder
+        self.folders = {}  # path -> rule of every watched folder
+        self.accept = None  # receives the backlog of the folders; None enqueues it directly
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self, folders=None, accept=None):
+        """ Requeue interrupted jobs, pass the backlog of the watched folders to accept and start dispatching.
+
+        accept is usually FileReadinessDetector.watch, so a file that is still
+        being written when the service starts is not picked up half-written.
+        """
+        if self.running:
+            return
+        self.accept = accept
+        recovered = recover()
+        if recovered:
+            print(f"Recovered {recovered} interrupted jobs.")
+        for folder in folders or []:
+            self.watch(folder)
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="job-dispatcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def watch(self, folder):
+        """ Add a watched folder (a rule dict from watch_folders) and enqueue its backlog. """
+        with self.lock:
+            self.folders[folder["path"]] = folder
+        scan_backlog(folder["path"], folder["recursive"], self.accept)
+        self.wakeup.set()
+
+    def add(self, path):
+        """ Durably accept a file and wake the dispatcher. """
+        with self.lock:
+            folder = folder_for(path, list(self.folders.values()))
+        enqueue(path, folder and folder["path"])
+        self.wakeup.set()
+
+    def finished(self, job):
+        """ Record the outcome of a pipeline job. """
+        path = os.path.abspath(job.file_path)
+        with self.lock:
+            self.dispatched.pop(path, None)
+        if job.error is not None:
+            fail(path, job.error, self.settings)
+        else:
+            set_state(path, MOVED)
+        self.wakeup.set()
+
+    def _loop(self):
+        while self.running:
+            with self.lock:
+                free = self.settings["max_dispatched"] - len(self.dispatched)
+                priorities = {path: folder["priority"] for path, folder in self.folders.items()}
+                in_flight = {}
+                for folder in self.dispatched.values():
+                    in_flight[folder] = in_flight.get(folder, 0) + 1
+            if free > 0:
+                for path, folder in claim_due_jobs(free, priorities, in_flight):
+                    with self.lock:
+                        self.dispatched[path] = folder
+                        rule = self.folders.get(folder)
+                    self.submit(path, rule)
+            self.wakeup.wait(self.settings["poll_interval"])
+            self.wakeup.clear()
@@ -1,24 +1,20 @@
-import sqlite3
-from langchain_ollama import OllamaLLM
+import database
+import category_store
 import json
 
-# Ensure necessary NLTK resources are downloaded
-""" Use the LLaMA model to categorize the document. """
-llm = OllamaLLM(model="llama3.1")
+llm = None
+
+def get_llm():
+    """ Use the LLaMA model to categorize the document (langchain is imported on first use). """
+    global llm
+    if llm is None:
+        from langchain_ollama import OllamaLLM
+        llm = OllamaLLM(model="llama3.1")
+    return llm
 
 def setup_database():
     """ Set up SQLite database """
-    conn = sqlite3.connect('documents.db')
-    c = conn.cursor()
-    c.execute('''
-    CREATE TABLE IF NOT EXISTS documents (
-        filename TEXT UNIQUE,
-        category TEXT,
-        summary TEXT
-    )
-    ''')
-    conn.commit()
-    conn.close()
+    database.get_connection()
 
 def load_config(file_path):
     """ Load the configuration from a JSON file. """
@@ -26,18 +22,12 @@ def load_config(file_path):
         config = json.load(file)
     return config
 
-setup_database()
 config = load_config("config.json")
 categories = config.get("categories", [])
 
 def fetch_all_categories_and_summaries():
     """ Fetch all categories and summaries from the database. """
-    conn = sqlite3.connect('documents.db')
-    c = conn.cursor()
-    c.execute('SELECT category, summary FROM documents')
-    all_data = c.fetchall()
-    conn.close()
-    return all_data
+    return database.query('SELECT c.name, d.summary FROM documents d LEFT JOIN categories c ON c.id = d.category_id')
     
 def create_prompt(content, categories):
     """ Generate a detailed prompt for the model including references to historical data. """
@@ -73,7 +63,7 @@ def create_prompt(content, categories):
 def categorize_document(content):
     
     prompt = create_prompt(content, categories)
-    response = llm.invoke(prompt)
+    response = get_llm().invoke(prompt)
     return response.strip()
 
 def create_summary_prompt(content, num_sentences):
@@ -94,22 +84,20 @@ def create_summary_prompt(content, num_sentences):
 def get_summary(content, num_sentences=1):
     """ Generate a summary"""
     prompt = create_summary_prompt(content, num_sentences)
-    response = llm.invoke(prompt)
+    response = get_llm().invoke(prompt)
     return response.strip()
     return summary
 
 def save_document_info(filename, category, summary):
     """ Save or update document information in the database based on filename """
-    conn = sqlite3.connect('documents.db')
-    c = conn.cursor()
     # Use UPSERT functionality to update existing records or insert new ones
-    c.execute('''
-    INSERT INTO documents (filename, category, summary) VALUES (?, ?, ?)
+    category_store.ensure_category(category)
+    database.flush()
+    database.execute(f'''
+    INSERT INTO documents (filename, category_id, summary) VALUES (?, {category_store.CATEGORY_ID_SQL}, ?)
     ON CONFLICT(filename) DO UPDATE SET
-    category=excluded.category, summary=excluded.summary
-    ''', (filename, category, summary))
-    conn.commit()
-    conn.close()
+    category_id=excluded.category_id, summary=excluded.summary
+    ''', (filename, category, category, summary))
 
 def process_document(filename, content):
     """ Process the document to categorize and summarize """
@@ -0,0 +1,137 @@
+import asyncio
+import random
+import threading
+import time
+
+from metrics import observe, SIZE_BUCKETS
+
+GATEWAY_DEFAULTS = {
+    "max_in_flight": 1,  # match OLLAMA_NUM_PARALLEL of the server
+    "timeout": 300,
+    "retries": 3,
+    "backoff": 1.0,
+    "max_backoff": 30.0
+}
+
+def retryable_errors():
+    """ Connection-level failures worth another attempt; model or prompt errors are not retried. """
+    import httpx  # already loaded by the Ollama client once a request fails, so this stays off the startup path
+    return (ConnectionError, httpx.TransportError)
+
+class LLMTimeoutError(TimeoutError):
+    """ The LLM did not answer within the per-request deadline. """
+
+class LLMGateway:
+    """ Funnel for all Ollama requests, running on its own asyncio event loop.
+
+    Worker threads call invoke(), which schedules the request on the loop and
+    waits for it. A semaphore caps the number of requests in flight, every
+    request has a deadline, and connection errors are retried with jittered
+    exponential backoff.
+    """
+    def __init__(self, settings=None):
+        self.settings = dict(GATEWAY_DEFAULTS)
+        self.settings.update(settings or {})
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        self.start_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "waiting": 0,
+            "in_flight": 0,
+            "completed": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "retries": 0,
+            "total_seconds": 0.0
+        }
+
+    def _ensure_started(self):
+        with self.start_lock:
+            if self.loop is not None:
+                return
+            ready = threading.Event()
+            def run():
+                self.loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self.loop)
+                self.semaphore = asyncio.Semaphore(self.settings["max_in_flight"])
+                ready.set()
+                self.loop.run_forever()
+            self.thread = threading.Thread(target=run, name="llm-gateway", daemon=True)
+            self.thread.start()
+            ready.wait()
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def metrics(self):
+        """ Snapshot of queue depth and request counters. """
+        with self.stats_lock:
+            snapshot = dict(self.stats)
+        finished = snapshot["completed"]
+        snapshot["average_seconds"] = snapshot["total_seconds"] / finished if finished else 0.0
+        snapshot["max_in_flight"] = self.settings["max_in_flight"]
+        return snapshot
+
+    def backoff(self, attempt):
+        """ Exponential backoff with full jitter. """
+        delay = min(self.settings["max_backoff"], self.settings["backoff"] * 2 ** attempt)
+        return random.uniform(0, delay)
+
+    async def ainvoke(self, llm, prompt, call="llm"):
+        """ Send one prompt through the concurrency limit with deadline and retries.
+
+        call names the kind of request in the prompt size and token metrics.
+        """
+        observe("pdf_llm_prompt_chars", len(prompt), SIZE_BUCKETS, call=call)
+        self._count("waiting")
+        async with self.semaphore:
+            self._count("waiting", -1)
+            self._count("in_flight")
+            started = time.monotonic()
+            try:
+                for attempt in range(self.settings["retries"] + 1):
+                    try:
+                        # agenerate() rather than ainvoke() to get Ollama's token counts along with the text
+                        result = await asyncio.wait_for(llm.agenerate([prompt]), self.settings["timeout"])
+                        self._count("completed")
+                        self._count("total_seconds", time.monotonic() - started)
+                        generation = result.generations[0][0]
+                        self.record_usage(generation.generation_info or {}, call)
+                        return generation.text
+                    except asyncio.TimeoutError:
+                        self._count("timeouts")
+                        self._count("failed")
+                        raise LLMTimeoutError(f"LLM request exceeded {self.settings['timeout']} seconds")
+                    except retryable_errors() as e:
+                        if attempt == self.settings["retries"]:
+                            self._count("failed")
+                            raise
+                        delay = self.backoff(attempt)
+                        print(f"LLM connection error ({e!r}), retrying in {delay:.1f}s")
+                        self._count("retries")
+                        await asyncio.sleep(delay)
+                    except Exception:
+                        self._count("failed")
+                        raise
+            finally:
+                self._count("in_flight", -1)
+
+    def record_usage(self, info, call):
+        """ Token counts reported in Ollama's final response chunk. """
+        if info.get("prompt_eval_count") is not None:
+            observe("pdf_llm_prompt_tokens", info["prompt_eval_count"], SIZE_BUCKETS, call=call)
+        if info.get("eval_count") is not None:
+            observe("pdf_llm_completion_tokens", info["eval_count"], SIZE_BUCKETS, call=call)
+        if info.get("prompt_eval_duration") is not None:
+            # Server-side time to first token: loading the model plus evaluating the uncached part of the prompt
+            first_token = ((info.get("load_duration") or 0) + info["prompt_eval_duration"]) / 1e9
+            observe("pdf_llm_ttft_seconds", first_token, call=call)
+
+    def invoke(self, llm, prompt, call="llm"):
+        """ Blocking wrapper for worker threads. """
+        self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self.ainvoke(llm, prompt, call), self.loop)
+        return future.result()
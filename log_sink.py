@@ -0,0 +1,118 @@
+""" Thread-safe log pipeline for the GUI.
+
+Any thread calls LogSink.log(). Entries go onto two SimpleQueues: a writer
+thread appends them to log_trace.csv in batches, and the Tk main thread drains
+the other one from an after() callback to show the latest lines.
+"""
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+LOG_DEFAULTS = {
+    "csv_file": "log_trace.csv",
+    "flush_interval": 1.0,  # seconds an entry may wait before it is written
+    "flush_entries": 200,  # write as soon as this many entries are waiting
+    "max_bytes": 5 * 1024 * 1024,  # rotate log_trace.csv beyond this size
+    "backups": 3,  # keep log_trace.csv.1 .. log_trace.csv.N
+    "max_lines": 1000  # lines kept in the log widget
+}
+
+CSV_HEADERS = ['Timestamp', 'Message', 'Message_Type']
+
+class LogSink:
+    """ Fan log entries out to a batching CSV writer and the UI. """
+    def __init__(self, settings=None):
+        self.settings = dict(LOG_DEFAULTS)
+        self.settings.update(settings or {})
+        self.pending = queue.SimpleQueue()
+        self.display = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def log(self, message, msg_type="INFO"):
+        """ Record an entry; safe to call from any thread, never blocks on disk. """
+        entry = (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), message, msg_type)
+        self._ensure_started()
+        self.pending.put(entry)
+        self.display.put(entry)
+
+    def drain(self):
+        """ Entries logged since the last call, at most max_lines of the newest ones. """
+        entries = []
+        try:
+            while True:
+                entries.append(self.display.get_nowait())
+        except queue.Empty:
+            pass
+        return entries[-self.settings["max_lines"]:]
+
+    def flush(self):
+        """ Block until everything logged so far is written to the CSV file. """
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self.pending.put(done)
+        done.wait()
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.settings["flush_interval"]
+            while len(batch) < self.settings["flush_entries"] and not isinstance(batch[-1], threading.Event):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            entries = [item for item in batch if not isinstance(item, threading.Event)]
+            if entries:
+                self._write(entries)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, entries):
+        csv_file = self.settings["csv_file"]
+        try:
+            self._rotate_if_needed(csv_file)
+            new_file = not os.path.isfile(csv_file)
+            with open(csv_file, mode='a', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                if new_file:
+                    writer.writerow(CSV_HEADERS)
+                writer.writerows(entries)
+        except OSError as e:
+            # Shown in the UI instead of the lost entries; not re-queued, or a full disk would loop forever
+            message = f"Failed to write {len(entries)} log entries to CSV: {e}"
+            print(message)
+            self.display.put((datetime.now().strftime('%Y-%m-%d %H:%M:%S'), message, "ERROR"))
+
+    def _rotate_if_needed(self, csv_file):
+        """ log_trace.csv -> log_trace.csv.1 -> ... -> log_trace.csv.N (oldest dropped). """
+        try:
+            if os.path.getsize(csv_file) < self.settings["max_bytes"]:
+                return
+        except OSError:
+            return
+        backups = self.settings["backups"]
+        for number in range(backups - 1, 0, -1):
+            source = f"{csv_file}.{number}"
+            if os.path.exists(source):
+                os.replace(source, f"{csv_file}.{number + 1}")
+        if backups > 0:
+            os.replace(csv_file, f"{csv_file}.1")
+        else:
+            os.remove(csv_file)
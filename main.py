@@ -1,40 +1,53 @@
 import os
 import shutil
 import threading
-import time
-from datetime import datetime
-import csv
 import json
-import pygame
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import customtkinter as ctk
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
 import webbrowser
-import sqlite3
-
-from classifier import process_document, get_summary, save_document_info
-from utils_json import read_json_file, write_json_file, initialize_data, get_categories, get_category_folder, add_new_category, update_category_folder, update_category_name_and_folder, delete_category
-
-#  Initialize pygame mixer
-pygame.mixer.init()
-# Load the sound
-beep_sound = pygame.mixer.Sound('beep.wav')  # Path to your sound file
+import queue
+
+from classifier import get_summary, save_document_info, save_document_path, gateway, warm_up
+from utils_json import write_json_file, get_categories, get_category_folder, add_new_category, update_category_folder, update_category_name_and_folder, delete_category, get_settings, get_registry
+from readiness import FileReadinessDetector, READINESS_DEFAULTS
+from search import BackgroundSearch, SEARCH_DEFAULTS
+from job_queue import queue_depth, format_depth
+from watch_folders import load_watch_folders, add_watch_folder
+from processing import create_job_queue, compute_content_hash, extract_document_text, schedule_watch_folders, ocr_engine
+from log_sink import LogSink, LOG_DEFAULTS
+from metrics import metrics, MetricsExporter, STAGE_METRIC
+from reclassify import Reclassifier, RECLASSIFY_DEFAULTS, select_documents, progress, PENDING, DONE, FAILED
+
+beep_sound = None
+
+def play_beep():
+    """ Play the alert sound; pygame is imported and its mixer opened on the first beep, not at startup.
+
+    Without a working audio device the error is printed once and the beep stays off.
+    """
+    global beep_sound
+    if beep_sound is False:
+        return
+    try:
+        if beep_sound is None:
+            import pygame
+            pygame.mixer.init()
+            beep_sound = pygame.mixer.Sound('beep.wav')  # Path to your sound file
+        beep_sound.play()
+    except Exception as e:  # pygame.error, a missing pygame or beep.wav
+        print(f"Alert sound disabled: {e}")
+        beep_sound = False
 
 CONFIG_PATH = 'config.json'
 
-config = None
-if not os.path.exists(CONFIG_PATH):
-    config = initialize_data(CONFIG_PATH)
-else:
-    config = read_json_file(CONFIG_PATH)
+config_registry = get_registry(CONFIG_PATH)
+config = config_registry.get_data()
 
 # Access the categories array
 categories = get_categories(config)
+config_registry.add_listener(lambda data: categories.__setitem__(slice(None), get_categories(data)))
 
 # Set the global theme to 'dark' which is typically the black theme
 ctk.set_appearance_mode("dark")  # Options are "light", "dark", or "system"
@@ -47,60 +60,6 @@ input_folder = 'Input'
 output_folder_base = 'Output'
 uncategorized_folder = 'Uncategorized'
 
-def extract_text_from_pdf(file_path):
-    with fitz.open(file_path) as doc:
-        page = doc[0]  # Get the first page
-        text = page.get_text()
-    return text
-
-def ocr_image_from_pdf(file_path):
-    with fitz.open(file_path) as doc:
-        page = doc[0]
-        pix = page.get_pixmap()
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    return pytesseract.image_to_string(img)
-
-def process_file(file_path):
-    text = extract_text_from_pdf(file_path)
-    if not text.strip():  # If no text, use OCR
-        text = ocr_image_from_pdf(file_path)
-
-    category = process_document(os.path.basename(file_path), text)
-    # print(output_folder_base, category, uncategorized_folder, os.path.basename(file_path))
-    destination_folder = get_category_folder(CONFIG_PATH, category)
-    os.makedirs(os.path.dirname(destination_folder), exist_ok=True)
-    if not os.path.exists(os.path.join(destination_folder, os.path.basename(file_path))):
-        shutil.move(file_path, destination_folder)
-        return f"Processed and moved: {os.path.basename(file_path)} to {category}", category
-    else:
-        return f"File already exists: {os.path.basename(file_path)} in {category}", category
-
-class FolderMonitor(FileSystemEventHandler):
-    def __init__(self, app):
-        self.app = app
-
-    def on_created(self, event):
-        if not event.is_directory:
-            self.app.update_log(f"File {os.path.basename(event.src_path)} is added.", "DEBUG")
-            # Start a new thread for processing the file
-            # threading.Thread(target=self.handle_file, args=(event.src_path,)).start()
-            time.sleep(5)  # Simulate delay
-            result, category = process_file(event.src_path)
-            if category == "Uncategorized":
-                beep_sound.play()
-                self.app.update_log(f"⚠️⚠️⚠️ {result} ⚠️⚠️⚠️", "ERROR")
-            else:
-                self.app.update_log(f"✔️ {result}", "INFO")
-
-    def handle_file(self, file_path):
-        time.sleep(1)  # Simulate delay
-        result, category = process_file(file_path)
-        if category == "Uncategorized":
-            beep_sound.play()
-            self.app.update_log(f"⚠️⚠️⚠️ {result} ⚠️⚠️⚠️", "ERROR")
-        else:
-            self.app.update_log(f"✔️ {result}", "INFO")
-
 class App(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -127,6 +86,7 @@ class App(ctk.CTk):
         self.log.tag_configure('WARNING', foreground='orange')
         self.log.tag_configure('ERROR', foreground='red')
         self.log.tag_configure('DEBUG', foreground='black')
+        self.log_sink = LogSink(get_settings(config_registry.get_data(), "log", LOG_DEFAULTS))
         
         # Settings UI
         # Entry for the input folder path
@@ -144,12 +104,34 @@ class App(ctk.CTk):
 
         self.search_entry = ctk.CTkEntry(self.right_frame, placeholder_text="Search files...")
         self.search_entry.pack(fill='x', padx=5, pady=5)
+        # Search as you type: the query runs once typing pauses, on the search thread
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda event: self.perform_search())
         self.search_button = ctk.CTkButton(self.right_frame, text="Search", command=self.perform_search)
         self.search_button.pack(fill='x', padx=5, pady=5)
          # Change to using Listbox for search results
         self.search_results = tk.Listbox(self.right_frame, height=15)
+        self.search_rows = []
         self.search_results.pack(fill='x', pady=5)
 
+        # Results are shown one page at a time
+        self.search_page_frame = ctk.CTkFrame(self.right_frame, fg_color="transparent")
+        self.search_page_frame.pack(fill='x', pady=5)
+        self.search_prev_button = ctk.CTkButton(self.search_page_frame, text="<", width=40, state='disabled',
+                                                command=lambda: self.perform_search(self.search_page - 1))
+        self.search_prev_button.pack(side='left', padx=5)
+        self.search_next_button = ctk.CTkButton(self.search_page_frame, text=">", width=40, state='disabled',
+                                                command=lambda: self.perform_search(self.search_page + 1))
+        self.search_next_button.pack(side='right', padx=5)
+        self.search_status = ctk.CTkLabel(self.search_page_frame, text="")
+        self.search_status.pack(side='left', fill='x', expand=True)
+        self.search_settings = get_settings(config_registry.get_data(), "search", SEARCH_DEFAULTS)
+        self.search = BackgroundSearch(lambda page: self.ui_queue.put(("search", page)), self.search_settings)
+        self.search_generation = None
+        self.search_text = ""
+        self.search_page = 0
+        self.search_after_id = None
+
         self.open_file_button = ctk.CTkButton(self.right_frame, text="Open Selected File", command=self.open_selected_file)
         self.open_file_button.pack(fill='x', pady=5)
         
@@ -161,35 +143,93 @@ class App(ctk.CTk):
 
         self.manual_button = ctk.CTkButton(self.left_frame, text="Manual Classify", command=self.open_manual_classify)
         self.manual_button.pack(side='right', padx=10)
-        
+
+        self.stats_button = ctk.CTkButton(self.left_frame, text="Stats", command=self.open_stats)
+        self.stats_button.pack(side='right', padx=10)
+
+        self.reclassify_button = ctk.CTkButton(self.left_frame, text="Reclassify", command=self.start_reclassify)
+        self.reclassify_button.pack(side='right', padx=10)
+        self.reclassifier = None
+
+        self.llm_status = ctk.CTkLabel(self.left_frame, text="")
+        self.llm_status.pack(side='left', padx=10)
+
+        self.queue_status = ctk.CTkLabel(self.left_frame, text="")
+        self.queue_status.pack(side='left', padx=10)
+
+        # Worker threads never touch Tk directly; they post to this queue and the UI thread drains it
+        self.ui_queue = queue.Queue()
+        self.pipeline, self.dispatcher = create_job_queue(lambda job: self.ui_queue.put(("job", job)))
+        readiness_settings = get_settings(config_registry.get_data(), "readiness", READINESS_DEFAULTS)
+        self.readiness = FileReadinessDetector(self.dispatcher.add, readiness_settings, on_timeout=self.on_file_timeout)
+        self.observer = None
+        self.watch_folders = []
+        self.after(200, self.poll_ui_queue)
+        self.after(2000, self.refresh_queue_status)
+        # Have Ollama load the model while the user is still looking at the window
+        warm_up()
+        self.metrics_exporter = MetricsExporter()
+        self.metrics_exporter.start()
+
+    def poll_ui_queue(self):
+        """ Apply finished jobs and new log lines on the Tk main thread. """
+        try:
+            while True:
+                kind, job = self.ui_queue.get_nowait()
+                if kind == "search":
+                    self.show_search_results(job)
+                elif kind == "reclassified":
+                    self.reclassifier = None
+                    self.reclassify_button.configure(text="Reclassify", command=self.start_reclassify, state='normal')
+                else:
+                    self.report_job(job)
+        except queue.Empty:
+            pass
+        finally:
+            # Re-armed even if handling an entry failed, otherwise the window would stop updating for good
+            self.after(200, self.poll_ui_queue)
+        self.render_log()
+        metrics = gateway.metrics()
+        self.llm_status.configure(text=f"LLM: {metrics['in_flight']}/{metrics['max_in_flight']} running, "
+                                       f"{metrics['waiting']} waiting, {metrics['retries']} retries, "
+                                       f"{metrics['timeouts']} timeouts")
+
+    def refresh_queue_status(self):
+        self.queue_status.configure(text=f"Queue: {format_depth(queue_depth())}")
+        self.after(2000, self.refresh_queue_status)
+
+    def on_file_timeout(self, file_path):
+        self.update_log(f"⚠️ {os.path.basename(file_path)} was never completely written, skipped.", "WARNING")
+
+    def report_job(self, job):
+        if job.error is not None or job.category == "Uncategorized":
+            play_beep()
+            self.update_log(f"⚠️⚠️⚠️ {job.result} ⚠️⚠️⚠️", "ERROR")
+        else:
+            self.update_log(f"✔️ {job.result}", "INFO")
 
     def update_log(self, message, msg_type = "orange"):
-        self.log.insert(tk.END, message + "\n", msg_type)
+        """ Log a message from any thread; it shows up on the next poll and is written to log_trace.csv in batches. """
+        self.log_sink.log(message, msg_type)
+
+    def render_log(self):
+        """ Append new log lines in one insert and keep only the last max_lines in the widget. """
+        entries = self.log_sink.drain()
+        if not entries:
+            return
+        chunks = []
+        for timestamp, message, msg_type in entries:
+            chunks.extend((message + "\n", msg_type))
+        self.log.insert(tk.END, *chunks)
+        max_lines = self.log_sink.settings["max_lines"]
+        # Every entry ends with a newline, so the last line of the widget is always empty
+        lines = int(self.log.index('end-1c').split('.')[0]) - 1
+        if lines > max_lines:
+            self.log.delete('1.0', f'{lines - max_lines + 1}.0')
         self.log.yview(tk.END)
-         # Generate current timestamp
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        csv_file = 'log_trace.csv'
-        csv_headers = ['Timestamp', 'Message', 'Message_Type']
-        
-        # Initialize the CSV file with headers if it doesn't exist
-        if not os.path.isfile(csv_file):
-            with open(csv_file, mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(csv_headers)
-        
-        # Append the log entry to the CSV file
-        try:
-            with open(csv_file, mode='a', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow([timestamp, message, msg_type])
-        except Exception as e:
-            # Handle exceptions (e.g., file write errors)
-            error_message = f"Failed to write log to CSV: {e}"
-            self.log.insert(tk.END, error_message + "\n", "red")
-            self.log.yview(tk.END)
 
     def browse_input_folder(self):
+        global input_folder
         folder_selected = filedialog.askdirectory()
         if folder_selected:
             self.input_folder_entry.configure(state="normal")
@@ -199,6 +239,13 @@ class App(ctk.CTk):
             # Disable the entry and browse button to lock the setting
             self.input_folder_entry.configure(state="disabled")
             input_folder = folder_selected
+            if self.observer is not None:
+                folders, folder = add_watch_folder(self.watch_folders, input_folder)
+                if len(folders) > len(self.watch_folders):
+                    self.watch_folders = folders
+                    schedule_watch_folders(self.observer, [folder], self.readiness, self.update_log)
+                    self.dispatcher.watch(folder)
+                    self.update_log(f"🔎 Monitoring {folder['path']} as well.", "WARNING")
             # self.browse_input_button.configure(state="disabled")
             # self.lock_button.configure(state="disabled")
 
@@ -211,36 +258,60 @@ class App(ctk.CTk):
           webbrowser.open(filename)
                  
                        
-    def perform_search(self):
-        search_query = self.search_entry.get().lower()
-        connection = sqlite3.connect('documents.db')
-        cursor = connection.cursor()
-        # Fetch data from database where any of filename, category, or summary contains the search query
-        query = '''
-            SELECT filename, category, summary 
-            FROM documents 
-            WHERE filename LIKE ? OR category LIKE ? OR summary LIKE ?
-        '''
-        pattern = '%' + search_query + '%'
-        cursor.execute(query, (pattern, pattern, pattern))
-        found_files = cursor.fetchall()
-
+    def schedule_search(self, event=None):
+        """ Debounce: (re)start the timer on every key; only a pause in typing runs the query. """
+        if self.search_entry.get().strip() == self.search_text:
+            return  # cursor keys and the like
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(self.search_settings["debounce_ms"], self.perform_search)
+
+    def perform_search(self, page=0):
+        """ Ask the search thread for a page of results; they arrive through the UI queue. """
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        self.search_text = self.search_entry.get().strip()
+        self.search_page = max(0, page)
+        if len(self.search_text) < self.search_settings["min_chars"]:
+            self.search_generation = None  # drops the answer to any query still running
+            self.search_rows = []
+            self.search_results.delete(0, tk.END)
+            self.search_status.configure(text="")
+            self.search_prev_button.configure(state='disabled')
+            self.search_next_button.configure(state='disabled')
+            return
+        # Ranked full-text search over filename, category, summary and the extracted text
+        self.search_generation = self.search.request(self.search_text, self.search_page)
+        self.search_status.configure(text="Searching...")
+
+    def show_search_results(self, result):
+        if result.generation != self.search_generation:
+            return  # answer to a query the user has typed past
         self.search_results.delete(0, tk.END)  # Clear previous search results
-        if found_files:
-            for filename, category, summary in found_files:
-                # Format the result as "Category -> Filename: Summary"
-                result = f"{category} -> {filename}"
-                # result = f"{category} -> {filename}: {summary}"
-                self.search_results.insert(tk.END, result)  # Add files to the listbox
+        self.search_rows = result.rows
+        if result.error is not None:
+            self.search_status.configure(text=f"Search failed: {result.error}")
+            return
+        if result.rows:
+            # Format the result as "Category -> Filename: Snippet", inserted in one call
+            self.search_results.insert(tk.END, *(f"{category} -> {filename}: {' '.join((snippet or '').split())}"
+                                                 for filename, category, summary, snippet in result.rows))
         else:
             self.search_results.insert(tk.END, "No documents found.")
+        page_size = self.search_settings["page_size"]
+        first = result.page * page_size
+        limit = self.search_settings["count_limit"]
+        total = f"{limit}+" if result.total >= limit else str(result.total)
+        self.search_status.configure(text=f"{first + 1 if result.rows else 0}-{first + len(result.rows)} of {total}")
+        self.search_prev_button.configure(state='normal' if result.page > 0 else 'disabled')
+        more = result.total >= limit or first + page_size < result.total
+        self.search_next_button.configure(state='normal' if len(result.rows) == page_size and more else 'disabled')
 
     def open_selected_file(self):
         try:
             selected_index = self.search_results.curselection()[0]  # Get index of the selected item
-            selected_file = self.search_results.get(selected_index)  # Get the file path from the listbox
-            folder = selected_file.split(" -> ")[0]
-            file = selected_file.split(" -> ")[1]
+            file, folder = self.search_rows[selected_index][:2]
             file_path = folder + "\\" + file
             file_path = os.path.join(output_folder_base, file_path)
             
@@ -249,14 +320,85 @@ class App(ctk.CTk):
             print("No file selected")
 
     def start_monitoring(self):
-        observer = Observer()
-        event_handler = FolderMonitor(self)
-        observer.schedule(event_handler, input_folder, recursive=False)
-        observer.start()
+        # The central input folder plus the watched folders of config.json, all feeding one pipeline
+        self.watch_folders, _ = add_watch_folder(load_watch_folders(config_registry.get_data(), input_folder),
+                                                 input_folder)
+        self.pipeline.start()
+        # Files dropped while the app was closed and jobs cut off by a crash are picked up first
+        self.dispatcher.start(self.watch_folders, self.readiness.watch)
+        self.readiness.start()
+        self.observer = Observer()
+        schedule_watch_folders(self.observer, self.watch_folders, self.readiness, self.update_log)
+        self.observer.start()
         self.start_button.configure(state='disabled')
-        self.update_log(f"🔎 Monitoring...", "WARNING")
+        self.update_log(f"🔎 Monitoring {len(self.watch_folders)} folder(s)...", "WARNING")
         
-        threading.Thread(target=observer.join).start()
+        threading.Thread(target=self.observer.join).start()
+
+    def start_reclassify(self, categories=None):
+        """ Reclassify in the background: the given categories, else an interrupted run or the stale documents. """
+        if self.reclassifier is not None:
+            messagebox.showinfo("Reclassify", "A reclassification is already running.")
+            return
+        settings = get_settings(config_registry.get_data(), "reclassify", RECLASSIFY_DEFAULTS)
+        self.reclassifier = Reclassifier(settings, self.update_log)
+        self.reclassify_button.configure(text="Stop Reclassify", command=self.stop_reclassify)
+        threading.Thread(target=self.run_reclassify, args=(self.reclassifier, categories),
+                         name="reclassify", daemon=True).start()
+
+    def stop_reclassify(self):
+        self.reclassifier.stop()
+        self.reclassify_button.configure(text="Stopping...", state='disabled')
+        self.update_log("Stopping the reclassification after the documents in progress...", "WARNING")
+
+    def run_reclassify(self, reclassifier, categories):
+        try:
+            pending = progress().get(PENDING, 0)
+            if categories or not pending:
+                pending = reclassifier.start(select_documents(stale=not categories, categories=categories))
+                self.update_log(f"🔁 Reclassifying {pending} documents...", "WARNING")
+            else:
+                self.update_log(f"🔁 Resuming the reclassification of {pending} documents...", "WARNING")
+
+            def report(counts, rate):
+                finished = counts.get(DONE, 0) + counts.get(FAILED, 0)
+                self.update_log(f"Reclassified {finished}/{finished + counts.get(PENDING, 0)} "
+                                f"({counts.get(FAILED, 0)} failed, {rate:.1f} docs/min)", "INFO")
+
+            counts = reclassifier.run(report)
+            if counts.get(PENDING):
+                self.update_log(f"Reclassification stopped, {counts[PENDING]} documents left for next time.", "WARNING")
+            else:
+                self.update_log(f"✔️ Reclassification finished: {counts.get(DONE, 0)} done, "
+                                f"{counts.get(FAILED, 0)} failed.", "INFO")
+        except Exception as e:
+            self.update_log(f"Reclassification failed: {e}", "ERROR")
+        finally:
+            self.ui_queue.put(("reclassified", None))
+
+    def open_stats(self):
+        """ Window with count, mean and p95 of every metric plus the OCR totals, refreshed every 2 seconds. """
+        stats_window = ctk.CTkToplevel(self)
+        stats_window.title("Pipeline Stats")
+        stats_window.geometry("620x420")
+        stats_window.transient(self)
+        text = tk.Text(stats_window, font=("Courier", 10))
+        text.pack(fill='both', expand=True, padx=10, pady=10)
+
+        def refresh():
+            if not stats_window.winfo_exists():
+                return
+            lines = [f"{'metric':<40}{'count':>7}{'mean':>10}{'p95':>10}"]
+            for (name, labels), stats in sorted(metrics.snapshot().items()):
+                label = ",".join(str(value) for _, value in labels)
+                title = label if name == STAGE_METRIC else f"{name.replace('pdf_', '')} {label}".strip()
+                lines.append(f"{title:<40}{stats['count']:>7}{stats['mean']:>10.3f}{stats['p95']:>10.3f}")
+            lines.extend(["", ocr_engine.report()])
+            text.delete('1.0', tk.END)
+            text.insert(tk.END, "\n".join(lines))
+            stats_window.after(2000, refresh)
+
+        refresh()
 
     def open_manual_classify(self):
         # Open a new window to handle manual classification
@@ -324,15 +466,14 @@ class App(ctk.CTk):
                 dst_path = os.path.join(output_folder_base, selected_file)
                 os.makedirs(os.path.dirname(dst_path), exist_ok=True)
             
-                text = extract_text_from_pdf(src_path)
-                if not text.strip():  # If no text, use OCR
-                    text = ocr_image_from_pdf(src_path)
-                else:
-                    text = text.strip()  # Remove leading and trailing whitespace
+                content_hash = compute_content_hash(src_path)
+                # Files in Uncategorized were extracted when they arrived; the artifact store returns that text
+                text = extract_document_text(src_path, content_hash).strip()  # Remove leading and trailing whitespace
                 summary = get_summary(text)
-                save_document_info(selected_file, selected_category, summary)
-                
                 shutil.move(src_path, dst_path)
+                # Recorded once the file is in its folder, so the row never points at a failed move
+                save_document_info(selected_file, selected_category, summary, content_hash, text)
+                save_document_path(selected_file, dst_path)
                 self.update_log(f"Trained :{selected_file} to {selected_category}", "INFO")
                 self.update_log(f"Manually classified and moved: {selected_file} to {selected_category}", "INFO")
                 manual_window.destroy()
@@ -374,10 +515,11 @@ class App(ctk.CTk):
             category = category_entry.get()
             category_folder = category_folder_entry.get()
             if category and category not in category_options and category_folder:
-                category_options.append(category)
-                add_new_category(CONFIG_PATH, category, category_folder)
-                # Update the dropdown with new values
-                category_dropdown.configure(values=category_options)
+                if not add_new_category(CONFIG_PATH, category, category_folder):
+                    messagebox.showerror("Error", f"Category '{category}' could not be added.")
+                    return
+                # The registry listener has already put the new category into the shared list
+                refresh_dropdowns()
                 category_var.set(category)  # Optionally set the new category as selected
                 messagebox.showinfo("Success", f"Category '{category}' added successfully!")
             elif not category:
@@ -401,6 +543,11 @@ class App(ctk.CTk):
         categories_dropdown = ctk.CTkOptionMenu(right_frame, variable=categories_var, values=category_options)
         categories_dropdown.grid(row=5, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
 
+        def refresh_dropdowns():
+            # category_options is the module's categories list, which the registry listener keeps up to date
+            category_dropdown.configure(values=category_options)
+            categories_dropdown.configure(values=category_options)
+
         # Update Entry
         update_entry = ctk.CTkEntry(right_frame, placeholder_text="Uncategorized")
         update_entry.grid(row=6, column=0, columnspan=2, padx=5, pady=5, sticky="ew")
@@ -439,13 +586,10 @@ class App(ctk.CTk):
                 return
             
             if selected_category in category_options:
-                index = category_options.index(selected_category)
-                category_options[index] = updated_category
-                
-                update_category_name_and_folder(CONFIG_PATH, selected_category, updated_category, update_output)
-                
-                # Update dropdown with new values
-                categories_dropdown.configure(values=category_options)
+                if not update_category_name_and_folder(CONFIG_PATH, selected_category, updated_category, update_output):
+                    messagebox.showerror("Error", f"Category '{selected_category}' could not be updated.")
+                    return
+                refresh_dropdowns()
                 categories_var.set(updated_category)  # Set updated category as selected
                 messagebox.showinfo("Success", f"Category '{selected_category}' updated to '{updated_category}' successfully!")
             else:
@@ -460,15 +604,15 @@ class App(ctk.CTk):
             selected_category = categories_var.get()
             
             if selected_category in category_options:
-                category_options.remove(selected_category)
-                
-                delete_category(CONFIG_PATH, selected_category)
-                
-                # Update dropdown with new values
-                categories_dropdown.configure(values=category_options)
+                if not delete_category(CONFIG_PATH, selected_category):
+                    messagebox.showerror("Error", f"Category '{selected_category}' could not be deleted.")
+                    return
+                refresh_dropdowns()
                 categories_var.set("Uncategorized")  # Reset selection
                 update_entry.delete(0, 'end')  # Clear the entry field
                 messagebox.showinfo("Success", f"Category '{selected_category}' deleted successfully!")
+                if messagebox.askyesno("Reclassify", f"Reclassify the documents filed under '{selected_category}'?"):
+                    self.start_reclassify([selected_category])
             else:
                 messagebox.showerror("Error", f"Category '{selected_category}' not found.")
 
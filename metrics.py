@@ -0,0 +1,265 @@
+""" Timing spans and size histograms for the processing pipeline.
+
+    with span("extract"):
+        ...
+    observe("pdf_llm_prompt_chars", len(prompt), SIZE_BUCKETS, call="combined")
+
+Observations are aggregated into in-memory histograms, written to the metrics
+table through the background database writer, and exported in the Prometheus
+text format to a file and/or a local HTTP endpoint by MetricsExporter.
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import database
+
+METRICS_DEFAULTS = {
+    "enabled": True,
+    "persist": True,  # write every observation to the metrics table
+    "retention_days": 30,
+    "prometheus_file": "metrics.prom",  # None disables the file
+    "http_port": None,  # e.g. 9464 serves http://127.0.0.1:9464/metrics
+    "export_interval": 15.0
+}
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+STAGE_METRIC = "pdf_stage_seconds"
+
+METRIC_HELP = {
+    STAGE_METRIC: "Time spent in each processing step",
+    "pdf_pipeline_wait_seconds": "Time documents waited in front of each pipeline stage",
+    "pdf_document_seconds": "Time from submission to completion of a document",
+    "pdf_llm_prompt_chars": "Prompt size in characters",
+    "pdf_llm_prompt_tokens": "Prompt tokens Ollama had to evaluate (tokens reused from its cache excluded)",
+    "pdf_llm_ttft_seconds": "Time to first token reported by Ollama (model load plus prompt evaluation)",
+    "pdf_llm_completion_tokens": "Generated tokens as counted by Ollama",
+    "pdf_documents_total": "Finished documents by outcome",
+    "pdf_reclassified_total": "Reclassified documents by outcome"
+}
+
+INSERT_METRIC_SQL = 'INSERT INTO metrics (recorded_at, name, label, value) VALUES (?, ?, ?, ?)'
+
+class Histogram:
+    """ Cumulative bucket counts in the Prometheus sense, plus sum and count. """
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """ Estimate a quantile by linear interpolation inside its bucket (like histogram_quantile). """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """ Thread-safe store of histograms and counters keyed by metric name and labels. """
+    def __init__(self, settings=None):
+        self.settings = dict(METRICS_DEFAULTS)
+        self.settings.update(settings or {})
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def configure(self, settings):
+        self.settings.update(settings or {})
+
+    def reset(self):
+        """ Forget all in-memory observations (persisted rows are kept). """
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        if not self.settings["enabled"]:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+        if self.settings["persist"]:
+            label = ",".join(str(value) for _, value in key[1])
+            database.submit_write(INSERT_METRIC_SQL, (time.time(), name, label, float(value)))
+
+    def increment(self, name, amount=1, **labels):
+        if not self.settings["enabled"]:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, stage):
+        """ Time the enclosed block as one observation of pdf_stage_seconds{stage=...}. """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_METRIC, time.perf_counter() - started, stage=stage)
+
+    def snapshot(self):
+        """ {(name, labels): {count, sum, mean, p50, p95}} for every histogram, for display. """
+        result = {}
+        with self.lock:
+            for key, histogram in self.histograms.items():
+                result[key] = {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95)
+                }
+        return result
+
+    def prometheus_text(self):
+        """ All metrics in the Prometheus text exposition format. """
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            described = set()
+            for (name, labels), histogram in histograms:
+                if name not in described:
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} histogram")
+                    described.add(name)
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+            for (name, labels), value in counters:
+                if name not in described:
+                    lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} counter")
+                    described.add(name)
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+metrics = MetricsRegistry()
+
+def span(stage):
+    return metrics.span(stage)
+
+def observe(name, value, buckets=TIME_BUCKETS, **labels):
+    metrics.observe(name, value, buckets, **labels)
+
+def increment(name, amount=1, **labels):
+    metrics.increment(name, amount, **labels)
+
+def record_job(job):
+    """ Record the queue waits, total time and outcome of a finished pipeline Job. """
+    for stage, seconds in job.wait_seconds.items():
+        observe("pdf_pipeline_wait_seconds", seconds, stage=stage)
+    observe("pdf_document_seconds", job.elapsed())
+    increment("pdf_documents_total", outcome="failed" if job.error is not None else "done")
+
+def summarize_persisted(since):
+    """ Rows of (name, label, count, avg, max) from the metrics table since a Unix time. """
+    return database.query('''
+        SELECT name, label, COUNT(*), AVG(value), MAX(value) FROM metrics
+        WHERE recorded_at >= ? GROUP BY name, label ORDER BY name, label
+    ''', (since,))
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class MetricsExporter:
+    """ Periodically write the Prometheus text file and optionally serve it over HTTP on localhost. """
+    def __init__(self, settings=None):
+        metrics.configure(settings)
+        self.settings = metrics.settings
+        self.server = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        if not self.settings["enabled"] or self.thread is not None:
+            return
+        if self.settings["persist"] and self.settings["retention_days"]:
+            cutoff = time.time() - self.settings["retention_days"] * 86400
+            database.submit_write('DELETE FROM metrics WHERE recorded_at < ?', (cutoff,))
+        if self.settings["http_port"]:
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.settings["http_port"]), MetricsHandler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        self.thread = threading.Thread(target=self._loop, name="metrics-export", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
+
+    def write_file(self):
+        path = self.settings["prometheus_file"]
+        if not path:
+            return
+        # Atomic replace, so a node_exporter textfile collector never reads half a file
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(metrics.prometheus_text())
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Failed to write metrics file: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _loop(self):
+        while not self.stopped.wait(self.settings["export_interval"]):
+            self.write_file()
+        self.write_file()
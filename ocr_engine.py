@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from ocr_preprocess import PREPROCESS_DEFAULTS
+
+OCR_DEFAULTS = {
+    "workers": None,  # None = one process per CPU core
+    "dpi": 300,
+    "lang": "deu",
+    "page_timeout": 120,
+    "preprocess": PREPROCESS_DEFAULTS
+}
+
+class OCRError(Exception):
+    """ OCR failed in a worker process (plain message, so it always pickles back). """
+
+def ocr_page(file_path, page_index, dpi, lang, timeout, preprocess):
+    """ Render one PDF page and OCR it. Runs inside a worker process.
+
+    Only the path and page number cross the process boundary; the pixmap is
+    created and consumed in the worker. Returns (text, stats).
+    """
+    import fitz  # PyMuPDF
+    import pytesseract
+    from PIL import Image
+    from ocr_preprocess import preprocess_page
+
+    with fitz.open(file_path) as doc:
+        if preprocess["enabled"]:
+            img, stats = preprocess_page(doc[page_index], dpi, preprocess)
+        else:
+            started = time.perf_counter()
+            pix = doc[page_index].get_pixmap(dpi=dpi)
+            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            stats = {"render_seconds": time.perf_counter() - started, "rgb_bytes": len(pix.samples),
+                     "ocr_bytes": len(pix.samples)}
+    started = time.perf_counter()
+    try:
+        text = pytesseract.image_to_string(img, lang=lang, timeout=timeout)
+    except RuntimeError as e:
+        # pytesseract reports a killed tesseract as RuntimeError('Tesseract process timeout')
+        print(f"OCR of page {page_index + 1} of {os.path.basename(file_path)} failed: {e}")
+        text = ""
+    except Exception as e:
+        # e.g. TesseractNotFoundError, which cannot be unpickled in the parent process
+        raise OCRError(f"{type(e).__name__}: {e}") from None
+    stats["ocr_seconds"] = time.perf_counter() - started
+    return text, stats
+
+class OCREngine:
+    """ Process pool that OCRs PDF pages in parallel across all CPU cores. """
+    def __init__(self, settings=None):
+        self.settings = dict(OCR_DEFAULTS)
+        self.settings.update(settings or {})
+        self.workers = self.settings["workers"] or os.cpu_count() or 1
+        self.executor = None
+        self.lock = threading.Lock()
+        self.preprocess = dict(PREPROCESS_DEFAULTS)
+        self.preprocess.update(self.settings["preprocess"] or {})
+        self.stats = {}
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self.executor
+
+    def _reset_executor(self, broken):
+        with self.lock:
+            if self.executor is broken:
+                self.executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def submit_page(self, file_path, page_index, lang=None):
+        """ Queue a single page; returns a Future with (text, stats). """
+        return self._get_executor().submit(ocr_page, file_path, page_index, self.settings["dpi"],
+                                           lang or self.settings["lang"], self.settings["page_timeout"],
+                                           self.preprocess)
+
+    def _record(self, stats):
+        with self.lock:
+            self.stats["pages"] = self.stats.get("pages", 0) + 1
+            for key, value in stats.items():
+                self.stats[key] = self.stats.get(key, 0) + value
+
+    def report(self):
+        """ Totals over all OCR'd pages: time per step and memory saved against a plain RGB render. """
+        with self.lock:
+            stats = dict(self.stats)
+        pages = stats.get("pages", 0)
+        if not pages:
+            return "OCR: no pages processed yet."
+        saved = stats.get("rgb_bytes", 0) - stats.get("ocr_bytes", 0)
+        return (f"OCR: {pages} pages, render {stats.get('render_seconds', 0) / pages:.2f}s, "
+                f"preprocess {stats.get('preprocess_seconds', 0) / pages:.2f}s, "
+                f"tesseract {stats.get('ocr_seconds', 0) / pages:.2f}s per page; "
+                f"{saved / pages / 1e6:.1f} MB less image data per page than an RGB render")
+
+    def ocr_pages(self, file_path, pages, lang=None):
+        """ OCR the given page numbers in parallel; returns {page_index: text}. """
+        executor = self._get_executor()
+        futures = {page: self.submit_page(file_path, page, lang) for page in pages}
+        texts = {}
+        for page, future in futures.items():
+            try:
+                # Tesseract enforces page_timeout itself; the margin covers rendering and queueing
+                texts[page], stats = future.result(timeout=self.settings["page_timeout"] * 2)
+                self._record(stats)
+            except FutureTimeoutError:
+                print(f"OCR of page {page + 1} of {os.path.basename(file_path)} timed out")
+                future.cancel()
+                texts[page] = ""
+            except BrokenProcessPool:
+                # A crashed worker (e.g. a malformed PDF) breaks the pool; start a new one for the next job
+                self._reset_executor(executor)
+                texts[page] = ""
+        return texts
+
+    def ocr_document(self, file_path, pages=None, lang=None):
+        """ OCR the given pages (all pages if None) and join the text in page order. """
+        if pages is None:
+            import fitz  # PyMuPDF
+            with fitz.open(file_path) as doc:
+                pages = range(doc.page_count)
+        texts = self.ocr_pages(file_path, list(pages), lang)
+        return "\n".join(texts[page] for page in sorted(texts))
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+
+PREPROCESS_DEFAULTS = {
+    "enabled": True,
+    "deskew": True,
+    "max_skew": 5.0,
+    "skew_step": 0.5,
+    "margin": 12
+}
+
+def render_gray(page, dpi):
+    """ Render a page straight to an 8-bit grayscale pixmap (a third of the RGB size). """
+    import fitz  # PyMuPDF; like PIL only needed in the OCR worker processes
+    return page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+
+def pixmap_array(pix):
+    """ View the pixmap samples as a (height, width) uint8 array without copying them. """
+    buffer = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    rows = np.frombuffer(buffer, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return rows[:, :pix.width]
+
+def otsu_threshold(gray):
+    """ Otsu's threshold computed from the 256-bin histogram in one vectorized pass. """
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weights = np.cumsum(histogram)
+    total = weights[-1]
+    means = np.cumsum(histogram * np.arange(256))
+    background = weights
+    foreground = total - weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (means[-1] * background - total * means) ** 2 / (background * foreground)
+    between[~np.isfinite(between)] = 0
+    return int(np.argmax(between))
+
+def estimate_skew(ink, max_skew, step, samples=20000):
+    """ Angle (degrees) whose row projection of the ink pixels is sharpest.
+
+    Text lines give a spiky row histogram when the shear matches the skew, so
+    the angle with the largest histogram variance wins. A random subset of ink
+    pixels keeps this fast on 300 DPI pages.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > samples:
+        pick = np.random.default_rng(0).choice(len(ys), samples, replace=False)
+        ys, xs = ys[pick], xs[pick]
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_skew, max_skew + step / 2, step):
+        shifted = ys + xs * np.tan(np.radians(angle))
+        rows = (shifted - shifted.min()).astype(np.int64)
+        score = np.square(np.bincount(rows).astype(np.float64)).sum()
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+def crop_margins(binary, margin):
+    """ Cut away empty borders, keeping a small margin around the ink. """
+    ink = binary == 0
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if len(rows) == 0:
+        return binary
+    top, bottom = max(0, rows[0] - margin), min(binary.shape[0], rows[-1] + margin + 1)
+    left, right = max(0, cols[0] - margin), min(binary.shape[1], cols[-1] + margin + 1)
+    return binary[top:bottom, left:right]
+
+def preprocess_page(page, dpi, settings):
+    """ Render and clean a page for tesseract; returns (PIL image, stats).
+
+    stats compares the result with the plain RGB render the OCR used before:
+    bytes held in memory, pixels handed to tesseract and time spent here.
+    """
+    from PIL import Image
+
+    started = time.perf_counter()
+    pix = render_gray(page, dpi)
+    rendered = time.perf_counter()
+    gray = pixmap_array(pix)
+    binary = np.where(gray > otsu_threshold(gray), 255, 0).astype(np.uint8)
+    angle = 0.0
+    if settings["deskew"]:
+        angle = estimate_skew(binary == 0, settings["max_skew"], settings["skew_step"])
+        if angle:
+            # A positive angle means the text is turned counter-clockwise, so rotate it back
+            rotated = Image.fromarray(binary).rotate(-angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+            binary = np.asarray(rotated)
+    cropped = crop_margins(binary, settings["margin"])
+    image = Image.fromarray(np.ascontiguousarray(cropped))
+    finished = time.perf_counter()
+    rgb_bytes = pix.width * pix.height * 3
+    stats = {
+        "render_seconds": rendered - started,
+        "preprocess_seconds": finished - rendered,
+        "rgb_bytes": rgb_bytes,
+        "ocr_bytes": cropped.size,
+        "bytes_saved": rgb_bytes - cropped.size,
+        "pixels_cropped": 1 - cropped.size / (pix.width * pix.height),
+        "skew_degrees": angle
+    }
+    return image, stats
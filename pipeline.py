@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+
+PIPELINE_DEFAULTS = {
+    "extract_workers": 2,
+    "ocr_workers": None,  # None = one per OCR process
+    "llm_workers": 1,
+    "max_queue": 100
+}
+
+class Job:
+    """ A single file travelling through the processing stages.
+
+    lane and weight decide its turn in the stage queues (see FairQueue); rule
+    holds per-source options such as the settings of the folder it came from.
+    """
+    def __init__(self, file_path, lane=None, weight=1, rule=None):
+        self.file_path = file_path
+        self.lane = lane
+        self.weight = weight
+        self.rule = rule or {}
+        self.filename = None  # name the document is stored and filed under
+        self.content_hash = None
+        self.text = ""
+        self.pages = {}
+        self.ocr_pages = []
+        self.page_count = 0
+        self.category = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.enqueued_at = time.monotonic()
+        self.stage_seconds = {}  # stage name -> seconds spent running it
+        self.wait_seconds = {}  # stage name -> seconds spent queued in front of it
+
+    def elapsed(self):
+        """ Seconds between submission and completion (or now). """
+        end = self.finished_at or time.time()
+        return end - self.submitted_at
+
+class FairQueue:
+    """ Bounded queue with one FIFO lane per job.lane, served by stride scheduling.
+
+    While several lanes have jobs waiting, a lane of weight w gets w turns for
+    every turn of a lane of weight 1, so a source that submits hundreds of
+    files cannot starve one that submits a single file. A lane that was idle
+    joins at the current virtual time instead of claiming the turns it missed.
+    None (the stop signal) is handed out only once every lane is empty.
+    """
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.lanes = {}  # lane -> deque of jobs
+        self.passes = {}  # lane -> virtual time of its next turn
+        self.clock = 0.0
+        self.stops = 0
+        self.size = 0
+        self.condition = threading.Condition()
+
+    def put(self, job):
+        """ Queue a job (or None); blocks while the queue is full. """
+        with self.condition:
+            while self.maxsize > 0 and self.size >= self.maxsize:
+                self.condition.wait()
+            if job is None:
+                self.stops += 1
+            else:
+                lane = self.lanes.get(job.lane)
+                if lane is None:
+                    lane = self.lanes[job.lane] = deque()
+                    self.passes[job.lane] = max(self.passes.get(job.lane, 0.0), self.clock)
+                lane.append(job)
+            self.size += 1
+            self.condition.notify_all()
+
+    def get(self):
+        """ Remove and return the next job, blocking until there is one. """
+        with self.condition:
+            while self.size == 0:
+                self.condition.wait()
+            self.size -= 1
+            self.condition.notify_all()
+            if not self.lanes:
+                self.stops -= 1
+                return None
+            key = min(self.lanes, key=self.passes.__getitem__)
+            lane = self.lanes[key]
+            job = lane.popleft()
+            if not lane:
+                del self.lanes[key]
+            self.clock = self.passes[key]
+            self.passes[key] += 1.0 / max(job.weight, 1e-6)
+            return job
+
+    def qsize(self):
+        with self.condition:
+            return self.size
+
+class Stage:
+    """ A named processing step with its own bounded pool of worker threads.
+
+    The stage function receives a Job and returns the name of the next stage,
+    or None once the job is finished.
+    """
+    def __init__(self, name, func, workers=1, max_queue=0):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.jobs = FairQueue(maxsize=max_queue)
+        self.threads = []
+        self.active = 0
+
+class ProcessingPipeline:
+    """ Job queue that decouples file events from extraction, OCR and LLM work. """
+    def __init__(self, stages, on_done, entry=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.entry = entry or stages[0].name
+        self.on_done = on_done
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        """ Start the worker threads of every stage. """
+        if self.running:
+            return
+        self.running = True
+        for stage in self.stages.values():
+            for index in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage,), name=f"{stage.name}-{index}", daemon=True)
+                thread.start()
+                stage.threads.append(thread)
+
+    def stop(self, wait=True):
+        """ Stop all workers once the jobs queued so far are done. """
+        if not self.running:
+            return
+        self.running = False
+        if wait:
+            self._drain()
+        else:
+            threading.Thread(target=self._drain, daemon=True).start()
+
+    def _drain(self):
+        # Stages are stopped in order so upstream workers can still hand jobs downstream
+        for stage in self.stages.values():
+            for _ in stage.threads:
+                stage.jobs.put(None)
+            for thread in stage.threads:
+                thread.join()
+            stage.threads = []
+
+    def submit(self, file_path, lane=None, weight=1, rule=None):
+        """ Queue a file for processing; blocks while the entry stage is full. """
+        job = Job(file_path, lane, weight, rule)
+        self.stages[self.entry].jobs.put(job)
+        return job
+
+    def pending(self):
+        """ Number of jobs waiting or running in each stage. """
+        with self.lock:
+            return {name: stage.jobs.qsize() + stage.active for name, stage in self.stages.items()}
+
+    def _worker(self, stage):
+        while True:
+            job = stage.jobs.get()
+            if job is None:
+                return
+            with self.lock:
+                stage.active += 1
+            started = time.monotonic()
+            job.wait_seconds[stage.name] = started - job.enqueued_at
+            try:
+                next_stage = stage.func(job)
+            except Exception as e:
+                job.error = e
+                job.result = f"Failed to process {job.file_path} in {stage.name}: {e}"
+                next_stage = None
+            job.stage_seconds[stage.name] = time.monotonic() - started
+            job.enqueued_at = time.monotonic()
+            # Put the job into the next stage before releasing this one so pending() never drops it
+            if next_stage is not None:
+                self.stages[next_stage].jobs.put(job)
+            with self.lock:
+                stage.active -= 1
+            if next_stage is None:
+                job.finished_at = time.time()
+                try:
+                    self.on_done(job)
+                except Exception as e:
+                    # e.g. "database is locked" while recording the outcome; the worker must keep running
+                    print(f"Failed to record the result of {job.file_path}: {e}")
@@ -0,0 +1,307 @@
+""" File processing shared by the GUI (main.py) and the headless CLI (cli.py).
+
+Nothing in here may import tkinter, customtkinter or pygame.
+"""
+import os
+import shutil
+import hashlib
+import threading
+from watchdog.events import FileSystemEventHandler
+
+import category_store
+import database
+from classifier import classify_document, save_document_info, save_document_path, find_cached_result
+from utils_json import get_category_folder, get_settings, get_registry
+from pipeline import ProcessingPipeline, Stage, PIPELINE_DEFAULTS
+from ocr_engine import OCREngine, OCR_DEFAULTS
+from extraction import select_pages, assemble_text, EXTRACTION_DEFAULTS
+from job_queue import JobDispatcher, JOB_DEFAULTS, CLASSIFYING, set_state
+from metrics import metrics, span, record_job, METRICS_DEFAULTS
+from artifact_store import ArtifactStore, ARTIFACT_DEFAULTS, settings_signature
+
+CONFIG_PATH = 'config.json'
+
+config_registry = get_registry(CONFIG_PATH)
+config = config_registry.get_data()
+
+ocr_engine = OCREngine(get_settings(config, "ocr", OCR_DEFAULTS))
+
+extraction_settings = get_settings(config, "extraction", EXTRACTION_DEFAULTS)
+
+metrics.configure(get_settings(config, "metrics", METRICS_DEFAULTS))
+
+artifact_store = ArtifactStore(get_settings(config, "artifacts", ARTIFACT_DEFAULTS))
+
+def text_signature(lang=None):
+    """ A stored text is only reused when it was extracted and OCR'd with the current settings. """
+    return settings_signature(extraction_settings, lang or ocr_engine.settings["lang"], ocr_engine.settings["dpi"],
+                              ocr_engine.preprocess)
+
+def extract_document_text(file_path, content_hash=None, lang=None):
+    """ Extract the budgeted text, OCR-ing only the selected pages that lack a text layer.
+
+    With a content hash the artifact store is consulted first, so a file that
+    was processed before is neither opened nor OCR'd again. lang overrides the
+    configured OCR language.
+    """
+    artifact = load_artifact(content_hash, lang)
+    if artifact is not None and artifact["text"] is not None:
+        return artifact["text"]
+    with span("extract"):
+        texts, missing, page_count = select_pages(file_path, extraction_settings)
+    missing = reuse_ocr_pages(artifact, texts, missing)
+    if missing:
+        with span("ocr"):
+            texts.update(ocr_engine.ocr_pages(file_path, missing, lang))
+    text = assemble_text(texts, extraction_settings)
+    store_artifact(file_path, content_hash, texts, page_count, text, lang)
+    return text
+
+def load_artifact(content_hash, lang=None):
+    with span("artifact_load"):
+        return artifact_store.get(content_hash, text_signature(lang))
+
+def reuse_ocr_pages(artifact, texts, missing):
+    """ Fill in pages OCR'd by an earlier run; returns the pages that still need OCR. """
+    stored = artifact["pages"] if artifact is not None else {}
+    texts.update({index: stored[index] for index in missing if index in stored})
+    return [index for index in missing if index not in stored]
+
+def store_artifact(file_path, content_hash, pages, page_count, text, lang=None):
+    with span("artifact_store"):
+        artifact_store.put(content_hash, pages, page_count, text, text_signature(lang),
+                           {"file_name": os.path.basename(file_path), "file_size": os.path.getsize(file_path)})
+
+def compute_content_hash(file_path):
+    """ SHA-256 of the file content, used as the result cache key. """
+    digest = hashlib.sha256()
+    with span("hash"), open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Documents with this content whose file is still where it was filed
+FILED_COPIES_SQL = '''
+    SELECT d.filename, d.path, c.name FROM documents d LEFT JOIN categories c ON c.id = d.category_id
+    WHERE d.content_hash = ? AND d.path IS NOT NULL
+'''
+
+reserved_names = {}  # document name -> input file it was given to, or where that file was filed
+reserved_lock = threading.Lock()
+
+def document_name(file_path):
+    """ The file name a new document is stored and filed under.
+
+    Documents are keyed by file name, so a file named like a document that is
+    already filed (e.g. scan_0001.pdf from two scanners) becomes
+    "scan_0001 (2).pdf" instead of overwriting the other document's row. A
+    retried file keeps the name it was given first.
+    """
+    file_path = os.path.abspath(file_path)
+    stem, extension = os.path.splitext(os.path.basename(file_path))
+    number = 1
+    with reserved_lock:
+        while True:
+            name = os.path.basename(file_path) if number == 1 else f"{stem} ({number}){extension}"
+            owner = reserved_names.get(name)
+            if owner == file_path:
+                return name
+            if owner is None and not name_taken(name):
+                reserved_names[name] = file_path
+                return name
+            number += 1
+
+def name_taken(name):
+    """ Whether a stored document has this name and its file still exists (or its location is unknown). """
+    row = database.query_one('SELECT path FROM documents WHERE filename = ?', (name,))
+    return row is not None and (row[0] is None or os.path.exists(row[0]))
+
+def process_file(file_path):
+    content_hash = compute_content_hash(file_path)
+    duplicate = remove_duplicate(file_path, content_hash)
+    if duplicate is not None:
+        return duplicate
+    name = document_name(file_path)
+    cached = reuse_cached_result(file_path, content_hash, name)
+    if cached is not None:
+        return cached
+    text = extract_document_text(file_path, content_hash)
+    return classify_and_move(file_path, text, content_hash, name=name)
+
+def remove_duplicate(file_path, content_hash):
+    """ Delete a file whose identical copy is already filed; returns (result, category), or None.
+
+    Filing the same content again would only add a second row and a second
+    copy under another name.
+    """
+    for filename, path, category in database.query(FILED_COPIES_SQL, (content_hash,)):
+        if os.path.exists(path) and not os.path.samefile(path, file_path):
+            os.remove(file_path)
+            return f"Removed {os.path.basename(file_path)}: identical to {filename} in {category}", category
+    return None
+
+def reuse_cached_result(file_path, content_hash, name=None):
+    """ Move an identical, already classified document without extraction or LLM calls. """
+    cached = find_cached_result(content_hash)
+    if cached is None:
+        return None
+    category, summary, text = cached
+    result, category = move_to_category(file_path, category, name, (summary, content_hash, text, False))
+    return f"{result} (cached)", category
+
+def classify_and_move(file_path, text, content_hash=None, category_hint=None, name=None):
+    name = name or os.path.basename(file_path)
+    category, summary, train = classify_document(name, text, category_hint)
+    return move_to_category(file_path, category, name, (summary, content_hash, text, train))
+
+def move_to_category(file_path, category, name=None, document=None):
+    """ Move a file into its category folder as name, then record it.
+
+    document is (summary, content_hash, extracted_text, train) for
+    save_document_info; the row is only written once the file has been moved.
+    Raises FileExistsError if the name is taken in the category folder.
+    """
+    # A category without a configured folder (e.g. deleted since a cached result was stored) is filed as
+    # Uncategorized; get_category_folder would return an error message that must not become a folder name
+    if category not in config_registry.get_categories():
+        category = category_store.UNCATEGORIZED
+    name = name or os.path.basename(file_path)
+    destination_folder = get_category_folder(CONFIG_PATH, category)
+    destination = os.path.join(destination_folder, name)
+    os.makedirs(destination_folder, exist_ok=True)
+    if os.path.exists(destination):
+        # Fails the job, so the file stays in the input folder and is not recorded as moved
+        raise FileExistsError(f"A file named {name} already exists in {destination_folder}")
+    with span("move"):
+        shutil.move(file_path, destination)
+    with reserved_lock:
+        reserved_names[name] = os.path.abspath(destination)
+    if document is not None:
+        summary, content_hash, text, train = document
+        save_document_info(name, category, summary, content_hash, text, train)
+    save_document_path(name, destination)
+    if name != os.path.basename(file_path):
+        return f"Processed and moved: {os.path.basename(file_path)} to {category} as {name}", category
+    return f"Processed and moved: {name} to {category}", category
+
+def extract_stage(job):
+    """ Pipeline stage: read the text layer, hand pages without one to OCR. """
+    job.content_hash = compute_content_hash(job.file_path)
+    duplicate = remove_duplicate(job.file_path, job.content_hash)
+    if duplicate is not None:
+        job.result, job.category = duplicate
+        return None
+    job.filename = document_name(job.file_path)
+    cached = reuse_cached_result(job.file_path, job.content_hash, job.filename)
+    if cached is not None:
+        # Exact duplicates are finished right here instead of queueing behind LLM work
+        job.result, job.category = cached
+        return None
+    lang = job.rule.get("ocr_lang")
+    artifact = load_artifact(job.content_hash, lang)
+    if artifact is not None and artifact["text"] is not None:
+        job.text = artifact["text"]
+        return "llm"
+    with span("extract"):
+        job.pages, missing, job.page_count = select_pages(job.file_path, extraction_settings)
+    job.ocr_pages = reuse_ocr_pages(artifact, job.pages, missing)
+    if job.ocr_pages:
+        return "ocr"
+    job.text = assemble_text(job.pages, extraction_settings)
+    store_artifact(job.file_path, job.content_hash, job.pages, job.page_count, job.text, lang)
+    return "llm"
+
+def ocr_stage(job):
+    """ Pipeline stage: OCR the selected pages that have no text layer. """
+    lang = job.rule.get("ocr_lang")
+    with span("ocr"):
+        job.pages.update(ocr_engine.ocr_pages(job.file_path, job.ocr_pages, lang))
+    job.text = assemble_text(job.pages, extraction_settings)
+    store_artifact(job.file_path, job.content_hash, job.pages, job.page_count, job.text, lang)
+    return "llm"
+
+def llm_stage(job):
+    """ Pipeline stage: categorize, summarize and move the file. """
+    set_state(job.file_path, CLASSIFYING)
+    job.result, job.category = classify_and_move(job.file_path, job.text, job.content_hash,
+                                                 job.rule.get("category_hint"), job.filename)
+    return None
+
+def create_pipeline(on_done):
+    """ Build the extraction -> OCR -> LLM pipeline with worker counts from config.json. """
+    settings = get_settings(config_registry.get_data(), "pipeline", PIPELINE_DEFAULTS)
+    max_queue = settings["max_queue"]
+
+    def finished(job):
+        record_job(job)
+        on_done(job)
+
+    return ProcessingPipeline([
+        Stage("extract", extract_stage, settings["extract_workers"], max_queue),
+        # One OCR stage thread per OCR process by default, so every core gets a page to work on
+        Stage("ocr", ocr_stage, settings["ocr_workers"] or ocr_engine.workers, max_queue),
+        Stage("llm", llm_stage, settings["llm_workers"], max_queue),
+    ], finished)
+
+def create_job_queue(on_done):
+    """ Build the pipeline behind a durable JobDispatcher; returns (pipeline, dispatcher).
+
+    Files go in through dispatcher.add(), and each job's outcome is written to
+    the jobs table before on_done sees it. Jobs carry the rule of their watched
+    folder, and the stage queues serve the folders in turn by priority.
+    """
+    settings = get_settings(config_registry.get_data(), "jobs", JOB_DEFAULTS)
+
+    def submit(path, rule):
+        if rule is None:
+            pipeline.submit(path)
+        else:
+            pipeline.submit(path, lane=rule["path"], weight=rule["priority"], rule=rule)
+
+    dispatcher = JobDispatcher(submit, settings)
+
+    def finished(job):
+        dispatcher.finished(job)
+        on_done(job)
+
+    pipeline = create_pipeline(finished)
+    return pipeline, dispatcher
+
+def schedule_watch_folders(observer, folders, readiness, log):
+    """ Watch every folder (rule dicts from watch_folders) with one shared FolderMonitor. """
+    event_handler = FolderMonitor(readiness, log)
+    for folder in folders:
+        os.makedirs(folder["path"], exist_ok=True)
+        observer.schedule(event_handler, folder["path"], recursive=folder["recursive"])
+    return event_handler
+
+class FolderMonitor(FileSystemEventHandler):
+    """ Watchdog handler that feeds new PDFs to a FileReadinessDetector.
+
+    Other files (a scanner's .tmp or .part file, Thumbs.db) are ignored; one that
+    is renamed to .pdf once it is finished is picked up by on_moved.
+    """
+    def __init__(self, readiness, log):
+        self.readiness = readiness
+        self.log = log
+
+    def on_created(self, event):
+        if not event.is_directory and event.src_path.lower().endswith('.pdf'):
+            self.log(f"File {os.path.basename(event.src_path)} is added.", "DEBUG")
+            # Processing starts once the readiness detector sees the file completely written
+            self.readiness.watch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.readiness.touch(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.readiness.touch(event.src_path, closed=True)
+
+    def on_moved(self, event):
+        # Scanners often write to a temporary name and rename the finished file
+        if not event.is_directory:
+            self.readiness.forget(event.src_path)
+            if event.dest_path.lower().endswith('.pdf'):
+                self.readiness.watch(event.dest_path)
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+
+READINESS_DEFAULTS = {
+    "poll_interval": 0.25,
+    "min_quiet": 0.5,
+    "max_quiet": 15.0,
+    "timeout": 900
+}
+
+def pdf_looks_complete(file_path):
+    """ A finished PDF ends with an %%EOF marker within its last kilobyte. """
+    if not file_path.lower().endswith(".pdf"):
+        return True
+    try:
+        with open(file_path, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            file.seek(max(0, size - 1024))
+            return b"%%EOF" in file.read()
+    except OSError:
+        return False
+
+# ERROR_SHARING_VIOLATION and ERROR_LOCK_VIOLATION
+SHARING_VIOLATIONS = (32, 33)
+
+def is_file_locked(file_path):
+    """ Check whether another process still holds the file open for writing.
+
+    Windows (and SMB shares) refuse a read/write open while the scanner keeps its
+    handle, so this is a reliable signal there. Only that sharing violation
+    counts: a file that is merely not writable (read-only attribute or share,
+    restrictive ACL) is complete. On POSIX the open would succeed anyway, so the
+    size/mtime stability plus the PDF trailer check have to do the job.
+    """
+    if os.name != 'nt':
+        return False
+    try:
+        with open(file_path, 'rb+'):
+            return False
+    except OSError as e:
+        return getattr(e, 'winerror', None) in SHARING_VIOLATIONS
+
+class PendingFile:
+    """ Observed state of a file that is still being written. """
+    def __init__(self, file_path):
+        now = time.monotonic()
+        self.file_path = file_path
+        self.first_seen = now
+        self.last_change = now
+        self.size = -1
+        self.mtime = None
+        self.max_gap = 0.0
+        self.closed = False
+
+class FileReadinessDetector:
+    """ Hand files on as soon as they are completely written.
+
+    Files are polled until size and mtime stop changing for a quiet period. The
+    quiet period adapts to the largest pause seen between writes, so a slow SMB
+    transfer gets a longer debounce than a PDF that appears in one go. A watchdog
+    close event on a complete PDF skips the wait entirely.
+    """
+    def __init__(self, on_ready, settings=None, on_timeout=None):
+        self.on_ready = on_ready
+        self.on_timeout = on_timeout
+        self.settings = dict(READINESS_DEFAULTS)
+        self.settings.update(settings or {})
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="readiness", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def watch(self, file_path):
+        """ Start tracking a newly created file. """
+        with self.lock:
+            if file_path not in self.pending:
+                self.pending[file_path] = PendingFile(file_path)
+        self.wakeup.set()
+
+    def touch(self, file_path, closed=False):
+        """ Record a modified or closed event for a tracked file. """
+        with self.lock:
+            pending = self.pending.get(file_path)
+            if pending is None:
+                return
+            if closed:
+                pending.closed = True
+        self.wakeup.set()
+
+    def forget(self, file_path):
+        with self.lock:
+            self.pending.pop(file_path, None)
+
+    def waiting(self):
+        with self.lock:
+            return len(self.pending)
+
+    def quiet_period(self, pending):
+        """ Debounce window: twice the longest pause seen between writes, clamped. """
+        quiet = max(self.settings["min_quiet"], 2 * pending.max_gap)
+        return min(quiet, self.settings["max_quiet"])
+
+    def check(self, pending, now):
+        """ Return 'ready', 'timeout', 'gone' or None if the file is still being written. """
+        try:
+            stat = os.stat(pending.file_path)
+        except FileNotFoundError:
+            return "gone"
+        except OSError:
+            return None
+        if stat.st_size != pending.size or stat.st_mtime != pending.mtime:
+            if pending.size >= 0:
+                pending.max_gap = max(pending.max_gap, now - pending.last_change)
+            pending.size = stat.st_size
+            pending.mtime = stat.st_mtime
+            pending.last_change = now
+            if not pending.closed:
+                return None
+        if pending.size > 0:
+            if pending.closed and pdf_looks_complete(pending.file_path):
+                return "ready"
+            if now - pending.last_change >= self.quiet_period(pending):
+                if not is_file_locked(pending.file_path) and pdf_looks_complete(pending.file_path):
+                    return "ready"
+                # Still locked or missing its trailer: treat it like a fresh write
+                pending.closed = False
+                pending.max_gap = max(pending.max_gap, now - pending.last_change)
+                pending.last_change = now
+        if now - pending.first_seen > self.settings["timeout"]:
+            return "timeout"
+        return None
+
+    def _loop(self):
+        while self.running:
+            now = time.monotonic()
+            with self.lock:
+                candidates = list(self.pending.values())
+            for pending in candidates:
+                state = self.check(pending, now)
+                if state is None:
+                    continue
+                self.forget(pending.file_path)
+                if state == "ready":
+                    self.on_ready(pending.file_path)
+                elif state == "timeout" and self.on_timeout is not None:
+                    self.on_timeout(pending.file_path)
+            self.wakeup.wait(self.settings["poll_interval"])
+            self.wakeup.clear()
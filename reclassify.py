@@ -0,0 +1,273 @@
+""" Re-run categorization over documents that are already filed.
+
+Renaming or deleting a category leaves the rows in documents.db and the files
+in the category folders with the old names. A reclassification run selects
+documents, classifies their stored text again on parallel LLM workers and
+applies the results in batches: the files of a batch are moved into the
+folders of their new categories and the rows updated in one transaction.
+
+Progress is checkpointed in the reclassify table, one row per selected
+document, so a run that was interrupted continues with the documents that are
+still pending:
+
+    python cli.py reclassify --stale
+    python cli.py reclassify --resume
+"""
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import database
+import classifier
+import category_store
+from processing import CONFIG_PATH, extract_document_text, load_artifact
+from utils_json import get_registry
+from metrics import span, increment
+
+RECLASSIFY_DEFAULTS = {
+    "workers": 4,  # documents classified at the same time; the LLM gateway still caps concurrent requests
+    "batch_size": 50,  # results moved and written per transaction
+    "resummarize": False,  # also replace the summaries (combined call) instead of asking for the category only
+    "search_folders": []  # extra folders to look for files whose location is not recorded
+}
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+PENDING_SQL = '''
+    SELECT r.filename, c.name, d.content_hash, d.path FROM reclassify r
+    JOIN documents d ON d.filename = r.filename
+    LEFT JOIN categories c ON c.id = d.category_id
+    WHERE r.state = 'pending'
+    ORDER BY d.id
+'''
+
+UPDATE_DOCUMENT_SQL = f'''
+    UPDATE documents SET category_id = {category_store.CATEGORY_ID_SQL}, summary = COALESCE(?, summary),
+    categories_signature = ?, path = COALESCE(?, path), classified_at = ?
+    WHERE filename = ?
+'''
+
+UPDATE_CHECKPOINT_SQL = '''
+    UPDATE reclassify SET state = ?, old_category = ?, new_category = ?, error = ?, updated_at = ?
+    WHERE filename = ?
+'''
+
+def select_documents(all_documents=False, stale=False, categories=None, filenames=None):
+    """ Filenames of the documents to reclassify.
+
+    stale selects documents classified while a different set of categories was
+    configured, which covers every rename, deletion and addition since.
+    """
+    if all_documents:
+        rows = database.query('SELECT filename FROM documents ORDER BY id')
+    elif stale:
+        signature = classifier.categories_signature(classifier.categories)
+        rows = database.query('SELECT filename FROM documents WHERE categories_signature IS NOT ? ORDER BY id',
+                              (signature,))
+    elif categories:
+        # Old names of renamed categories still resolve through their aliases
+        category_ids = category_store.category_ids(categories)
+        placeholders = ", ".join("?" for _ in category_ids)
+        rows = database.query(f'SELECT filename FROM documents WHERE category_id IN ({placeholders}) ORDER BY id',
+                              tuple(category_ids))
+    else:
+        return list(filenames or [])
+    return [filename for filename, in rows]
+
+def progress():
+    """ {state: count} of the current (or last) run. """
+    return dict(database.query('SELECT state, COUNT(*) FROM reclassify GROUP BY state'))
+
+def category_folder(category, config):
+    folders = config.get("categories", {})
+    if category in folders:
+        return folders[category]
+    if category == category_store.UNCATEGORIZED:
+        return category_store.UNCATEGORIZED_FOLDER  # where Manual Classify looks for documents
+    return None
+
+class Reclassifier:
+    """ Checkpointed, parallel re-classification of stored documents. """
+    def __init__(self, settings=None, log=print):
+        self.settings = dict(RECLASSIFY_DEFAULTS)
+        self.settings.update(settings or {})
+        self.log = log
+        self.stopped = threading.Event()
+        self.located = None  # filename -> path from scanning the folders, built when first needed
+        self.located_lock = threading.Lock()
+
+    def start(self, filenames):
+        """ Replace the checkpoint with a new selection; returns how many documents were selected. """
+        now = time.time()
+        database.flush()  # documents queued on the background writer must exist before they are selected
+        conn = database.get_connection()
+        with conn:
+            conn.execute('DELETE FROM reclassify')
+            conn.executemany('''
+                INSERT OR IGNORE INTO reclassify (filename, state, updated_at)
+                SELECT filename, 'pending', ? FROM documents WHERE filename = ?
+            ''', ((now, filename) for filename in filenames))
+        return progress().get(PENDING, 0)
+
+    def retry_failed(self):
+        """ Put the documents that failed in the last run back to pending; returns how many. """
+        return database.execute("UPDATE reclassify SET state = 'pending', error = NULL WHERE state = 'failed'").rowcount
+
+    def stop(self):
+        """ Finish the documents in flight, apply them and return from run(). """
+        self.stopped.set()
+
+    def run(self, on_progress=None):
+        """ Classify all pending documents; returns the {state: count} progress at the end.
+
+        on_progress(progress, rate) is called after every applied batch, with
+        the rate in documents per minute.
+        """
+        self.stopped.clear()
+        pending = database.query(PENDING_SQL)
+        workers = max(1, self.settings["workers"])
+        started = time.monotonic()
+        finished = 0
+        batch = []
+        with ThreadPoolExecutor(workers, thread_name_prefix="reclassify") as pool:
+            rows = iter(pending)
+            in_flight = set()
+            while True:
+                # A bounded window of submitted documents, so stopping does not wait for the whole archive
+                while len(in_flight) < workers * 2 and not self.stopped.is_set():
+                    row = next(rows, None)
+                    if row is None:
+                        break
+                    in_flight.add(pool.submit(self.classify, *row))
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                batch.extend(future.result() for future in done)
+                if len(batch) >= self.settings["batch_size"] or not in_flight:
+                    self.apply(batch)
+                    finished += len(batch)
+                    batch = []
+                    if on_progress is not None:
+                        minutes = (time.monotonic() - started) / 60
+                        on_progress(progress(), finished / minutes if minutes > 0 else 0.0)
+        if finished:
+            classifier.forget_history()
+        return progress()
+
+    def classify(self, filename, category, content_hash, path):
+        """ Worker: returns (filename, old category, new category, summary, path, error). """
+        try:
+            path = self.locate(filename, path)
+            text = self.load_text(filename, content_hash, path)
+            if self.settings["resummarize"]:
+                new_category, summary, confidence = classifier.categorize_and_summarize(text)
+            else:
+                new_category = classifier.categorize_document(text)
+                summary = None
+            return filename, category, new_category, summary, path, None
+        except Exception as e:
+            return filename, category, None, None, path, str(e) or type(e).__name__
+
+    def load_text(self, filename, content_hash, path):
+        """ The stored extracted text, else the artifact store's copy or a fresh extraction of the file. """
+        row = database.query_one('SELECT extracted_text FROM documents WHERE filename = ?', (filename,))
+        if row is not None and row[0]:
+            return row[0]
+        if path is not None:
+            return extract_document_text(path, content_hash)
+        artifact = load_artifact(content_hash)
+        if artifact is not None and artifact["text"]:
+            return artifact["text"]
+        raise FileNotFoundError(f"No stored text for {filename} and the file was not found")
+
+    def locate(self, filename, path):
+        """ Current location of a document: the recorded path, else a search of the category folders. """
+        if path and os.path.isfile(path):
+            return path
+        with self.located_lock:
+            if self.located is None:
+                self.located = self.scan_folders()
+            return self.located.get(filename)
+
+    def scan_folders(self):
+        """ One directory listing per folder instead of a lookup per document.
+
+        Besides the category folders this covers their sibling folders, which is
+        where the folder of a renamed or deleted category usually still is.
+        """
+        config = get_registry(CONFIG_PATH).get_data()
+        folders = list(config.get("categories", {}).values()) + [category_store.UNCATEGORIZED_FOLDER]
+        for parent in {os.path.dirname(os.path.abspath(folder)) for folder in folders}:
+            try:
+                with os.scandir(parent) as entries:
+                    folders.extend(entry.path for entry in entries if entry.is_dir())
+            except OSError:
+                pass
+        located = {}
+        for folder in folders + list(self.settings["search_folders"]):
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            located.setdefault(entry.name, entry.path)
+            except OSError:
+                pass
+        return located
+
+    def apply(self, results):
+        """ Move the files of a batch and write the rows and the checkpoint in one transaction. """
+        if not results:
+            return
+        config = get_registry(CONFIG_PATH).get_data()
+        signature = classifier.categories_signature(classifier.categories)
+        now = time.time()
+        documents = []
+        checkpoints = []
+        with span("reclassify_apply"):
+            for filename, old_category, new_category, summary, path, error in results:
+                if error is None:
+                    path, error = self.move(filename, path, new_category, config)
+                if error is not None:
+                    self.log(f"Reclassifying {filename} failed: {error}", "ERROR")
+                    checkpoints.append((FAILED, old_category, new_category, error, now, filename))
+                    increment("pdf_reclassified_total", outcome="failed")
+                    continue
+                documents.append((new_category, new_category, summary, signature, path and os.path.abspath(path),
+                                  now, filename))
+                checkpoints.append((DONE, old_category, new_category, None, now, filename))
+                increment("pdf_reclassified_total", outcome="changed" if new_category != old_category else "unchanged")
+                if new_category != old_category:
+                    self.log(f"{filename}: {old_category} -> {new_category}", "INFO")
+            conn = database.get_connection()
+            with conn:
+                conn.executemany(category_store.ENSURE_CATEGORY_SQL,
+                                 [(name, now, now, name) for name in {row[0] for row in documents}])
+                conn.executemany(UPDATE_DOCUMENT_SQL, documents)
+                conn.executemany(UPDATE_CHECKPOINT_SQL, checkpoints)
+
+    def move(self, filename, path, category, config):
+        """ Move a file into its category folder; returns (new path, error). """
+        if path is None:
+            return None, None  # only the row is updated; the file is no longer in any known folder
+        destination_folder = category_folder(category, config)
+        if destination_folder is None:
+            return path, None
+        destination = os.path.join(destination_folder, filename)
+        if os.path.abspath(destination) == os.path.abspath(path):
+            return path, None
+        if os.path.exists(destination):
+            return path, f"A file named {filename} already exists in {destination_folder}"
+        try:
+            os.makedirs(destination_folder, exist_ok=True)
+            with span("move"):
+                shutil.move(path, destination)
+        except OSError as e:
+            return path, f"Could not move to {destination_folder}: {e}"
+        with self.located_lock:
+            if self.located is not None:
+                self.located[filename] = destination
+        return destination, None
@@ -0,0 +1,124 @@
+import re
+import threading
+import zlib
+
+import numpy as np
+
+RETRIEVAL_DEFAULTS = {
+    "top_k": 8,
+    "per_category": 2,
+    "dimensions": 1024,
+    "query_chars": 4000
+}
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text):
+    """ Lowercase word tokens; \\w keeps German umlauts and ß intact. """
+    return TOKEN_PATTERN.findall(text.lower())
+
+def hash_features(text, dimensions):
+    """ Signed feature hashing of word unigrams and bigrams into a dense vector. """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    tokens = tokenize(text)
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dimensions] += 1.0 if (h >> 31) & 1 else -1.0
+    # Sublinear term frequency keeps long summaries from dominating
+    np.copysign(np.log1p(np.abs(vector)), vector, out=vector)
+    return vector
+
+class SummaryIndex:
+    """ In-memory similarity index over the stored document summaries.
+
+    Every summary is a row of hashed n-gram features in a NumPy matrix, so the
+    lookup for the examples closest to a new document is a single matrix-vector
+    product. IDF weights are applied on the query side, which lets rows stay
+    untouched while the archive grows.
+    """
+    def __init__(self, dimensions=RETRIEVAL_DEFAULTS["dimensions"]):
+        self.dimensions = dimensions
+        self.lock = threading.Lock()
+        self.matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self.document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self.size = 0
+        self.filenames = []
+        self.categories = []
+        self.summaries = []
+        self.rows_by_filename = {}
+
+    def __len__(self):
+        return self.size
+
+    def build(self, rows):
+        """ Rebuild the index from (filename, category, summary) rows. """
+        with self.lock:
+            self.matrix = np.zeros((max(16, len(rows)), self.dimensions), dtype=np.float32)
+            self.document_frequency[:] = 0
+            self.size = 0
+            self.filenames, self.categories, self.summaries = [], [], []
+            self.rows_by_filename = {}
+            for filename, category, summary in rows:
+                self._add(filename, category, summary)
+
+    def add(self, filename, category, summary):
+        """ Add or replace a single document. """
+        with self.lock:
+            self._add(filename, category, summary)
+
+    def _add(self, filename, category, summary):
+        vector = hash_features(summary or "", self.dimensions)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        row = self.rows_by_filename.get(filename)
+        if row is None:
+            if self.size == self.matrix.shape[0]:
+                grown = np.zeros((max(16, self.size * 2), self.dimensions), dtype=np.float32)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+            row = self.size
+            self.size += 1
+            self.filenames.append(filename)
+            self.categories.append(category)
+            self.summaries.append(summary)
+            self.rows_by_filename[filename] = row
+        else:
+            self.document_frequency -= self.matrix[row] != 0
+            self.categories[row] = category
+            self.summaries[row] = summary
+        self.matrix[row] = vector
+        self.document_frequency += vector != 0
+
+    def select(self, content, top_k, per_category):
+        """ Return (category, summary) examples most similar to the given content.
+
+        The top_k overall matches come first, followed by up to per_category of
+        the best matches for every category not already well represented.
+        """
+        with self.lock:
+            if self.size == 0:
+                return []
+            query = hash_features(content, self.dimensions)
+            idf = np.log((1 + self.size) / (1 + self.document_frequency)) + 1
+            query *= idf * idf
+            scores = self.matrix[:self.size] @ query
+            k = min(top_k, self.size)
+            chosen = []
+            if k > 0:
+                best = np.argpartition(-scores, k - 1)[:k]
+                chosen = list(best[np.argsort(-scores[best])])
+            if per_category > 0:
+                taken = set(chosen)
+                categories = np.array(self.categories, dtype=object)
+                for category in dict.fromkeys(self.categories):
+                    rows = np.flatnonzero(categories == category)
+                    have = sum(1 for row in rows if row in taken)
+                    if have >= per_category:
+                        continue
+                    ranked = rows[np.argsort(-scores[rows])]
+                    extra = [row for row in ranked if row not in taken][:per_category - have]
+                    chosen.extend(extra)
+                    taken.update(extra)
+            return [(self.categories[row], self.summaries[row]) for row in chosen]
@@ -0,0 +1,219 @@
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+
+import database
+import category_store
+
+SEARCH_DEFAULTS = {
+    "debounce_ms": 300,  # typing pause before the query runs
+    "min_chars": 2,  # shorter input is not searched; the prefix index starts at two characters
+    "page_size": 100,
+    "count_limit": 10000  # counting stops here and the total is shown as "10000+"
+}
+
+# Column weights for bm25(): filename, category, summary, extracted_text
+BM25_WEIGHTS = (8.0, 4.0, 2.0, 1.0)
+
+SNIPPET_TOKENS = 12
+
+# Umlauts are folded to their base letter by the tokenizer (remove_diacritics),
+# so the spelled-out forms have to be searched as alternatives explicitly
+TRANSLITERATIONS = (("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss"))
+
+# The category column of the index holds "category<id>" tokens; words are matched against the names instead
+TEXT_COLUMNS = "{filename summary extracted_text}"
+CATEGORY_TOKEN = re.compile(r"\[?category\d+\]?")
+
+FTS_SEARCH_SQL = f'''
+    SELECT d.filename, c.name, d.summary,
+           snippet(documents_fts, -1, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet
+    FROM documents_fts
+    JOIN documents d ON d.id = documents_fts.rowid
+    LEFT JOIN categories c ON c.id = d.category_id
+    WHERE documents_fts MATCH ?
+    ORDER BY bm25(documents_fts, {", ".join(str(w) for w in BM25_WEIGHTS)})
+    LIMIT ? OFFSET ?
+'''
+
+LIKE_SEARCH_SQL = '''
+    SELECT d.filename, c.name, d.summary, d.summary
+    FROM documents d
+    LEFT JOIN categories c ON c.id = d.category_id
+    WHERE d.filename LIKE ? OR c.name LIKE ? OR d.summary LIKE ?
+    LIMIT ? OFFSET ?
+'''
+
+FTS_COUNT_SQL = '''
+    SELECT COUNT(*) FROM (SELECT 1 FROM documents_fts WHERE documents_fts MATCH ? LIMIT ?)
+'''
+
+LIKE_COUNT_SQL = '''
+    SELECT COUNT(*) FROM (
+        SELECT 1 FROM documents d
+        LEFT JOIN categories c ON c.id = d.category_id
+        WHERE d.filename LIKE ? OR c.name LIKE ? OR d.summary LIKE ?
+        LIMIT ?
+    )
+'''
+
+SearchPage = namedtuple("SearchPage", "generation text page rows total error")
+
+def fold(text):
+    """ Lower case without diacritics, like the index's unicode61 remove_diacritics tokenizer. """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def category_words():
+    """ [(category id, folded words of a name or alias)] of every category. """
+    return [(category_id, [fold(word) for word in re.findall(r"\w+", name)])
+            for category_id, name in category_store.names_and_aliases()]
+
+def build_match_query(text, categories=()):
+    """ Turn user input into an FTS5 query: every word as a prefix term, all required.
+
+    "müller versich" becomes ("müller"* OR "mueller"*) AND "versich"*, and
+    "mueller" is searched as ("mueller"* OR "müller"*) in the same way
+    (column filters left out). A word that starts a word of a category name or alias, given as
+    category_words() pairs, also matches the documents of that category.
+    """
+    terms = []
+    for word in re.findall(r"\w+", text.lower()):
+        variants = [word]
+        spelled, folded = word, word
+        for umlaut, replacement in TRANSLITERATIONS:
+            spelled = spelled.replace(umlaut, replacement)
+            folded = folded.replace(replacement, umlaut)
+        for variant in (spelled, folded):
+            if variant not in variants:
+                variants.append(variant)
+        alternatives = " OR ".join(f'"{variant}"*' for variant in variants)
+        term = f"{TEXT_COLUMNS} : ({alternatives})"
+        prefixes = [fold(variant) for variant in variants]
+        category_ids = sorted({category_id for category_id, words in categories
+                               if any(name_word.startswith(prefix) for name_word in words for prefix in prefixes)})
+        if category_ids:
+            tokens = " OR ".join(f'"category{category_id}"' for category_id in category_ids)
+            term = f"({term} OR category : ({tokens}))"
+        terms.append(term)
+    return " AND ".join(terms)
+
+def search_documents(text, limit=200, offset=0):
+    """ Return (filename, category, summary, snippet) rows, best matches first.
+
+    Uses the FTS5 index with BM25 ranking when it exists and falls back to a
+    LIKE scan on databases without FTS5 support.
+    """
+    if database.has_table('documents_fts'):
+        match = build_match_query(text, category_words())
+        if not match:
+            return []
+        rows = database.query(FTS_SEARCH_SQL, (match, limit, offset))
+        # A document found through its category alone has only the id token to show
+        return [(filename, category, summary, summary if CATEGORY_TOKEN.fullmatch(snippet or "") else snippet)
+                for filename, category, summary, snippet in rows]
+    pattern = '%' + text.lower() + '%'
+    return database.query(LIKE_SEARCH_SQL, (pattern, pattern, pattern, limit, offset))
+
+def count_documents(text, limit=SEARCH_DEFAULTS["count_limit"]):
+    """ Number of matches, counted up to limit.
+
+    Only the index is read (no join, ranking or snippets), and a broad query
+    stops at limit instead of counting the whole archive.
+    """
+    if database.has_table('documents_fts'):
+        match = build_match_query(text, category_words())
+        if not match:
+            return 0
+        return database.query_one(FTS_COUNT_SQL, (match, limit))[0]
+    pattern = '%' + text.lower() + '%'
+    return database.query_one(LIKE_COUNT_SQL, (pattern, pattern, pattern, limit))[0]
+
+class BackgroundSearch:
+    """ Runs searches on one worker thread, so the UI thread never waits for SQLite.
+
+    Every request() gets a new generation number and supersedes the previous
+    one: a query still running is cancelled with Connection.interrupt(), and
+    requests made while the worker is busy collapse into the latest. Results
+    are handed to on_result(SearchPage) on the worker thread.
+    """
+    def __init__(self, on_result, settings=None):
+        self.settings = dict(SEARCH_DEFAULTS)
+        self.settings.update(settings or {})
+        self.on_result = on_result
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.pending = None  # (generation, text, page) waiting for the worker
+        self.running = False
+        self.conn = None
+        self.thread = None
+        self.totals = {}  # text -> total of the last search, so turning pages does not count again
+
+    def request(self, text, page=0):
+        """ Search for text and return the generation number of the request. """
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, text, page)
+            if self.running:
+                self.conn.interrupt()  # the stale query stops with OperationalError "interrupted"
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="search", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+            return self.generation
+
+    def _run(self):
+        self.conn = database.get_connection()
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                generation, text, page = self.pending
+                self.pending = None
+                self.running = True
+            rows, total, error = [], 0, None
+            try:
+                rows, total = self._search(text, page)
+            except Exception as e:  # reported like a syntax error; the worker must stay alive for the next search
+                error = str(e) or type(e).__name__
+            finally:
+                with self.condition:
+                    self.running = False
+            if generation == self.generation:
+                self.on_result(SearchPage(generation, text, page, rows, total, error))
+
+    def _search(self, text, page):
+        page_size = self.settings["page_size"]
+        rows = search_documents(text, page_size, page * page_size)
+        if page == 0 or text not in self.totals:
+            self.totals = {text: count_documents(text, self.settings["count_limit"])}
+        return rows, self.totals[text]
+
+def backfill_text(artifacts):
+    """ Fill in extracted_text of documents stored without it from the artifact store; returns how many. """
+    rows = database.query('SELECT id, content_hash FROM documents '
+                          'WHERE extracted_text IS NULL AND content_hash IS NOT NULL')
+    updates = []
+    for document_id, content_hash in rows:
+        artifact = artifacts.get(content_hash)
+        if artifact is not None and artifact.get("text"):
+            updates.append((artifact["text"], document_id))
+    if updates:
+        conn = database.get_connection()
+        with conn:
+            conn.executemany('UPDATE documents SET extracted_text = ? WHERE id = ?', updates)
+    return len(updates)
+
+def rebuild_index(artifacts=None):
+    """ Rebuild the full-text index from the documents table.
+
+    With an ArtifactStore, texts missing from the table are taken from there
+    first instead of extracting or OCR-ing the PDFs again.
+    """
+    if artifacts is not None:
+        backfilled = backfill_text(artifacts)
+        if backfilled:
+            print(f"Took the text of {backfilled} documents from the artifact store.")
+    if database.has_table('documents_fts'):
+        database.execute("INSERT INTO documents_fts (documents_fts) VALUES ('rebuild')")
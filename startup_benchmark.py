@@ -0,0 +1,91 @@
+""" Measure how long the entry modules take to import, using python -X importtime.
+
+    python startup_benchmark.py --save before.json
+    (change something)
+    python startup_benchmark.py --compare before.json
+
+Every module is imported in a fresh interpreter several times; the median of
+the reported cumulative import time and of the process wall time is shown,
+together with the slowest packages pulled in along the way.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = ["classifier", "processing", "cli", "main"]
+
+def parse_importtime(stderr):
+    """ Return {module: (self_us, cumulative_us)} from -X importtime output. """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def measure(module, cwd):
+    """ Import module once in a fresh interpreter; returns (import seconds, wall seconds, timings). """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"import {module} failed:\n" + "\n".join(errors[-3:]))
+    timings = parse_importtime(result.stderr)
+    return timings[module][1] / 1e6, wall, timings
+
+def benchmark(modules, runs, cwd):
+    results = {}
+    for module in modules:
+        imports, walls, slowest = [], [], {}
+        for _ in range(runs):
+            seconds, wall, timings = measure(module, cwd)
+            imports.append(seconds)
+            walls.append(wall)
+            # Top-level packages only, so langchain_core counts once instead of per submodule
+            slowest = {name: cumulative for name, (_, cumulative) in timings.items()
+                       if "." not in name and name != module}
+        results[module] = {
+            "import_seconds": statistics.median(imports),
+            "wall_seconds": statistics.median(walls),
+            "slowest": sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:5]
+        }
+    return results
+
+def print_results(results, baseline=None):
+    for module, result in results.items():
+        line = f"{module:<12} import {result['import_seconds'] * 1000:7.0f} ms   wall {result['wall_seconds'] * 1000:7.0f} ms"
+        if baseline and module in baseline:
+            before = baseline[module]["import_seconds"]
+            line += f"   (was {before * 1000:.0f} ms, {before / max(result['import_seconds'], 1e-9):.1f}x faster)"
+        print(line)
+        for name, cumulative in result["slowest"]:
+            print(f"    {name:<24} {cumulative / 1000:7.0f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup import time benchmark")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    results = benchmark(args.modules, args.runs, cwd)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+""" Page selection and text assembly within the character budget. """
+import fitz
+
+from extraction import GAP_MARKER, assemble_text, iter_budget_pages, select_pages
+
+SETTINGS = {"char_budget": 1000, "tail_ratio": 0.25, "min_page_chars": 20, "ocr_page_chars": 400}
+
+def make_pdf(path, pages):
+    """ A PDF with one page per entry: its number of 50 character lines, 0 for a page without text. """
+    doc = fitz.open()
+    for index, lines in enumerate(pages):
+        page = doc.new_page()
+        if lines:
+            page.insert_text((50, 72), "\n".join([f"page {index:03} ".ljust(49, "x")] * lines), fontsize=9)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+def test_pages_are_read_from_the_front_then_the_back():
+    read = []
+
+    def page_size(index):
+        read.append(index)
+        return 300
+
+    pages = list(iter_budget_pages(10, 750, 250, page_size))
+    assert pages == read == [0, 1, 2, 9]
+
+def test_unused_head_budget_goes_to_the_tail():
+    pages = list(iter_budget_pages(10, 750, 250, lambda index: 700 if index == 0 else 100))
+    assert pages == [0, 1, 9, 8, 7]
+
+def test_a_short_document_is_read_once_per_page():
+    pages = list(iter_budget_pages(3, 750, 250, lambda index: 10))
+    assert pages == [0, 1, 2]
+    assert list(iter_budget_pages(0, 750, 250, lambda index: 10)) == []
+
+def test_select_pages_stops_at_the_budget(tmp_path):
+    texts, missing, page_count = select_pages(make_pdf(tmp_path / "long.pdf", [6] * 40), SETTINGS)
+    assert page_count == 40
+    assert sorted(texts) == [0, 1, 2, 39]
+    assert missing == []
+    assert all(f"page {index:03}" in texts[index] for index in texts)
+
+def test_pages_without_text_are_left_for_ocr(tmp_path):
+    texts, missing, _ = select_pages(make_pdf(tmp_path / "scan.pdf", [0, 6, 0, 0, 6, 6]), SETTINGS)
+    # Pages 0 and 2 count as ocr_page_chars (400) each, so the head budget of 750 ends after page 2
+    assert sorted(texts) == [1, 5]
+    assert missing == [0, 2]
+
+def test_assemble_text_marks_gaps_between_pages():
+    text = assemble_text({9: "tail", 0: "head ", 1: "more "}, SETTINGS)
+    assert text == "head more " + GAP_MARKER + "tail"
+
+def test_assemble_text_keeps_head_and_tail_of_the_budget():
+    text = assemble_text({0: "h" * 2000, 1: "t" * 2000}, SETTINGS)
+    assert text == "h" * 750 + GAP_MARKER + "t" * 250
@@ -0,0 +1,101 @@
+""" The durable job queue and how it shares the pipeline between watched folders. """
+import time
+
+import database
+import job_queue
+
+def rows(*folders):
+    """ Due rows in created_at order, one per entry of folders. """
+    return [(index, f"{folder}/{index}.pdf", folder, float(index)) for index, folder in enumerate(folders)]
+
+def picked_folders(picked):
+    return [folder for _, _, folder, _ in picked]
+
+def test_fair_share_alternates_between_folders():
+    due = rows("Berlin", "Berlin", "Berlin", "Berlin", "Paris", "Paris")
+    assert picked_folders(job_queue.fair_share(due, 4, {}, {})) == ["Berlin", "Paris", "Berlin", "Paris"]
+
+def test_fair_share_keeps_the_order_within_a_folder():
+    due = rows("Berlin", "Paris", "Berlin", "Paris")
+    assert [job_id for job_id, *_ in job_queue.fair_share(due, 4, {}, {})] == [0, 1, 2, 3]
+
+def test_fair_share_follows_the_priorities():
+    due = rows(*["Berlin"] * 6, *["Paris"] * 6)
+    picked = job_queue.fair_share(due, 6, {"Berlin": 2, "Paris": 1}, {})
+    assert picked_folders(picked).count("Berlin") == 4
+
+def test_fair_share_counts_the_jobs_in_flight():
+    due = rows("Berlin", "Berlin", "Paris", "Paris")
+    picked = job_queue.fair_share(due, 2, {}, {"Paris": 2})
+    assert picked_folders(picked) == ["Berlin", "Berlin"]
+
+def test_a_folder_gets_the_slots_the_others_leave_unused():
+    due = rows("Berlin", "Berlin", "Berlin", "Paris")
+    assert picked_folders(job_queue.fair_share(due, 10, {}, {})) == ["Berlin", "Paris", "Berlin", "Berlin"]
+
+def test_claim_due_jobs_spreads_a_batch_over_the_folders(workspace):
+    for folder, count in (("Berlin", 5), ("Paris", 2)):
+        (workspace / folder).mkdir()
+        for index in range(count):
+            path = workspace / folder / f"{index}.pdf"
+            path.write_bytes(b"%PDF")
+            job_queue.enqueue(str(path), str(workspace / folder))
+            time.sleep(0.001)  # distinct created_at
+    claimed = job_queue.claim_due_jobs(4)
+    assert [folder[-5:] for _, folder in claimed].count("Paris") == 2
+    assert job_queue.queue_depth()[job_queue.EXTRACTING] == 4
+    assert job_queue.queue_depth()[job_queue.QUEUED] == 3
+    assert len(job_queue.claim_due_jobs(10)) == 3
+    assert job_queue.claim_due_jobs(10) == []
+    assert database.query_one("SELECT COUNT(*) FROM jobs WHERE state = 'extracting'")[0] == 7
+
+SETTINGS = dict(job_queue.JOB_DEFAULTS, max_attempts=3, retry_delay=30.0, max_retry_delay=100.0)
+
+def queued_file(workspace, name="scan.pdf"):
+    path = workspace / name
+    path.write_bytes(b"%PDF")
+    job_queue.enqueue(str(path), str(workspace))
+    return str(path)
+
+def job(path):
+    return database.query_one('SELECT state, attempts, next_attempt_at, last_error FROM jobs WHERE path = ?', (path,))
+
+def test_retry_delay_doubles_up_to_the_maximum():
+    assert [job_queue.retry_delay(attempts, SETTINGS) for attempts in range(1, 5)] == [30.0, 60.0, 100.0, 100.0]
+
+def test_a_failed_job_waits_for_its_retry(workspace):
+    path = queued_file(workspace)
+    assert job_queue.claim_due_jobs(10) == [(path, str(workspace))]
+    before = time.time()
+    job_queue.fail(path, "database is locked", SETTINGS)
+    state, attempts, next_attempt_at, last_error = job(path)
+    assert (state, attempts, last_error) == (job_queue.FAILED, 1, "database is locked")
+    assert before + 30.0 <= next_attempt_at <= time.time() + 30.0
+    assert job_queue.claim_due_jobs(10) == []
+    database.execute('UPDATE jobs SET next_attempt_at = ? WHERE path = ?', (time.time() - 1, path))
+    assert job_queue.claim_due_jobs(10) == [(path, str(workspace))]
+
+def test_a_job_is_given_up_after_max_attempts(workspace):
+    path = queued_file(workspace)
+    for _ in range(SETTINGS["max_attempts"]):
+        job_queue.fail(path, "no pages", SETTINGS)
+        database.execute('UPDATE jobs SET next_attempt_at = MIN(next_attempt_at, 0) WHERE path = ?', (path,))
+    state, attempts, next_attempt_at, _ = job(path)
+    assert (state, attempts, next_attempt_at) == (job_queue.FAILED, 3, None)
+    assert job_queue.claim_due_jobs(10) == []
+
+def test_a_job_whose_file_is_gone_is_failed_for_good(workspace):
+    path = queued_file(workspace)
+    (workspace / "scan.pdf").unlink()
+    assert job_queue.claim_due_jobs(10) == []
+    assert job(path) == (job_queue.FAILED, 0, None, "File no longer exists")
+
+def test_a_finished_file_of_the_same_name_is_queued_again(workspace):
+    path = queued_file(workspace)
+    job_queue.claim_due_jobs(10)
+    job_queue.set_state(path, job_queue.MOVED)
+    queued_file(workspace)
+    assert job(path)[:2] == (job_queue.QUEUED, 0)
+    job_queue.set_state(path, job_queue.EXTRACTING)
+    queued_file(workspace)  # still in flight: left alone
+    assert job(path)[0] == job_queue.EXTRACTING
@@ -0,0 +1,90 @@
+""" The LLM gateway's concurrency limit, deadline and retries, against a fake backend. """
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from llm_gateway import LLMGateway, LLMTimeoutError
+
+class FakeLLM:
+    """ Stands in for the Ollama client: agenerate() answers after delay, or raises the next of errors. """
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+
+    async def agenerate(self, prompts):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors:
+                raise self.errors.pop(0)
+            generation = SimpleNamespace(text=f"Antwort auf {prompts[0]}", generation_info={"eval_count": 3})
+            return SimpleNamespace(generations=[[generation]])
+        finally:
+            self.running -= 1
+
+@pytest.fixture(autouse=True)
+def metrics_database(workspace):
+    """ Prompt sizes and token counts are persisted as metrics; keep them out of the real database. """
+
+def gateway(**settings):
+    return LLMGateway(dict({"backoff": 0.0, "retries": 2, "timeout": 5}, **settings))
+
+def test_returns_the_generated_text():
+    llm_gateway = gateway()
+    assert llm_gateway.invoke(FakeLLM(), "Rechnung") == "Antwort auf Rechnung"
+    metrics = llm_gateway.metrics()
+    assert (metrics["completed"], metrics["failed"], metrics["in_flight"], metrics["waiting"]) == (1, 0, 0, 0)
+
+def test_connection_errors_are_retried():
+    llm = FakeLLM([ConnectionError("refused"), httpx.ConnectError("refused")])
+    llm_gateway = gateway()
+    assert llm_gateway.invoke(llm, "Rechnung") == "Antwort auf Rechnung"
+    assert llm.calls == 3
+    assert llm_gateway.metrics()["retries"] == 2
+
+def test_the_last_connection_error_is_raised():
+    llm = FakeLLM([ConnectionError("refused")] * 3)
+    llm_gateway = gateway()
+    with pytest.raises(ConnectionError):
+        llm_gateway.invoke(llm, "Rechnung")
+    assert llm.calls == 3
+    assert (llm_gateway.metrics()["retries"], llm_gateway.metrics()["failed"]) == (2, 1)
+
+def test_other_errors_are_not_retried():
+    llm = FakeLLM([ValueError("model not found")])
+    llm_gateway = gateway()
+    with pytest.raises(ValueError):
+        llm_gateway.invoke(llm, "Rechnung")
+    assert llm.calls == 1
+    assert llm_gateway.metrics()["failed"] == 1
+
+def test_a_request_past_its_deadline_times_out_without_retry():
+    llm = FakeLLM(delay=2.0)
+    llm_gateway = gateway(timeout=0.05)
+    with pytest.raises(LLMTimeoutError):
+        llm_gateway.invoke(llm, "Rechnung")
+    assert llm.calls == 1
+    metrics = llm_gateway.metrics()
+    assert (metrics["timeouts"], metrics["failed"], metrics["in_flight"]) == (1, 1, 0)
+
+def test_requests_in_flight_are_capped():
+    llm = FakeLLM(delay=0.05)
+    llm_gateway = gateway(max_in_flight=2)
+    results = []
+    threads = [threading.Thread(target=lambda index=index: results.append(llm_gateway.invoke(llm, str(index))))
+               for index in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [f"Antwort auf {index}" for index in range(6)]
+    assert llm.peak == 2
+    assert llm_gateway.metrics()["completed"] == 6
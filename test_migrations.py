@@ -0,0 +1,84 @@
+""" Schema migrations, run against a database shaped like the one shipped before them. """
+import json
+import sqlite3
+
+import pytest
+
+import database
+
+CATEGORIES = {"Auto": "Output/Auto", "Versicherung": "Output/Versicherung"}
+
+# filename, category, summary; "Kredit" was deleted from config.json since
+DOCUMENTS = [
+    ("police.pdf", "Versicherung", "Kfz-Versicherungspolice mit Beitragsrechnung."),
+    ("removed.pdf", "Auto", "Wird vor der Migration geloescht."),
+    ("tuev.pdf", "Auto", "Bericht der Hauptuntersuchung."),
+    ("darlehen.pdf", "Kredit", "Tilgungsplan des Darlehens."),
+    ("scan.pdf", "Uncategorized", "Unleserlicher Scan."),
+    ("empty.pdf", None, None),
+]
+
+@pytest.fixture
+def migrated(tmp_path, monkeypatch):
+    """ A version 0 database migrated to the latest version; returns (connection, {filename: old rowid}). """
+    path = str(tmp_path / "documents.db")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"categories": CATEGORIES}))
+    monkeypatch.setattr(database, "CONFIG_PATH", str(config_path))
+
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE documents (filename TEXT UNIQUE, category TEXT, summary TEXT)')
+    conn.executemany('INSERT INTO documents VALUES (?, ?, ?)', DOCUMENTS)
+    conn.execute("DELETE FROM documents WHERE filename = 'removed.pdf'")  # leaves a gap in the rowids
+    conn.commit()
+    rowids = dict(conn.execute('SELECT filename, rowid FROM documents'))
+    conn.close()
+
+    conn = database.connect(path)
+    yield conn, rowids
+    conn.close()
+
+def test_reaches_latest_version(migrated):
+    conn, _ = migrated
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == len(database.MIGRATIONS)
+    assert conn.execute('PRAGMA integrity_check').fetchone()[0] == "ok"
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+    assert "category" not in database.column_names(conn, "documents")
+    assert "folder" in database.column_names(conn, "jobs")
+
+def test_document_ids_keep_their_rowids(migrated):
+    conn, rowids = migrated
+    assert dict(conn.execute('SELECT filename, id FROM documents')) == rowids
+
+def test_documents_reference_their_category(migrated):
+    conn, _ = migrated
+    rows = conn.execute('''
+        SELECT d.filename, c.name, d.summary FROM documents d LEFT JOIN categories c ON c.id = d.category_id
+    ''').fetchall()
+    expected = [document for document in DOCUMENTS if document[0] != "removed.pdf"]
+    assert sorted(rows, key=lambda row: row[0]) == sorted(expected, key=lambda row: row[0])
+
+def test_categories_missing_from_config_are_deleted(migrated):
+    conn, _ = migrated
+    categories = {name: (folder, deleted_at is not None)
+                  for name, folder, deleted_at in conn.execute('SELECT name, folder, deleted_at FROM categories')}
+    assert categories == {
+        "Auto": ("Output/Auto", False),
+        "Versicherung": ("Output/Versicherung", False),
+        "Kredit": (None, True),
+        "Uncategorized": (None, False),
+    }
+
+def test_full_text_index_is_rebuilt(migrated):
+    conn, rowids = migrated
+
+    def search(query):
+        return [rowid for rowid, in conn.execute(
+            'SELECT rowid FROM documents_fts WHERE documents_fts MATCH ? ORDER BY rowid', (query,))]
+
+    assert search('versicherungspolice') == [rowids["police.pdf"]]
+    assert search('tilgung*') == [rowids["darlehen.pdf"]]
+    auto_id = conn.execute("SELECT id FROM categories WHERE name = 'Auto'").fetchone()[0]
+    assert search(f'category:category{auto_id}') == [rowids["tuev.pdf"]]
+    # Raises if the index does not match the documents
+    conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('integrity-check')")
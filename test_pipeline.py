@@ -0,0 +1,102 @@
+""" The staged worker-pool pipeline. """
+import threading
+
+from pipeline import FairQueue, Job, ProcessingPipeline, Stage
+
+def run(stages, paths, on_done=None):
+    """ Push paths through a pipeline of stages; returns the finished jobs by path. """
+    finished = {}
+    lock = threading.Lock()
+
+    def done(job):
+        with lock:
+            finished[job.file_path] = job
+        if on_done is not None:
+            on_done(job)
+
+    pipeline = ProcessingPipeline(stages, done)
+    pipeline.start()
+    for path in paths:
+        pipeline.submit(path)
+    pipeline.stop()
+    return finished
+
+def test_jobs_follow_the_stage_each_step_returns():
+    def extract(job):
+        job.text = job.file_path.upper()
+        return "ocr" if job.file_path.startswith("scan") else "llm"
+
+    def ocr(job):
+        job.text += " (ocr)"
+        return "llm"
+
+    def llm(job):
+        job.category = job.text
+        return None
+
+    finished = run([Stage("extract", extract, 2), Stage("ocr", ocr), Stage("llm", llm)], ["scan.pdf", "text.pdf"])
+    assert finished["scan.pdf"].category == "SCAN.PDF (ocr)"
+    assert finished["text.pdf"].category == "TEXT.PDF"
+    assert set(finished["scan.pdf"].stage_seconds) == {"extract", "ocr", "llm"}
+    assert set(finished["text.pdf"].stage_seconds) == {"extract", "llm"}
+
+def test_a_failing_stage_finishes_the_job_with_its_error():
+    def extract(job):
+        if job.file_path == "broken.pdf":
+            raise ValueError("no pages")
+        return "llm"
+
+    llm_calls = []
+    finished = run([Stage("extract", extract), Stage("llm", lambda job: llm_calls.append(job.file_path))],
+                   ["broken.pdf", "good.pdf"])
+    assert isinstance(finished["broken.pdf"].error, ValueError)
+    assert "in extract: no pages" in finished["broken.pdf"].result
+    assert finished["good.pdf"].error is None
+    assert llm_calls == ["good.pdf"]
+
+def test_workers_survive_a_failing_completion_callback():
+    def on_done(job):
+        raise RuntimeError("database is locked")
+
+    # A single worker: if the failure ended it, the remaining jobs would never be processed
+    paths = [f"{index}.pdf" for index in range(5)]
+    finished = run([Stage("extract", lambda job: None, 1)], paths, on_done)
+    assert sorted(finished) == sorted(paths)
+
+def take(queue, count=None):
+    """ The paths of the next count jobs (all of them by default); None for a stop signal. """
+    jobs = []
+    while queue.qsize() and (count is None or len(jobs) < count):
+        job = queue.get()
+        jobs.append(job and job.file_path)
+    return jobs
+
+def test_a_busy_lane_does_not_hold_back_a_quiet_one():
+    queue = FairQueue()
+    for index in range(4):
+        queue.put(Job(f"berlin{index}.pdf", lane="Berlin"))
+    queue.put(Job("paris0.pdf", lane="Paris"))
+    assert take(queue) == ["berlin0.pdf", "paris0.pdf", "berlin1.pdf", "berlin2.pdf", "berlin3.pdf"]
+
+def test_lanes_get_turns_in_proportion_to_their_weight():
+    queue = FairQueue()
+    for index in range(6):
+        queue.put(Job(f"berlin{index}.pdf", lane="Berlin", weight=2))
+        queue.put(Job(f"paris{index}.pdf", lane="Paris"))
+    assert [path[:-5] for path in take(queue, 9)] == ["berlin", "paris", "berlin"] * 3
+
+def test_an_idle_lane_does_not_claim_the_turns_it_missed():
+    queue = FairQueue()
+    for index in range(6):
+        queue.put(Job(f"berlin{index}.pdf", lane="Berlin"))
+    assert take(queue, 4) == ["berlin0.pdf", "berlin1.pdf", "berlin2.pdf", "berlin3.pdf"]
+    for index in range(3):
+        queue.put(Job(f"paris{index}.pdf", lane="Paris"))
+    assert take(queue) == ["paris0.pdf", "berlin4.pdf", "paris1.pdf", "berlin5.pdf", "paris2.pdf"]
+
+def test_the_stop_signal_is_served_after_all_jobs():
+    queue = FairQueue()
+    queue.put(Job("berlin0.pdf", lane="Berlin"))
+    queue.put(None)
+    queue.put(Job("paris0.pdf", lane="Paris"))
+    assert take(queue) == ["berlin0.pdf", "paris0.pdf", None]
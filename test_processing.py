@@ -0,0 +1,95 @@
+""" Naming, deduplication and filing of processed documents. """
+import os
+
+import pytest
+
+import database
+import processing
+from classifier import save_document_info, save_document_path
+from utils_json import get_registry
+
+PDF = b"%PDF-1.4\nRechnung\n%%EOF\n"
+
+@pytest.fixture
+def filing(workspace, monkeypatch):
+    """ The workspace with an Input folder, filing into the categories of its config.json. """
+    monkeypatch.setattr(processing, "config_registry", get_registry("config.json"))
+    monkeypatch.setattr(processing, "reserved_names", {})
+    (workspace / "Input").mkdir()
+    return workspace
+
+def drop(folder, name, data=PDF):
+    """ Put a file into a subfolder of the workspace; returns its absolute path. """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.abspath(os.path.join(folder, name))
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+def file_document(path, category="Auto", summary="Rechnung der Werkstatt."):
+    """ Name, move and record a file like a classified document; returns where it was filed. """
+    name = processing.document_name(path)
+    content_hash = processing.compute_content_hash(path)
+    processing.move_to_category(path, category, name, (summary, content_hash, "Rechnung", False))
+    database.flush()
+    return os.path.abspath(os.path.join("Output", category, name))
+
+def test_the_first_file_keeps_its_name(filing):
+    assert processing.document_name(drop("Input", "scan.pdf")) == "scan.pdf"
+
+def test_a_second_file_of_the_same_name_is_numbered(filing):
+    first = drop("Input", "scan.pdf")
+    second = drop("Input/Paris", "scan.pdf")
+    third = drop("Input/Rom", "scan.pdf")
+    assert [processing.document_name(path) for path in (first, second, third)] == \
+        ["scan.pdf", "scan (2).pdf", "scan (3).pdf"]
+    assert processing.document_name(second) == "scan (2).pdf"  # a retry keeps its name
+
+def test_a_filed_document_keeps_its_name_taken(filing):
+    filed = file_document(drop("Input", "scan.pdf"))
+    assert os.path.exists(filed)
+    processing.reserved_names.clear()  # as after a restart
+    assert processing.document_name(drop("Input", "scan.pdf", b"%PDF-1.4\nanother scan\n%%EOF\n")) == "scan (2).pdf"
+
+def test_a_name_is_free_again_once_its_file_is_gone(filing):
+    save_document_info("scan.pdf", "Auto", "Rechnung der Werkstatt.", None, None, False)
+    save_document_path("scan.pdf", "Output/Auto/deleted.pdf")
+    database.flush()
+    assert processing.document_name(drop("Input", "scan.pdf")) == "scan.pdf"
+
+def test_an_identical_file_is_removed_instead_of_filed_again(filing):
+    filed = file_document(drop("Input", "scan.pdf"))
+    copy = drop("Input", "scan_0001.pdf")
+    result, category = processing.remove_duplicate(copy, processing.compute_content_hash(copy))
+    assert (result, category) == ("Removed scan_0001.pdf: identical to scan.pdf in Auto", "Auto")
+    assert not os.path.exists(copy)
+    assert os.path.exists(filed)
+    assert database.query_one('SELECT COUNT(*) FROM documents')[0] == 1
+
+def test_the_filed_copy_is_not_its_own_duplicate(filing):
+    filed = file_document(drop("Input", "scan.pdf"))
+    assert processing.remove_duplicate(filed, processing.compute_content_hash(filed)) is None
+    assert os.path.exists(filed)
+
+def test_the_cached_result_is_reused_once_the_filed_copy_is_gone(filing):
+    os.remove(file_document(drop("Input", "scan.pdf")))
+    again = drop("Input/Paris", "scan.pdf")
+    content_hash = processing.compute_content_hash(again)
+    assert processing.remove_duplicate(again, content_hash) is None
+    name = processing.document_name(again)
+    result, category = processing.reuse_cached_result(again, content_hash, name)
+    assert result.endswith(" (cached)") and category == "Auto"
+    database.flush()
+    filed = os.path.abspath(os.path.join("Output", "Auto", name))
+    assert os.path.exists(filed)
+    assert database.query_one('SELECT summary, path FROM documents WHERE filename = ?', (name,)) == \
+        ("Rechnung der Werkstatt.", filed)
+
+def test_nothing_is_recorded_when_the_move_fails(filing):
+    drop("Output/Auto", "scan.pdf", b"someone else's file")
+    path = drop("Input", "scan.pdf")
+    with pytest.raises(FileExistsError):
+        processing.move_to_category(path, "Auto", "scan.pdf", ("Rechnung", None, "Rechnung", False))
+    database.flush()
+    assert os.path.exists(path)
+    assert database.query_one('SELECT COUNT(*) FROM documents')[0] == 0
@@ -0,0 +1,100 @@
+""" Detection of completely written files in the watched folders. """
+import os
+import stat
+
+from watchdog.events import FileCreatedEvent, FileMovedEvent
+
+from readiness import FileReadinessDetector, PendingFile, is_file_locked, pdf_looks_complete
+from processing import FolderMonitor
+
+COMPLETE_PDF = b"%PDF-1.4\n1 0 obj\n<<>>\nendobj\ntrailer\n<<>>\n%%EOF\n"
+
+SETTINGS = {"min_quiet": 0.5, "max_quiet": 15.0, "timeout": 900}
+
+def write(path, data):
+    with open(path, "wb") as file:
+        file.write(data)
+    return str(path)
+
+def states(detector, pending, times):
+    return [detector.check(pending, now) for now in times]
+
+def test_a_complete_pdf_is_ready_after_the_quiet_period(tmp_path):
+    detector = FileReadinessDetector(None, SETTINGS)
+    pending = PendingFile(write(tmp_path / "scan.pdf", COMPLETE_PDF))
+    start = pending.first_seen
+    assert states(detector, pending, [start, start + 0.2, start + 0.6]) == [None, None, "ready"]
+
+def test_a_close_event_skips_the_quiet_period(tmp_path):
+    detector = FileReadinessDetector(None, SETTINGS)
+    pending = PendingFile(write(tmp_path / "scan.pdf", COMPLETE_PDF))
+    pending.closed = True
+    assert detector.check(pending, pending.first_seen) == "ready"
+
+def test_a_growing_file_waits_for_a_longer_pause(tmp_path):
+    detector = FileReadinessDetector(None, SETTINGS)
+    path = write(tmp_path / "scan.pdf", b"%PDF-1.4\n")
+    pending = PendingFile(path)
+    start = pending.first_seen
+    assert detector.check(pending, start) is None
+    write(path, COMPLETE_PDF)
+    os.utime(path, (1, 1))  # a new mtime even on coarse file systems
+    assert detector.check(pending, start + 3.0) is None  # changed after a 3 second pause
+    assert detector.check(pending, start + 3.6) is None  # quiet period is now 2 * 3 seconds
+    assert detector.check(pending, start + 9.1) == "ready"
+
+def test_a_pdf_without_its_trailer_is_never_ready(tmp_path):
+    detector = FileReadinessDetector(None, SETTINGS)
+    pending = PendingFile(write(tmp_path / "scan.pdf", b"%PDF-1.4\nhalf a document"))
+    start = pending.first_seen
+    assert states(detector, pending, [start, start + 1, start + 60]) == [None, None, None]
+    assert detector.check(pending, start + 901) == "timeout"
+
+def test_a_deleted_file_is_gone(tmp_path):
+    detector = FileReadinessDetector(None, SETTINGS)
+    pending = PendingFile(str(tmp_path / "missing.pdf"))
+    assert detector.check(pending, pending.first_seen) == "gone"
+
+def test_a_read_only_pdf_becomes_ready(tmp_path):
+    path = write(tmp_path / "scan.pdf", COMPLETE_PDF)
+    os.chmod(path, stat.S_IREAD)
+    try:
+        assert not is_file_locked(path)
+        detector = FileReadinessDetector(None, SETTINGS)
+        pending = PendingFile(path)
+        start = pending.first_seen
+        assert states(detector, pending, [start, start + 0.6]) == [None, "ready"]
+    finally:
+        os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+
+def test_pdf_trailer_check(tmp_path):
+    assert pdf_looks_complete(write(tmp_path / "a.pdf", COMPLETE_PDF))
+    assert pdf_looks_complete(write(tmp_path / "b.pdf", COMPLETE_PDF + b"\0" * 100))
+    assert not pdf_looks_complete(write(tmp_path / "c.pdf", COMPLETE_PDF + b"\0" * 2000))
+    assert not pdf_looks_complete(str(tmp_path / "missing.pdf"))
+
+class RecordingDetector:
+    def __init__(self):
+        self.watched = []
+        self.forgotten = []
+
+    def watch(self, path):
+        self.watched.append(path)
+
+    def forget(self, path):
+        self.forgotten.append(path)
+
+def test_folder_monitor_only_watches_pdfs():
+    detector = RecordingDetector()
+    monitor = FolderMonitor(detector, lambda message, msg_type: None)
+    for name in ("scan.pdf", "SCAN2.PDF", "scan.tmp", "Thumbs.db", "scan.pdf.part"):
+        monitor.on_created(FileCreatedEvent(os.path.join("Input", name)))
+    assert detector.watched == [os.path.join("Input", "scan.pdf"), os.path.join("Input", "SCAN2.PDF")]
+
+def test_folder_monitor_picks_up_a_temporary_file_renamed_to_pdf():
+    detector = RecordingDetector()
+    monitor = FolderMonitor(detector, lambda message, msg_type: None)
+    monitor.on_moved(FileMovedEvent(os.path.join("Input", "scan.tmp"), os.path.join("Input", "scan.pdf")))
+    monitor.on_moved(FileMovedEvent(os.path.join("Input", "a.pdf"), os.path.join("Input", "a.pdf.bak")))
+    assert detector.watched == [os.path.join("Input", "scan.pdf")]
+    assert detector.forgotten == [os.path.join("Input", "scan.tmp"), os.path.join("Input", "a.pdf")]
@@ -0,0 +1,106 @@
+""" Checkpointed reclassification of filed documents. """
+import os
+import threading
+
+import pytest
+
+import classifier
+import database
+from classifier import save_document_info, save_document_path
+from reclassify import DONE, FAILED, PENDING, Reclassifier, progress
+
+@pytest.fixture
+def archive(workspace, monkeypatch):
+    """ Six documents filed under Versicherung, of which the odd ones are about cars; returns their paths. """
+    calls = []
+    lock = threading.Lock()
+
+    def categorize_document(text):
+        with lock:
+            calls.append(text)
+        return "Auto" if "Kfz" in text else "Versicherung"
+
+    monkeypatch.setattr(classifier, "categorize_document", categorize_document)
+    os.makedirs(os.path.join("Output", "Versicherung"))
+    paths = {}
+    for index in range(6):
+        filename = f"doc{index}.pdf"
+        paths[filename] = os.path.abspath(os.path.join("Output", "Versicherung", filename))
+        with open(paths[filename], "wb") as file:
+            file.write(b"%PDF")
+        text = f"Kfz-Steuerbescheid {index}" if index % 2 else f"Hausratversicherung {index}"
+        save_document_info(filename, "Versicherung", f"Dokument {index}", None, text, False)
+        save_document_path(filename, paths[filename])
+    database.flush()
+    return paths, calls
+
+def document(filename):
+    return database.query_one('SELECT c.name, d.path FROM documents d LEFT JOIN categories c ON c.id = d.category_id '
+                              'WHERE d.filename = ?', (filename,))
+
+def checkpoint(filename):
+    return database.query_one('SELECT state, old_category, new_category, error FROM reclassify WHERE filename = ?',
+                              (filename,))
+
+def test_results_are_moved_and_recorded(archive):
+    paths, _ = archive
+    reclassifier = Reclassifier({"workers": 2, "batch_size": 4}, log=lambda message, level: None)
+    assert reclassifier.start(sorted(paths)) == 6
+    assert reclassifier.run() == {DONE: 6}
+    moved = os.path.abspath(os.path.join("Output", "Auto", "doc1.pdf"))
+    assert document("doc1.pdf") == ("Auto", moved)
+    assert os.path.exists(moved) and not os.path.exists(paths["doc1.pdf"])
+    assert checkpoint("doc1.pdf") == (DONE, "Versicherung", "Auto", None)
+    assert document("doc0.pdf") == ("Versicherung", paths["doc0.pdf"])
+    assert checkpoint("doc0.pdf") == (DONE, "Versicherung", "Versicherung", None)
+
+def test_a_run_resumes_after_a_stop(archive, monkeypatch):
+    paths, calls = archive
+    reclassifier = Reclassifier({"workers": 1, "batch_size": 1}, log=lambda message, level: None)
+    reclassifier.start(sorted(paths))
+    original = classifier.categorize_document
+
+    def stop_after_two(text):
+        if len(calls) == 1:
+            reclassifier.stop()
+        return original(text)
+
+    monkeypatch.setattr(classifier, "categorize_document", stop_after_two)
+    stopped = reclassifier.run()
+    monkeypatch.setattr(classifier, "categorize_document", original)
+    assert stopped.get(DONE, 0) >= 2 and stopped.get(PENDING, 0) >= 2
+    assert stopped[DONE] == len(calls)  # the documents in flight were finished and applied
+
+    assert Reclassifier({"workers": 2}, log=lambda message, level: None).run() == {DONE: 6}
+    assert sorted(calls) == sorted(set(calls))  # nothing was classified twice
+    assert len(calls) == 6
+
+def test_a_taken_destination_fails_the_document_only(archive):
+    paths, _ = archive
+    os.makedirs(os.path.join("Output", "Auto"))
+    with open(os.path.join("Output", "Auto", "doc3.pdf"), "wb") as file:
+        file.write(b"someone else's file")
+    logged = []
+    reclassifier = Reclassifier(log=lambda message, level: logged.append(level))
+    reclassifier.start(sorted(paths))
+    assert reclassifier.run() == {DONE: 5, FAILED: 1}
+    state, old_category, new_category, error = checkpoint("doc3.pdf")
+    assert (state, old_category, new_category) == (FAILED, "Versicherung", "Auto")
+    assert "already exists" in error
+    assert document("doc3.pdf") == ("Versicherung", paths["doc3.pdf"])
+    assert os.path.exists(paths["doc3.pdf"])
+    assert "ERROR" in logged
+
+    os.remove(os.path.join("Output", "Auto", "doc3.pdf"))
+    assert reclassifier.retry_failed() == 1
+    assert reclassifier.run() == {DONE: 6}
+    assert document("doc3.pdf")[0] == "Auto"
+
+def test_a_file_without_a_recorded_path_is_found_in_the_category_folders(archive):
+    paths, _ = archive
+    database.execute("UPDATE documents SET path = NULL WHERE filename = 'doc5.pdf'")
+    reclassifier = Reclassifier(log=lambda message, level: None)
+    reclassifier.start(["doc5.pdf"])
+    assert reclassifier.run() == {DONE: 1}
+    assert document("doc5.pdf") == ("Auto", os.path.abspath(os.path.join("Output", "Auto", "doc5.pdf")))
+    assert not os.path.exists(paths["doc5.pdf"])
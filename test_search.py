@@ -0,0 +1,60 @@
+""" Full-text search over the stored documents. """
+import pytest
+
+import database
+from classifier import save_document_info
+from search import build_match_query, count_documents, search_documents
+
+COLUMNS = "{filename summary extracted_text}"
+
+DOCUMENTS = [
+    ("police.pdf", "Versicherung", "Kfz-Versicherungspolice von Müller.", "Beitragsrechnung 2024"),
+    ("tuev.pdf", "Auto", "Bericht der Hauptuntersuchung.", "Prüfplakette erteilt"),
+    ("scan_0001.pdf", "Auto", "Rechnung der Werkstatt \"Mueller & Söhne\".", "Ölwechsel AND Bremsen"),
+]
+
+@pytest.fixture
+def documents(workspace):
+    for filename, category, summary, text in DOCUMENTS:
+        save_document_info(filename, category, summary, None, text, False)
+    database.flush()
+    return workspace
+
+def filenames(text):
+    return sorted(filename for filename, *_ in search_documents(text))
+
+def test_every_word_is_a_quoted_prefix_term():
+    assert build_match_query("rechnung 2024") == \
+        f'{COLUMNS} : ("rechnung"*) AND {COLUMNS} : ("2024"*)'
+
+def test_query_syntax_in_the_input_is_searched_as_words():
+    query = build_match_query('"police" OR NEAR(a b) -kfz category:3 * ^x')
+    assert query.count(" AND ") == 8
+    for word in ("police", "or", "near", "a", "b", "kfz", "category", "3", "x"):
+        assert f'("{word}"*)' in query
+    assert build_match_query('* - " : ()') == ""
+
+def test_umlauts_are_also_searched_spelled_out():
+    assert build_match_query("Müller") == f'{COLUMNS} : ("müller"* OR "mueller"*)'
+    assert build_match_query("Mueller") == f'{COLUMNS} : ("mueller"* OR "müller"*)'
+
+def test_a_category_prefix_adds_its_documents():
+    query = build_match_query("vers", [(1, ["auto"]), (2, ["versicherung"])])
+    assert query == f'({COLUMNS} : ("vers"*) OR category : ("category2"))'
+
+def test_search_finds_words_and_spellings(documents):
+    assert filenames("müller") == ["police.pdf", "scan_0001.pdf"]
+    assert filenames("oelwechsel") == ["scan_0001.pdf"]
+    assert filenames("werk rech") == ["scan_0001.pdf"]
+    assert filenames("scan_0001") == ["scan_0001.pdf"]
+
+def test_search_by_category_name(documents):
+    assert filenames("auto") == ["scan_0001.pdf", "tuev.pdf"]
+    assert count_documents("auto") == 2
+
+def test_operators_and_quotes_do_not_break_the_query(documents):
+    assert filenames('"Mueller & Söhne"') == ["scan_0001.pdf"]
+    assert filenames("AND") == ["scan_0001.pdf"]
+    assert filenames("NOT police") == []
+    assert filenames("*") == []
+    assert count_documents('"') == 0
@@ -1,5 +1,10 @@
 import os
 import json
+import copy
+import tempfile
+import threading
+
+import category_store
 
 def initialize_data(filename):
     """ Initialize a dictionary with categories and their base names. """
@@ -21,11 +26,11 @@ def initialize_data(filename):
 
     """ Save the dictionary to a JSON file. """
     try:
-        with open(filename, 'w') as file:
-            json.dump(data, file, indent=4)
+        write_json_atomic(filename, data)
         print(f"Data successfully written to {filename}")
     except Exception as e:
         print(f"Failed to write to {filename}: {e}")
+    return data
 
 def serialize_data(data):
     """ Prepare data for JSON serialization by ensuring all values are serializable. """
@@ -35,11 +40,28 @@ def serialize_data(data):
             data["categories"][category] = str(path)  # Convert PathLike objects to string if necessary
     return data
 
+def write_json_atomic(filename, data):
+    """ Write JSON to a temp file in the same folder and swap it in with os.replace.
+
+    Readers therefore see either the old or the new file, never a half-written one.
+    """
+    folder = os.path.dirname(os.path.abspath(filename))
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=".config-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, filename)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
 def write_json_file(filename, data):
     """ Serialize the data to a JSON file. """
     try:
-        with open(filename, 'w') as file:
-            json.dump(data, file, indent=4)
+        write_json_atomic(filename, data)
         print("Data successfully written to", filename)
     except TypeError as e:
         print("Data provided is not serializable:", e)
@@ -68,66 +90,182 @@ def get_categories(data):
     # Return the list of keys from the categories dictionary
     return list(categories.keys())
 
+def get_settings(data, section, defaults):
+    """ Return a settings section from the config, filled up with the given defaults. """
+    settings = dict(defaults)
+    section_data = data.get(section, {}) if data else {}
+    if isinstance(section_data, dict):
+        settings.update(section_data)
+    return settings
+
+class CategoryRegistry:
+    """ In-memory copy of config.json shared by the GUI and the workers.
+
+    The file is parsed again only when its mtime, inode or size change, writes
+    are atomic, and listeners are called with the new data after every change so
+    cached category lists can follow edits without a restart.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.RLock()
+        self.data = None
+        self.signature = None
+        self.listeners = []
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.filename)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+    def refresh(self):
+        """ Reload the file if it changed on disk; returns True if the data changed. """
+        with self.lock:
+            signature = self._file_signature()
+            if signature is None:
+                initialize_data(self.filename)
+                signature = self._file_signature()
+            if self.data is not None and signature == self.signature:
+                return False
+            data = read_json_file(self.filename)
+            if not data and self.data is not None:
+                # Keep the last good copy rather than dropping every category
+                self.signature = signature
+                return False
+            self.data = data
+            self.signature = signature
+        self._notify()
+        return True
+
+    def get_data(self):
+        """ Return a copy of the current configuration. """
+        with self.lock:
+            self.refresh()
+            return copy.deepcopy(self.data)
+
+    def get_categories(self):
+        with self.lock:
+            self.refresh()
+            return get_categories(self.data)
+
+    def get_category_folder(self, category):
+        with self.lock:
+            self.refresh()
+            if category == category_store.UNCATEGORIZED and category not in (self.data or {}).get("categories", {}):
+                return category_store.UNCATEGORIZED_FOLDER
+            if self.data is not None and "categories" in self.data:
+                return self.data["categories"].get(category, "Category not found.")
+            return "Invalid or missing data."
+
+    def update(self, change, on_saved=None):
+        """ Apply change(data) to a copy and save it; change returns False to abort.
+
+        on_saved() runs once the file is written and before listeners see the
+        new data; if it fails, the previous file is written back. Returns False
+        if nothing was changed.
+        """
+        with self.lock:
+            self.refresh()
+            previous = self.data if self.data is not None else {}
+            data = copy.deepcopy(previous)
+            if change(data) is False:
+                return False
+            try:
+                write_json_atomic(self.filename, data)
+                if on_saved is not None:
+                    try:
+                        on_saved()
+                    except Exception:
+                        write_json_atomic(self.filename, previous)
+                        raise
+            except Exception as e:
+                print("Failed to update", self.filename, ":", e)
+                self.signature = None  # read the file again on the next access
+                return False
+            print("Data successfully written to", self.filename)
+            self.data = data
+            self.signature = self._file_signature()
+        self._notify()
+        return True
+
+    def add_listener(self, callback):
+        """ Register callback(data), called after the configuration changed. """
+        self.listeners.append(callback)
+
+    def _notify(self):
+        data = self.get_data()
+        for callback in list(self.listeners):
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"Category listener failed: {e}")
+
+registries = {}
+registries_lock = threading.Lock()
+
+def get_registry(filename):
+    """ Return the shared CategoryRegistry for a config file. """
+    key = os.path.abspath(filename)
+    with registries_lock:
+        if key not in registries:
+            registries[key] = CategoryRegistry(filename)
+        return registries[key]
+
 def get_category_folder(filename, category):
-    data = None
-    data = read_json_file(filename)
-    if data is not None and "categories" in data:
-        return data["categories"].get(category, "Category not found.")
-    else:
-        return "Invalid or missing data."
+    return get_registry(filename).get_category_folder(category)
       
 def add_new_category(filename, category_name, folder_path):
     """ Add a new category and its folder path to the configuration file. """
-    data = read_json_file(filename)
-    if data is not None:
+    def change(data):
         if "categories" not in data:
             data["categories"] = {}  # Initialize if not already present
 
         if category_name in data["categories"]:
             print(f"Category '{category_name}' already exists.")
-        else:
-            data["categories"][category_name] = folder_path
-            write_json_file(filename, data)
-            print(f"Category '{category_name}' added successfully with folder '{folder_path}'.")
-    else:
-        print("Error: Could not load data.")      
+            return False
+        data["categories"][category_name] = folder_path
+        print(f"Category '{category_name}' added successfully with folder '{folder_path}'.")
+    return get_registry(filename).update(change)
 
 def update_category_folder(filename, category, output_path):
     """ Update the output path for a specific category. """
-    config_data = read_json_file(filename)
-    config_data['categories'][category] = output_path
-    write_json_file(filename, config_data)
+    def change(data):
+        data.setdefault('categories', {})[category] = output_path
+    return get_registry(filename).update(change)
     
 def update_category_name_and_folder(filename, old_category_name, new_category_name, new_folder_path):
-    data = read_json_file(filename)
-    if data is not None:
-        if "categories" in data:
-            if old_category_name in data["categories"]:
-                if new_category_name in data["categories"] and new_category_name != old_category_name:
-                    print(f"Error: A category with the name '{new_category_name}' already exists.")
-                else:
-                    # Update the category name and folder
-                    data["categories"][new_category_name] = new_folder_path
-                    if new_category_name != old_category_name:
-                        del data["categories"][old_category_name]
-                    write_json_file(filename, data)
-                    print(f"Category '{old_category_name}' updated to '{new_category_name}' with new path '{new_folder_path}'.")
-            else:
-                print(f"Error: Category '{old_category_name}' does not exist.")
-        else:
+    """ Rename a category and set its folder; returns False if nothing was changed. """
+    def change(data):
+        if "categories" not in data:
             print("Error: No categories found in the configuration.")
-    else:
-        print("Error: Could not load data from file.")
+            return False
+        if old_category_name not in data["categories"]:
+            print(f"Error: Category '{old_category_name}' does not exist.")
+            return False
+        if new_category_name in data["categories"] and new_category_name != old_category_name:
+            print(f"Error: A category with the name '{new_category_name}' already exists.")
+            return False
+        # Update the category name and folder
+        data["categories"][new_category_name] = new_folder_path
+        if new_category_name != old_category_name:
+            del data["categories"][old_category_name]
+        print(f"Category '{old_category_name}' updated to '{new_category_name}' with new path '{new_folder_path}'.")
+
+    # Renamed in the categories table once config.json is saved, and before the listeners sync the table,
+    # so the documents keep their category instead of seeing a deletion plus a new category
+    return get_registry(filename).update(
+        change, lambda: category_store.rename(old_category_name, new_category_name, new_folder_path))
         
 def delete_category(filename, category_name):
     """ Delete a category from the configuration file. """
-    data = read_json_file(filename)
-    if data is not None and "categories" in data:
-        if category_name in data["categories"]:
-            del data["categories"][category_name]  # Remove the category
-            write_json_file(filename, data)
-            print(f"Category '{category_name}' has been successfully deleted.")
-        else:
+    def change(data):
+        if "categories" not in data:
+            print("Error: Could not load data or 'categories' key is missing.")
+            return False
+        if category_name not in data["categories"]:
             print(f"Category '{category_name}' does not exist.")
-    else:
-        print("Error: Could not load data or 'categories' key is missing.")
\ No newline at end of file
+            return False
+        del data["categories"][category_name]  # Remove the category
+        print(f"Category '{category_name}' has been successfully deleted.")
+    return get_registry(filename).update(change, lambda: category_store.delete(category_name))
@@ -0,0 +1,77 @@
+""" Watched input folders and the rules that apply to the files dropped into them.
+
+config.json lists the folders under "watch_folders", e.g. one scanner drop
+folder per office:
+
+    "watch_folders": [
+        {"path": "Scans/Berlin", "recursive": true, "priority": 2, "ocr_lang": "deu"},
+        {"path": "Scans/Paris", "category_hint": "Versicherung", "ocr_lang": "fra"}
+    ]
+
+Every folder feeds the same job queue and pipeline. Jobs are dispatched and
+queued per folder in proportion to its priority, so a folder that receives a
+large batch cannot hold back the files of the others.
+"""
+import os
+
+from utils_json import get_categories
+
+WATCH_FOLDER_DEFAULTS = {
+    "path": "Input",
+    "recursive": False,  # also watch and scan subfolders
+    "category_hint": None,  # category for documents the LLM would leave Uncategorized
+    "priority": 1,  # share of the pipeline relative to the other folders while several have files waiting
+    "ocr_lang": None  # Tesseract language(s), e.g. "deu+eng"; None uses the ocr setting
+}
+
+def watch_folder(rule, categories=()):
+    """ A complete rule dict with an absolute path; a plain path is accepted too.
+
+    A category_hint that is not one of the categories is dropped, since it
+    would otherwise be filed as a new category without a folder.
+    """
+    if isinstance(rule, str):
+        rule = {"path": rule}
+    folder = dict(WATCH_FOLDER_DEFAULTS)
+    folder.update(rule)
+    folder["path"] = os.path.abspath(folder["path"])
+    folder["priority"] = max(float(folder["priority"]), 0.01)
+    hint = folder["category_hint"]
+    if hint is not None:
+        known = {name.lower(): name for name in categories}
+        folder["category_hint"] = known.get(str(hint).strip().lower())
+        if folder["category_hint"] is None:
+            print(f"Ignoring category_hint {hint!r} of watched folder {folder['path']}: not a configured category.")
+    return folder
+
+def load_watch_folders(config, default_path=None):
+    """ The watched folders of config.json, or just default_path if none are configured. """
+    rules = config.get("watch_folders") or [default_path or WATCH_FOLDER_DEFAULTS["path"]]
+    categories = get_categories(config)
+    folders = {}
+    for rule in rules:
+        folder = watch_folder(rule, categories)
+        folders.setdefault(os.path.normcase(folder["path"]), folder)  # the first rule for a folder wins
+    return list(folders.values())
+
+def add_watch_folder(folders, rule):
+    """ folders plus rule, unless that folder is already watched; returns (folders, the folder's rule). """
+    folder = watch_folder(rule)
+    for existing in folders:
+        if os.path.normcase(existing["path"]) == os.path.normcase(folder["path"]):
+            return folders, existing
+    return folders + [folder], folder
+
+def folder_for(path, folders):
+    """ The rule of the watched folder a file belongs to (the innermost one), or None. """
+    path = os.path.normcase(os.path.abspath(path))
+    best = None
+    for folder in folders:
+        root = os.path.normcase(folder["path"])
+        if not path.startswith(root.rstrip(os.sep) + os.sep):
+            continue
+        if not folder["recursive"] and os.path.dirname(path) != root:
+            continue
+        if best is None or len(root) > len(best["path"]):
+            best = folder
+    return best